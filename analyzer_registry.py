@@ -0,0 +1,204 @@
+"""
+Analyzer plugin registry with dependency-aware parallel execution.
+
+Each analyzer declares the intermediate features it reads. `run_analyzers`
+expands the requested analyzers into the features they need (and those
+features' own dependencies, from the feature context's `DEPENDENCIES`),
+then runs the graph on a thread pool: a node starts as soon as everything
+it reads is ready. Independent transforms (CQT, HPSS, onset envelope, RMS)
+and analyzers then overlap wherever librosa/NumPy release the GIL, and a
+subset such as tempo alone computes only the STFT, onset envelope and tempo.
+
+New analyzers plug in with a decorator and return their part of the
+standard output:
+
+    @register_analyzer("loudness", needs=("rms_mean",))
+    def analyze_loudness(features):
+        return {"loudness_db": 20 * math.log10(features.rms_mean + 1e-9)}
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, Iterable, Sequence, Tuple
+from key_analyzer import estimate_key
+from tempo_analyzer import estimate_tempo
+from instrument_analyzer import detect_instruments
+from mood_analyzer import analyze_mood
+from segment_tracks import analyze_segments
+from feature_store import feature_vector
+from instrumentation import stage
+
+DEFAULT_ANALYZERS = ("key", "tempo", "instruments", "mood", "feature_vector")
+
+
+class Analyzer:
+    """A registered analyzer: `run(features)` returns its part of the standard output."""
+
+    def __init__(self, name: str, run: Callable[[Any], Dict[str, Any]], needs: Sequence[str] = ()):
+        self.name = name
+        self.run = run
+        self.needs = tuple(needs)
+
+
+ANALYZERS: Dict[str, Analyzer] = {}
+
+# One pool per thread count, shared by concurrent callers and never shut down under them
+_pools: Dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def register_analyzer(name: str, needs: Sequence[str] = (), replace: bool = False):
+    """Decorator registering `fn(features) -> partial output` under `name`."""
+    def decorator(fn):
+        if name in ANALYZERS and not replace:
+            raise ValueError(f"Analyzer '{name}' is already registered")
+        ANALYZERS[name] = Analyzer(name, fn, needs)
+        return fn
+    return decorator
+
+
+def default_workers() -> int:
+    """Threads per track: ANALYZER_WORKERS, or one per core."""
+    return int(os.environ.get("ANALYZER_WORKERS") or os.cpu_count() or 1)
+
+
+def _get_pool(workers: int) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"analyzer-{workers}")
+        return _pools[workers]
+
+
+def build_graph(features, names: Iterable[str]) -> Dict[str, Tuple[Callable[[], Any], Tuple[str, ...]]]:
+    """
+    Nodes for the requested analyzers and every feature they transitively
+    read: {node: (thunk, dependencies)}. Feature nodes are "feature:<name>",
+    analyzer nodes "analyzer:<name>". Feature contexts without a
+    `DEPENDENCIES` table (streaming) compute their features on access, so
+    only analyzer nodes are built for them.
+    """
+    feature_deps = getattr(type(features), "DEPENDENCIES", {})
+    graph = {}
+
+    def add_feature(name: str):
+        node = f"feature:{name}"
+        if node in graph or name not in feature_deps:
+            return
+        graph[node] = (lambda: getattr(features, name),
+                       tuple(f"feature:{dep}" for dep in feature_deps[name]))
+        for dep in feature_deps[name]:
+            add_feature(dep)
+
+    for name in names:
+        if name not in ANALYZERS:
+            raise ValueError(f"Unknown analyzer '{name}'. Available: {sorted(ANALYZERS)}")
+        analyzer = ANALYZERS[name]
+        for need in analyzer.needs:
+            add_feature(need)
+
+        def run(analyzer=analyzer):
+            with stage(f"analyze.{analyzer.name}", features.duration):
+                return analyzer.run(features)
+        graph[f"analyzer:{name}"] = (run, tuple(f"feature:{need}" for need in analyzer.needs
+                                                if f"feature:{need}" in graph))
+    return graph
+
+
+def run_graph(graph: Dict[str, Tuple[Callable[[], Any], Tuple[str, ...]]], workers: int = 1) -> Dict[str, Any]:
+    """Run every node once its dependencies are done; returns {node: result}. The first failure is re-raised."""
+    remaining = {node: set(deps) for node, (_, deps) in graph.items()}
+    dependents = {node: [] for node in graph}
+    for node, deps in remaining.items():
+        for dep in deps:
+            dependents[dep].append(node)
+    results = {}
+
+    if workers <= 1:
+        ready = [node for node, deps in remaining.items() if not deps]
+        while ready:
+            node = ready.pop()
+            results[node] = graph[node][0]()
+            for dependent in dependents[node]:
+                remaining[dependent].discard(node)
+                if not remaining[dependent]:
+                    ready.append(dependent)
+        return results
+
+    pool = _get_pool(workers)
+    running = {}
+
+    def submit_ready():
+        for node in [node for node, deps in remaining.items() if not deps and node not in results]:
+            del remaining[node]
+            # Carry the caller's context so stage timings reach its collect()
+            running[pool.submit(contextvars.copy_context().run, graph[node][0])] = node
+
+    submit_ready()
+    try:
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                results[node] = future.result()
+                for dependent in dependents[node]:
+                    remaining[dependent].discard(node)
+            submit_ready()
+    finally:
+        for future in running:
+            future.cancel()
+    return results
+
+
+def run_analyzers(features, names: Iterable[str] = DEFAULT_ANALYZERS, workers: int = None) -> Dict[str, Dict[str, Any]]:
+    """Run the named analyzers (and only the features they need) on `workers` threads; {name: partial output}."""
+    names = list(dict.fromkeys(names))
+    results = run_graph(build_graph(features, names), default_workers() if workers is None else workers)
+    return {name: results[f"analyzer:{name}"] for name in names}
+
+
+def merge_output(output: Dict[str, Any], partial: Dict[str, Any]):
+    """Merge an analyzer's partial output into the standard output, combining confidence scores."""
+    for field, value in partial.items():
+        if field == "confidence_scores":
+            output["confidence_scores"].update(value)
+        else:
+            output[field] = value
+
+
+@register_analyzer("key", needs=("chroma_cqt_mean", "chroma_stft_mean", "chroma_harmonic_mean"))
+def _analyze_key(features) -> Dict[str, Any]:
+    key_info = estimate_key(features.audio_data, features.sample_rate, features)
+    return {"key": key_info["key"], "confidence_scores": {"key": key_info["confidence"]}}
+
+
+@register_analyzer("tempo", needs=("onset_envelope", "tempo"))
+def _analyze_tempo(features) -> Dict[str, Any]:
+    tempo_info = estimate_tempo(features.audio_data, features.sample_rate, features)
+    return {"tempo": tempo_info["bpm"], "confidence_scores": {"tempo": tempo_info["confidence"]}}
+
+
+@register_analyzer("instruments", needs=("spectral_centroid_mean", "spectral_rolloff_mean",
+                                         "spectral_bandwidth_mean"))
+def _analyze_instruments(features) -> Dict[str, Any]:
+    instrument_info = detect_instruments(features.audio_data, features.sample_rate, features)
+    return {"instruments": instrument_info["detected_instruments"]}
+
+
+@register_analyzer("mood", needs=("tempo", "rms_mean", "spectral_centroid_mean"))
+def _analyze_mood(features) -> Dict[str, Any]:
+    mood_info = analyze_mood(features.audio_data, features.sample_rate, features)
+    return {"mood": mood_info["moods"], "confidence_scores": {"mood": mood_info["confidence"]}}
+
+
+@register_analyzer("segments", needs=("chroma_cqt", "chroma_stft", "chroma_harmonic", "onset_envelope"))
+def _analyze_segments(features) -> Dict[str, Any]:
+    return {"segments": analyze_segments(features)}
+
+
+@register_analyzer("feature_vector", needs=("chroma_cqt_mean", "chroma_stft_mean", "chroma_harmonic_mean",
+                                            "spectral_centroid_mean", "spectral_rolloff_mean",
+                                            "spectral_bandwidth_mean", "rms_mean", "tempo"))
+def _analyze_feature_vector(features) -> Dict[str, Any]:
+    # The descriptors behind the labels, for similarity search (feature_store.FEATURE_NAMES order)
+    return {"feature_vector": feature_vector(features).tolist()}
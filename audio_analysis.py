@@ -0,0 +1,147 @@
+"""
+Headless audio analysis core.
+
+Nothing here imports Streamlit or the LLM clients, and librosa loads its
+submodules lazily on first use, so batch workers and services can import
+this module cheaply. Call `warmup()` once per worker process to pay the
+librosa/numba start-up cost before the first real track arrives.
+"""
+import io
+import os
+import warnings
+from typing import Dict, Any
+import numpy as np
+from audio_features import AudioFeatures
+from streaming_features import stream_features, DEFAULT_BLOCK_LENGTH
+from instrumentation import stage, collect, configure_from_env, summarize_timings
+from decode_profiles import decode_audio
+from analyzer_registry import DEFAULT_ANALYZERS, run_analyzers, merge_output
+
+# Bump whenever analyzer output changes so cached results are not reused
+ANALYZER_VERSION = "2"
+
+def get_standardized_output() -> Dict[str, Any]:
+    """
+    Standard output format for all analysis types
+    """
+    return {
+        "key": "",
+        "tempo": 0.0,
+        "mood": [],
+        "instruments": [],
+        "confidence_scores": {
+            "key": 0.0,
+            "tempo": 0.0,
+            "mood": 0.0,
+            "instruments": 0.0
+        }
+    }
+
+def process_audio_file(file_content, profile=None):
+    """Process audio file content and return audio data with sample rate"""
+    audio_data, sample_rate, _ = decode_audio(io.BytesIO(file_content), profile)
+    return audio_data, sample_rate
+
+def process_audio_path(path: str, profile=None):
+    """Decode an audio file from disk and return audio data with sample rate"""
+    audio_data, sample_rate, _ = decode_audio(path, profile)
+    return audio_data, sample_rate
+
+def warmup(sample_rate: int = 22050, duration: float = 2.0):
+    """
+    Import librosa's submodules and compile its numba kernels ahead of time.
+
+    Runs the full pipeline once on a short synthetic signal (a tone plus
+    clicks), so the first real track does not pay multiple seconds of
+    JIT compilation. Safe to use as a process pool initializer.
+    """
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * 440.0 * t)
+    signal[::sample_rate // 2] += 1.0
+    with warnings.catch_warnings():
+        # The signal is too short for the lowest CQT octaves; only compilation matters here
+        warnings.simplefilter("ignore")
+        analyze_audio_data(signal.astype(np.float32), sample_rate)
+
+def init_worker(warm: bool = False, analyzer_workers: int = None):
+    """
+    Process pool initializer: optionally `warmup`, then the instrumentation settings from the environment.
+    `analyzer_workers` caps the analyzer threads per track unless ANALYZER_WORKERS is already set.
+    """
+    if analyzer_workers is not None:
+        os.environ.setdefault("ANALYZER_WORKERS", str(analyzer_workers))
+    if warm:
+        warmup()
+    configure_from_env()
+
+
+def analyze_features(features, segments: bool = False, analyzers=None, workers: int = None) -> Dict[str, Any]:
+    """
+    Run analyzers against a feature context (whole-file or streaming).
+
+    `analyzers` names a subset of the registry (default: the built-ins), and
+    only the features those need are computed, on `workers` threads (see
+    analyzer_registry). With `segments`, also add sliding-window key/tempo tracks.
+    """
+    names = list(analyzers or DEFAULT_ANALYZERS)
+    if segments and "segments" not in names:
+        names.append("segments")
+    output = get_standardized_output()
+    for partial in run_analyzers(features, names, workers).values():
+        merge_output(output, partial)
+    return output
+
+def with_timings(analyze, *args, **kwargs) -> Dict[str, Any]:
+    """
+    Call `analyze(*args, **kwargs)` and attach a "timings" section listing every
+    stage it ran (decode, feature transforms, analyzers, LLM calls)
+    """
+    with collect() as records:
+        output = analyze(*args, **kwargs)
+    output["timings"] = summarize_timings(records)
+    return output
+
+def analyze_audio_data(audio_data: np.ndarray, sample_rate: int, timings: bool = False,
+                       decode_info: Dict[str, Any] = None, segments: bool = False,
+                       analyzers=None) -> Dict[str, Any]:
+    """
+    Common analysis function for all audio data
+    """
+    if audio_data is None or sample_rate is None:
+        return get_standardized_output()
+    if timings:
+        return with_timings(analyze_audio_data, audio_data, sample_rate, decode_info=decode_info, segments=segments,
+                            analyzers=analyzers)
+
+    # Shared feature context so each transform runs once per track
+    output = analyze_features(AudioFeatures(audio_data, sample_rate), segments, analyzers)
+    if decode_info is not None:
+        output["decode"] = decode_info
+    return output
+
+def analyze_audio_source(source, profile=None, timings: bool = False, segments: bool = False,
+                         analyzers=None) -> Dict[str, Any]:
+    """
+    Decode a path, file-like object or bytes with a decode profile and analyze it.
+    The profile used is recorded in the output's "decode" section.
+    """
+    if timings:
+        return with_timings(analyze_audio_source, source, profile, segments=segments, analyzers=analyzers)
+    audio_data, sample_rate, decode_info = decode_audio(source, profile)
+    return analyze_audio_data(audio_data, sample_rate, decode_info=decode_info, segments=segments,
+                              analyzers=analyzers)
+
+def analyze_audio_stream(source, block_length: int = DEFAULT_BLOCK_LENGTH, timings: bool = False,
+                         segments: bool = False, analyzers=None) -> Dict[str, Any]:
+    """
+    Analyze a path or file-like object block by block, without decoding it whole
+    """
+    if timings:
+        return with_timings(analyze_audio_stream, source, block_length, segments=segments, analyzers=analyzers)
+    with stage("decode", profile="streaming") as record:
+        features = stream_features(source, block_length, track_segments=segments)
+        record["input_duration"] = features.duration
+    output = analyze_features(features, segments, analyzers)
+    output["decode"] = {"name": "streaming", "sample_rate": features.sample_rate, "block_length": block_length,
+                        "analyzed_seconds": round(features.duration, 3)}
+    return output
@@ -0,0 +1,194 @@
+import numpy as np
+import librosa
+from functools import cached_property
+from instrumentation import instrumented
+
+N_FFT = 2048
+HOP_LENGTH = 512
+BINS_PER_OCTAVE = 36
+N_OCTAVES = 7
+
+
+class AudioFeatures:
+    """
+    Per-track feature context shared by all analyzers.
+
+    Every intermediate representation (STFT, CQT, HPSS, onset envelope, RMS,
+    spectral descriptors) is computed lazily on first access and cached, so a
+    track is transformed at most once no matter how many analyzers read it.
+    """
+
+    # Features each feature reads, so a scheduler can compute independent ones
+    # in parallel (see analyzer_registry); keep in sync with the properties below
+    DEPENDENCIES = {
+        "stft": (),
+        "stft_magnitude": ("stft",),
+        "stft_power": ("stft_magnitude",),
+        "tuning": ("stft_magnitude",),
+        "cqt": ("tuning",),
+        "hpss": ("stft",),
+        "harmonic": ("hpss",),
+        "harmonic_cqt": ("harmonic", "tuning"),
+        "chroma_cqt": ("cqt",),
+        "chroma_stft": ("stft_power",),
+        "chroma_harmonic": ("harmonic_cqt",),
+        "chroma_cqt_mean": ("chroma_cqt",),
+        "chroma_stft_mean": ("chroma_stft",),
+        "chroma_harmonic_mean": ("chroma_harmonic",),
+        "onset_envelope": ("stft_power",),
+        "tempo": ("onset_envelope",),
+        "rms": (),
+        "spectral_centroid": ("stft_magnitude",),
+        "spectral_rolloff": ("stft_magnitude",),
+        "spectral_bandwidth": ("stft_magnitude",),
+        "rms_mean": ("rms",),
+        "spectral_centroid_mean": ("spectral_centroid",),
+        "spectral_rolloff_mean": ("spectral_rolloff",),
+        "spectral_bandwidth_mean": ("spectral_bandwidth",),
+    }
+
+    def __init__(self, audio_data: np.ndarray, sample_rate: int):
+        self.audio_data = audio_data
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio_data) / self.sample_rate
+
+    @cached_property
+    @instrumented("features.stft")
+    def stft(self) -> np.ndarray:
+        """Complex STFT shared by the spectral, onset and HPSS features."""
+        return librosa.stft(self.audio_data, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+    @cached_property
+    def stft_magnitude(self) -> np.ndarray:
+        return np.abs(self.stft)
+
+    @cached_property
+    def stft_power(self) -> np.ndarray:
+        return self.stft_magnitude ** 2
+
+    @cached_property
+    def tuning(self) -> float:
+        return float(librosa.estimate_tuning(
+            S=self.stft_magnitude, sr=self.sample_rate, n_fft=N_FFT, bins_per_octave=BINS_PER_OCTAVE
+        ))
+
+    def _cqt_magnitude(self, audio_data: np.ndarray) -> np.ndarray:
+        return np.abs(librosa.cqt(
+            audio_data,
+            sr=self.sample_rate,
+            hop_length=HOP_LENGTH,
+            n_bins=N_OCTAVES * BINS_PER_OCTAVE,
+            bins_per_octave=BINS_PER_OCTAVE,
+            tuning=self.tuning,
+        ))
+
+    @cached_property
+    @instrumented("features.cqt")
+    def cqt(self) -> np.ndarray:
+        """CQT magnitude of the full signal."""
+        return self._cqt_magnitude(self.audio_data)
+
+    @cached_property
+    @instrumented("features.hpss")
+    def hpss(self):
+        """Harmonic and percussive STFT components."""
+        return librosa.decompose.hpss(self.stft)
+
+    @cached_property
+    @instrumented("features.harmonic")
+    def harmonic(self) -> np.ndarray:
+        """Time-domain harmonic signal, reconstructed from the shared STFT."""
+        harmonic_stft, _ = self.hpss
+        return librosa.istft(harmonic_stft, hop_length=HOP_LENGTH, length=len(self.audio_data))
+
+    @cached_property
+    @instrumented("features.harmonic_cqt")
+    def harmonic_cqt(self) -> np.ndarray:
+        return self._cqt_magnitude(self.harmonic)
+
+    @cached_property
+    def chroma_cqt(self) -> np.ndarray:
+        return librosa.feature.chroma_cqt(C=self.cqt, sr=self.sample_rate, hop_length=HOP_LENGTH,
+                                          n_chroma=12, bins_per_octave=BINS_PER_OCTAVE)
+
+    @cached_property
+    def chroma_stft(self) -> np.ndarray:
+        return librosa.feature.chroma_stft(S=self.stft_power, sr=self.sample_rate, n_fft=N_FFT,
+                                           hop_length=HOP_LENGTH, n_chroma=12)
+
+    @cached_property
+    def chroma_harmonic(self) -> np.ndarray:
+        return librosa.feature.chroma_cqt(C=self.harmonic_cqt, sr=self.sample_rate, hop_length=HOP_LENGTH,
+                                          n_chroma=12, bins_per_octave=BINS_PER_OCTAVE)
+
+    @cached_property
+    def chroma_cqt_mean(self) -> np.ndarray:
+        return np.mean(self.chroma_cqt, axis=1)
+
+    @cached_property
+    def chroma_stft_mean(self) -> np.ndarray:
+        return np.mean(self.chroma_stft, axis=1)
+
+    @cached_property
+    def chroma_harmonic_mean(self) -> np.ndarray:
+        return np.mean(self.chroma_harmonic, axis=1)
+
+    @cached_property
+    @instrumented("features.onset_envelope")
+    def onset_envelope(self) -> np.ndarray:
+        mel = librosa.feature.melspectrogram(S=self.stft_power, sr=self.sample_rate)
+        return librosa.onset.onset_strength(S=librosa.power_to_db(mel), sr=self.sample_rate,
+                                            hop_length=HOP_LENGTH)
+
+    @cached_property
+    @instrumented("features.tempo")
+    def tempo(self) -> float:
+        """Global tempo estimate in BPM, median-aggregated over the onset envelope."""
+        tempo = librosa.feature.tempo(onset_envelope=self.onset_envelope, sr=self.sample_rate,
+                                      hop_length=HOP_LENGTH, aggregate=np.median)
+        return float(tempo[0])
+
+    @cached_property
+    def rms(self) -> np.ndarray:
+        return librosa.feature.rms(y=self.audio_data, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+
+    @cached_property
+    def spectral_centroid(self) -> np.ndarray:
+        return librosa.feature.spectral_centroid(S=self.stft_magnitude, sr=self.sample_rate, n_fft=N_FFT,
+                                                 hop_length=HOP_LENGTH)[0]
+
+    @cached_property
+    def spectral_rolloff(self) -> np.ndarray:
+        return librosa.feature.spectral_rolloff(S=self.stft_magnitude, sr=self.sample_rate, n_fft=N_FFT,
+                                                hop_length=HOP_LENGTH)[0]
+
+    @cached_property
+    def spectral_bandwidth(self) -> np.ndarray:
+        return librosa.feature.spectral_bandwidth(S=self.stft_magnitude, sr=self.sample_rate, n_fft=N_FFT,
+                                                  hop_length=HOP_LENGTH)[0]
+
+    @cached_property
+    def rms_mean(self) -> float:
+        return float(np.mean(self.rms))
+
+    @cached_property
+    def spectral_centroid_mean(self) -> float:
+        return float(np.mean(self.spectral_centroid))
+
+    @cached_property
+    def spectral_rolloff_mean(self) -> float:
+        return float(np.mean(self.spectral_rolloff))
+
+    @cached_property
+    def spectral_bandwidth_mean(self) -> float:
+        return float(np.mean(self.spectral_bandwidth))
+
+
+def get_features(audio_data: np.ndarray, sample_rate: int, features: AudioFeatures = None) -> AudioFeatures:
+    """Return the shared feature context, creating one if the caller did not pass it."""
+    if features is None:
+        features = AudioFeatures(audio_data, sample_rate)
+    return features
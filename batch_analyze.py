@@ -0,0 +1,339 @@
+"""
+Headless batch analysis over directories of audio files.
+
+Usage:
+    python batch_analyze.py <dir-or-manifest> [...] -o results.jsonl [--workers N]
+
+Each input is either a directory (walked recursively for audio files) or a
+manifest file listing one audio path per line. Every track is analyzed with
+`analyze_audio_data` in a process pool and written as one JSON Lines record.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Iterator, List
+from result_cache import DEFAULT_CACHE_PATH
+from decode_profiles import DECODE_PROFILES, DEFAULT_DECODE_PROFILE
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac")
+
+_result_cache = None  # per worker process
+
+
+def iter_audio_paths(inputs: List[str]) -> Iterator[str]:
+    """Yield audio file paths from directories and manifest files."""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item, "r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    yield line if os.path.isabs(line) else os.path.join(base, line)
+
+
+def _get_result_cache(cache_path: str):
+    global _result_cache
+    if _result_cache is None or _result_cache.path != cache_path:
+        from result_cache import ResultCache
+        _result_cache = ResultCache(cache_path)
+    return _result_cache
+
+
+def analyze_path(path: str, streaming: bool = False, cache_path: str = None,
+                 timings: bool = False, profile: str = DEFAULT_DECODE_PROFILE,
+                 segments: bool = False, analyzers: List[str] = None) -> Dict[str, Any]:
+    """Analyze one file inside a worker process. Never raises."""
+    if timings:
+        from instrumentation import collect, summarize_timings
+        with collect() as records:
+            record = analyze_path(path, streaming, cache_path, profile=profile, segments=segments,
+                                  analyzers=analyzers)
+        record["timings"] = summarize_timings(records)
+        return record
+
+    from audio_analysis import ANALYZER_VERSION, analyze_audio_source, analyze_audio_stream
+    from decode_profiles import get_decode_profile
+    from result_cache import hash_file, make_cache_key
+
+    started = time.perf_counter()
+    try:
+        cache = cache_key = None
+        if cache_path:
+            cache = _get_result_cache(cache_path)
+            params = {"streaming": True} if streaming else {"streaming": False, "decode": get_decode_profile(profile)}
+            if segments:
+                params["segments"] = True
+            if analyzers:
+                params["analyzers"] = sorted(analyzers)
+            cache_key = make_cache_key(hash_file(path), ANALYZER_VERSION, params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return {
+                    "path": path,
+                    "status": "ok",
+                    "cached": True,
+                    "elapsed": time.perf_counter() - started,
+                    "result": cached,
+                }
+
+        if streaming:
+            result = analyze_audio_stream(path, segments=segments, analyzers=analyzers)
+        else:
+            result = analyze_audio_source(path, profile, segments=segments, analyzers=analyzers)
+        duration = result["decode"]["analyzed_seconds"]
+        if cache is not None:
+            cache.put(cache_key, result)
+        return {
+            "path": path,
+            "status": "ok",
+            "duration": duration,
+            "elapsed": time.perf_counter() - started,
+            "result": result,
+        }
+    except Exception as e:
+        return {
+            "path": path,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+            "elapsed": time.perf_counter() - started,
+        }
+
+
+def _error_record(path: str, message: str) -> Dict[str, Any]:
+    return {"path": path, "status": "error", "error": message}
+
+
+def run_batch(paths: Iterator[str], output, workers: int, max_in_flight: int,
+              max_tasks_per_child: int = None, quiet: bool = False,
+              streaming: bool = False, cache_path: str = None, warmup: bool = False,
+              timings: bool = False, profile: str = DEFAULT_DECODE_PROFILE,
+              segments: bool = False, vector_store=None, analyzers: List[str] = None,
+              exporter=None) -> Dict[str, Any]:
+    """
+    Analyze `paths` on a process pool and write one JSON line per track.
+
+    At most `max_in_flight` tracks are submitted at once, so decoded audio
+    held in memory is bounded by the in-flight count rather than the folder
+    size; with `streaming` each worker also decodes block by block, so a
+    single long track never needs to fit in memory. A crashed worker (e.g.
+    killed by the OOM killer) takes the whole pool down, so the pool is
+    restarted and every track that was in flight is retried on its own; only
+    a track that crashes a worker by itself is reported as an error. With
+    `cache_path`, tracks already in the result cache are returned without
+    being decoded. With `warmup`, each worker compiles librosa's kernels
+    once at start-up. With `timings`, each record gets a per-stage "timings" section (decode, features, analyzers).
+    `profile` names the decode profile (sample rate, resampler, excerpts).
+    With `segments`, results include sliding-window key/tempo tracks.
+    With `vector_store` (a feature_store.VectorStore), each track's feature
+    vector is appended to it under the track's path. `analyzers` limits each
+    track to a subset of the analyzer registry, computing only the features
+    those analyzers need. With an `exporter` (instrumentation.PrometheusExporter),
+    each worker's stage timings are counted there, whether or not `timings`
+    adds them to the records.
+    """
+    stats = {"ok": 0, "error": 0, "audio_seconds": 0.0}
+    started = time.perf_counter()
+    paths = iter(paths)
+    pending = {}
+    suspects = deque()  # in flight when a worker died; retried one at a time
+
+    def new_pool():
+        from audio_analysis import init_worker
+        return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_tasks_per_child,
+                                   initializer=init_worker, initargs=(warmup,))
+
+    def report(record):
+        if exporter is not None and "timings" in record:
+            exporter.add_timings(record["timings"])
+            if not timings:
+                del record["timings"]
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        stats[record["status"]] += 1
+        if vector_store is not None and "feature_vector" in record.get("result", {}):
+            vector_store.add(record["path"], record["result"]["feature_vector"])
+        stats["audio_seconds"] += record.get("duration", 0.0)
+        if not quiet:
+            done = stats["ok"] + stats["error"]
+            elapsed = time.perf_counter() - started
+            print(
+                f"[{done}] {record['status']:5s} {record['path']} | "
+                f"{done / elapsed:.2f} files/s, {stats['audio_seconds'] / elapsed:.1f}x realtime, "
+                f"{stats['error']} errors",
+                file=sys.stderr,
+            )
+
+    pool = new_pool()
+
+    def submit(path):
+        try:
+            pending[pool.submit(analyze_path, path, streaming, cache_path, timings or exporter is not None,
+                                profile, segments, analyzers)] = path
+        except BrokenProcessPool:
+            # A worker died after the last wait(); the pool takes no new work until it is replaced
+            suspects.append(path)
+            restart()
+
+    def restart():
+        # Whichever track killed the worker, every in-flight job died with the pool: start a
+        # fresh pool and queue them all as suspects
+        nonlocal pool
+        suspects.extend(pending.values())
+        pending.clear()
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = new_pool()
+
+    try:
+        exhausted = False
+        while pending or suspects or not exhausted:
+            alone = bool(suspects)
+            if alone:
+                # Nothing else runs while a suspect is retried, so a crash now can only be its own
+                if not pending:
+                    submit(suspects.popleft())
+            else:
+                while not exhausted and len(pending) < max_in_flight:
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    submit(path)
+
+            if not pending:
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    report(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    if alone:
+                        report(_error_record(path, "Worker process died while analyzing this file"))
+                    else:
+                        suspects.append(path)
+                except Exception as e:
+                    report(_error_record(path, f"{type(e).__name__}: {e}"))
+
+            if broken:
+                restart()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if vector_store is not None:
+            vector_store.flush()
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--memory", action="store_true",
+                        help="Trace peak allocation per stage (in timings, logs and metrics; adds overhead)")
+    parser.add_argument("--log-stages", action="store_true",
+                        help="Log one JSON line per finished stage to stderr")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="Serve per-stage Prometheus metrics on this port at /metrics")
+
+
+def configure_instrumentation(args):
+    """
+    Apply the instrumentation flags; returns the Prometheus exporter, if any.
+
+    The flags are passed to worker processes through the environment.
+    """
+    from instrumentation import (LOG_STAGES_ENV, TRACE_MEMORY_ENV, PrometheusExporter, configure_from_env,
+                                 start_prometheus_server)
+    if args.memory:
+        os.environ[TRACE_MEMORY_ENV] = "1"
+    if args.log_stages:
+        os.environ[LOG_STAGES_ENV] = "1"
+    configure_from_env()
+    if args.metrics_port is None:
+        return None
+    _, exporter = start_prometheus_server(args.metrics_port, PrometheusExporter())
+    print(f"Serving metrics on port {args.metrics_port} at /metrics", file=sys.stderr)
+    return exporter
+
+
+def main(argv=None):
+    from analyzer_registry import ANALYZERS, DEFAULT_ANALYZERS
+    parser = argparse.ArgumentParser(description="Batch audio analysis to JSON Lines")
+    parser.add_argument("inputs", nargs="+", help="Directories to walk or manifest files with one path per line")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of cores)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Maximum tracks decoded at once (default: number of workers)")
+    parser.add_argument("--max-tasks-per-child", type=int, default=None,
+                        help="Recycle each worker after this many tracks to release memory")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Decode block by block so memory is bounded by the block size, not track length")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None, metavar="PATH",
+                        help="Reuse and store results in the on-disk result cache")
+    parser.add_argument("--warmup", action="store_true",
+                        help="Compile librosa/numba kernels in each worker before taking tracks")
+    parser.add_argument("--profile", choices=sorted(DECODE_PROFILES), default=DEFAULT_DECODE_PROFILE,
+                        help="Decode profile: analysis sample rate, resampler and excerpt sampling "
+                             f"(default: {DEFAULT_DECODE_PROFILE}; ignored with --streaming)")
+    parser.add_argument("--segments", action="store_true",
+                        help="Add key and tempo tracks over sliding windows")
+    parser.add_argument("--timings", action="store_true",
+                        help="Add per-stage wall/CPU timings to every record")
+    parser.add_argument("--vectors", metavar="DIR", default=None,
+                        help="Append each track's feature vector to this vector store for similarity search")
+    parser.add_argument("--analyzers", nargs="+", choices=sorted(ANALYZERS), default=None, metavar="NAME",
+                        help=f"Only run these analyzers (default: {' '.join(DEFAULT_ANALYZERS)}; "
+                             f"available: {' '.join(sorted(ANALYZERS))})")
+    add_instrumentation_arguments(parser)
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    max_in_flight = max(1, args.max_in_flight or workers)
+    if workers > 1:
+        # Tracks already run in parallel; one analyzer thread per worker avoids oversubscribing cores
+        os.environ.setdefault("ANALYZER_WORKERS", "1")
+
+    exporter = configure_instrumentation(args)
+    if args.vectors:
+        from feature_store import VectorStore
+    output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        stats = run_batch(iter_audio_paths(args.inputs), output, workers, max_in_flight,
+                          args.max_tasks_per_child, args.quiet, args.streaming,
+                          args.cache, args.warmup, args.timings, args.profile, args.segments,
+                          VectorStore(args.vectors) if args.vectors else None, args.analyzers, exporter)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    total = stats["ok"] + stats["error"]
+    elapsed = stats["elapsed"]
+    print(
+        f"Analyzed {total} files ({stats['error']} errors) in {elapsed:.1f}s: "
+        f"{total / elapsed if elapsed else 0.0:.2f} files/s, "
+        f"{stats['audio_seconds'] / elapsed if elapsed else 0.0:.1f}x realtime",
+        file=sys.stderr,
+    )
+    return 1 if stats["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Synthetic audio fixtures with known ground truth.
+
+Every fixture is generated deterministically from its spec, so benchmarks
+need no audio files and child processes can rebuild the signal locally
+instead of receiving it over a pipe.
+"""
+from typing import Dict, Any, List
+import numpy as np
+
+SAMPLE_RATE = 22050
+
+PITCH_CLASSES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+MAJOR_TRIAD = (0, 4, 7)
+MINOR_TRIAD = (0, 3, 7)
+# I-IV-V-I and i-iv-v-i as (root offset, triad)
+PROGRESSIONS = {
+    "major": [(0, MAJOR_TRIAD), (5, MAJOR_TRIAD), (7, MAJOR_TRIAD), (0, MAJOR_TRIAD)],
+    "minor": [(0, MINOR_TRIAD), (5, MINOR_TRIAD), (7, MINOR_TRIAD), (0, MINOR_TRIAD)],
+}
+
+DURATIONS = {"30s": 30.0, "2m": 120.0, "10m": 600.0, "60m": 3600.0}
+QUICK_DURATIONS = ("30s", "2m")
+
+
+def _midi_to_hz(note: float) -> float:
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+
+def click_track(bpm: float, duration: float, sr: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """Decaying noise bursts on every beat, accented on the downbeat."""
+    rng = np.random.default_rng(seed)
+    n = int(duration * sr)
+    y = np.zeros(n, dtype=np.float32)
+    burst_len = int(0.03 * sr)
+    envelope = np.exp(-np.arange(burst_len) / (0.004 * sr)).astype(np.float32)
+    burst = rng.standard_normal(burst_len).astype(np.float32) * envelope
+    period = 60.0 / bpm
+    for i, t in enumerate(np.arange(0.0, duration, period)):
+        start = int(t * sr)
+        stop = min(n, start + burst_len)
+        y[start:stop] += burst[:stop - start] * (1.0 if i % 4 == 0 else 0.6)
+    return y
+
+
+def chord_progression(tonic: str, mode: str, duration: float, sr: int = SAMPLE_RATE,
+                      chord_seconds: float = 2.0) -> np.ndarray:
+    """Repeating I-IV-V-I (or i-iv-v-i) with harmonic-rich tones and a bass root."""
+    n = int(duration * sr)
+    y = np.zeros(n, dtype=np.float32)
+    chord_len = int(chord_seconds * sr)
+    t = np.arange(chord_len) / sr
+    fade = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.02)
+    tonic_midi = 60 + PITCH_CLASSES.index(tonic)
+
+    chords = []
+    for offset, triad in PROGRESSIONS[mode]:
+        tone = np.zeros(chord_len)
+        for interval in triad:
+            f0 = _midi_to_hz(tonic_midi + offset + interval)
+            for harmonic in range(1, 4):
+                tone += np.sin(2 * np.pi * f0 * harmonic * t) / harmonic ** 1.5
+        tone += 0.8 * np.sin(2 * np.pi * _midi_to_hz(tonic_midi + offset - 24) * t)
+        chords.append((0.08 * tone * fade).astype(np.float32))
+
+    for i, start in enumerate(range(0, n, chord_len)):
+        chord = chords[i % len(chords)]
+        stop = min(n, start + chord_len)
+        y[start:stop] = chord[:stop - start]
+    return y
+
+
+def hihat_noise(duration: float, sr: int = SAMPLE_RATE, seed: int = 1) -> np.ndarray:
+    """Bright high-passed noise, standing in for cymbals/hi-hats."""
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(int(duration * sr)).astype(np.float32)
+    # First-difference twice: a cheap steep high-pass
+    return 0.5 * np.diff(noise, n=2, prepend=[0.0, 0.0]).astype(np.float32)
+
+
+def fixture_specs(durations=QUICK_DURATIONS) -> List[Dict[str, Any]]:
+    """Fixture specs with ground truth; `truth` keys are only set where the answer is unambiguous."""
+    specs = []
+    for label in durations:
+        seconds = DURATIONS[label]
+        for bpm in (90, 128, 174):
+            specs.append({"name": f"click_{bpm}bpm_{label}", "kind": "click", "bpm": bpm,
+                          "duration": seconds, "truth": {"bpm": bpm}})
+        for tonic, mode in (("C", "major"), ("A", "minor"), ("F#", "major"), ("D", "minor")):
+            specs.append({"name": f"chords_{tonic}{mode}_{label}", "kind": "chords", "tonic": tonic,
+                          "mode": mode, "duration": seconds,
+                          "truth": {"key": f"{tonic} {mode}",
+                                    "instruments": ["Low-frequency instruments (possibly bass)"],
+                                    "moods": ["Dark"]}})
+        specs.append({"name": f"mix_Gmajor_128bpm_{label}", "kind": "mix", "tonic": "G", "mode": "major",
+                      "bpm": 128, "duration": seconds,
+                      "truth": {"key": "G major", "bpm": 128, "moods": ["Energetic"]}})
+        specs.append({"name": f"hats_{label}", "kind": "hats", "duration": seconds,
+                      "truth": {"instruments": ["High-frequency instruments (possibly cymbals/hi-hats)"],
+                                "moods": ["Bright"]}})
+    return specs
+
+
+def render(spec: Dict[str, Any], sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Generate the signal for a fixture spec."""
+    kind, duration = spec["kind"], spec["duration"]
+    if kind == "click":
+        y = click_track(spec["bpm"], duration, sr)
+    elif kind == "chords":
+        y = chord_progression(spec["tonic"], spec["mode"], duration, sr)
+    elif kind == "mix":
+        y = chord_progression(spec["tonic"], spec["mode"], duration, sr) * 3.0
+        y += click_track(spec["bpm"], duration, sr)
+        y += 0.05 * hihat_noise(duration, sr)
+    elif kind == "hats":
+        y = hihat_noise(duration, sr)
+    else:
+        raise ValueError(f"Unknown fixture kind: {kind}")
+    return np.clip(y, -1.0, 1.0).astype(np.float32)
@@ -0,0 +1,80 @@
+"""
+Cold-start budget for a worker that only needs `estimate_tempo`.
+
+Each measurement runs in a fresh interpreter so nothing is already
+imported or compiled. Reports import time, time to the first tempo
+estimate, and which heavy UI/LLM modules got pulled in; exits non-zero
+when a budget is exceeded.
+
+Usage:
+    python benchmarks/import_budget.py [--runs 3] [--import-budget 0.5] [--first-call-budget 4.0]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET = 0.5  # seconds to import the analyzer
+FIRST_CALL_BUDGET = 4.0  # seconds from interpreter start of import to first result
+FORBIDDEN_MODULES = ("streamlit", "openai", "httpx", "pydantic", "librosa.beat")
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from tempo_analyzer import estimate_tempo
+imported = time.perf_counter()
+import numpy as np
+signal = np.random.default_rng(0).standard_normal(22050 * 2).astype(np.float32)
+estimate_tempo(signal, 22050)
+finished = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "first_call_seconds": finished - started,
+    "loaded_modules": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def measure_once() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD % (FORBIDDEN_MODULES,)],
+        cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(runs: int = 3) -> dict:
+    """Best-of-`runs` cold-start numbers, plus any heavy modules loaded."""
+    samples = [measure_once() for _ in range(runs)]
+    return {
+        "import_seconds": min(s["import_seconds"] for s in samples),
+        "first_call_seconds": min(s["first_call_seconds"] for s in samples),
+        "loaded_modules": sorted({m for s in samples for m in s["loaded_modules"]}),
+        "runs": runs,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET)
+    parser.add_argument("--first-call-budget", type=float, default=FIRST_CALL_BUDGET)
+    args = parser.parse_args(argv)
+
+    report = measure(max(1, args.runs))
+    report["import_budget"] = args.import_budget
+    report["first_call_budget"] = args.first_call_budget
+    report["within_budget"] = (
+        report["import_seconds"] <= args.import_budget
+        and report["first_call_seconds"] <= args.first_call_budget
+        and not report["loaded_modules"]
+    )
+    print(json.dumps(report, indent=2))
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Load test of the LLM lookup path against a local mock provider.
+
+Starts `mock_llm_server.MockLLMServer`, points Perplexity and OpenAI at it,
+and drives N concurrent simulated users through
+`analyze_text_with_llms_async` on the shared HTTP loop, the same way the
+Streamlit app and job queue call it. Each user sends one lookup at a time
+(plus optional think time). Reports lookup latency percentiles, throughput,
+which provider's answer was used, client-side HTTP attempts and statuses,
+and the faults the server injected.
+
+Every lookup asks for a different song by default, so the lookup cache is
+bypassed; `--songs K` cycles through K songs instead, to measure cache and
+in-flight de-duplication. The lookup cache is written to a temporary
+file, never the user's cache. Retry behaviour follows the usual
+LLM_HTTP_* environment variables.
+
+Usage:
+    python benchmarks/llm_load_test.py --users 1 8 32 --requests 200
+    python benchmarks/llm_load_test.py --users 16 --duration 60 --latency lognormal:2:0.6 \\
+        --rate-limit 10 --retry-after 1 --malformed 0.05 --hang 0.01 --deadline 20
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from mock_llm_server import OPENAI_ANSWER, PERPLEXITY_ANSWER, add_server_arguments, server_from_args  # noqa: E402
+
+
+def song_prompt(i: int, songs: int = 0) -> str:
+    """The i-th lookup's prompt; with `songs`, cycles through that many distinct songs."""
+    n = i % songs if songs else i
+    return f"Load Test Song {n} by Mock Artist {n % 97}"
+
+
+def outcome(result: Dict[str, Any]) -> str:
+    """Which provider's answer the lookup returned ("perplexity", "openai" or "empty")."""
+    if result.get("key") == PERPLEXITY_ANSWER["key"]:
+        return "perplexity"
+    if result.get("key") == OPENAI_ANSWER["musical_key"]:
+        return "openai"
+    return "empty"
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000
+    return {"p50": round(float(np.percentile(values, 50)), 1), "p95": round(float(np.percentile(values, 95)), 1),
+            "p99": round(float(np.percentile(values, 99)), 1), "max": round(float(values.max()), 1),
+            "mean": round(float(values.mean()), 1)}
+
+
+def run_level(users: int, requests: int, duration: float, deadline: float, think_time: float,
+              songs: int, offset: int) -> Dict[str, Any]:
+    """Drive `users` concurrent users until `requests` lookups are done or `duration` seconds pass."""
+    from llm_analyzers import analyze_text_with_llms_async
+    from instrumentation import collect
+    from models.http_client import run_sync
+
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, outcomes, errors = [], Counter(), Counter()
+    attempts, statuses, providers = Counter(), Counter(), defaultdict(Counter)
+    end = time.perf_counter() + duration if duration else None
+
+    def user():
+        while True:
+            with lock:
+                i = next(counter)
+            if (requests and i >= requests) or (end is not None and time.perf_counter() >= end):
+                return
+            started = time.perf_counter()
+            with collect() as records:
+                try:
+                    result = outcome(run_sync(analyze_text_with_llms_async(song_prompt(offset + i, songs),
+                                                                           deadline)))
+                except Exception as e:
+                    result = "error"
+                    with lock:
+                        errors[type(e).__name__] += 1
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                outcomes[result] += 1
+                for record in records:
+                    if record["stage"] == "llm.http":
+                        attempts[record["labels"].get("attempts", 1)] += 1
+                        statuses[str(record["labels"].get("status", record["error"]))] += 1
+                    elif record["stage"].startswith("llm."):
+                        providers[record["stage"][len("llm."):]][record["error"] or "ok"] += 1
+            if think_time:
+                time.sleep(think_time)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix="user") as pool:
+        for future in [pool.submit(user) for _ in range(users)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    calls = sum(attempts.values())
+    return {
+        "users": users,
+        "lookups": len(latencies),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "outcomes": dict(outcomes),
+        "errors": dict(errors),
+        # Provider calls that returned vs. hit the deadline (TimeoutError) or failed
+        "providers": {name: dict(results) for name, results in sorted(providers.items())},
+        "http": {
+            "calls": calls,
+            "attempts_per_call": round(sum(n * count for n, count in attempts.items()) / calls, 2)
+            if calls else 0.0,
+            # Final status of each provider call, or the exception that ended it
+            # (CancelledError: abandoned at the deadline or once Perplexity answered)
+            "final_status": dict(statuses),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32],
+                        help="Concurrent users; several values run one level after another")
+    parser.add_argument("--requests", type=int, default=100, help="Lookups per level (0: until --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds per level (0: until --requests)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds each user waits between lookups")
+    parser.add_argument("--songs", type=int, default=0,
+                        help="Cycle through this many distinct songs (default: every lookup is new)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Per-provider deadline in seconds (default: LLM_HTTP_DEADLINE)")
+    parser.add_argument("--max-connections", type=int, default=None,
+                        help="HTTP connection pool size (default: the app's)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Keep the providers' console output")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    if not args.requests and not args.duration:
+        parser.error("one of --requests or --duration must be non-zero")
+
+    with tempfile.TemporaryDirectory() as directory, server_from_args(args) as server:
+        # Must be set before the providers are imported, which read them once
+        os.environ.update({
+            "PERPLEXITY_BASE_URL": server.url, "OPENAI_BASE_URL": server.url,
+            "PERPLEXITY_API_KEY": "mock", "OPENAI_API_KEY": "mock",
+            "LLM_LOOKUP_CACHE": os.path.join(directory, "lookups.sqlite3"),
+        })
+        import models.http_client as http_client
+        if args.max_connections:
+            http_client._backend = http_client.AsyncHTTPBackend(max_connections=args.max_connections,
+                                                                max_keepalive=args.max_connections)
+        deadline = http_client.DEFAULT_DEADLINE if args.deadline is None else args.deadline
+
+        report = {"server": {"latency": args.latency, "rate_429": args.rate_429, "rate_500": args.rate_500,
+                             "rate_limit": args.rate_limit, "malformed": args.malformed, "hang": args.hang},
+                  "deadline": deadline, "levels": []}
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        offset = 0
+        with quiet:
+            for users in args.users:
+                server.stats.clear()
+                level = run_level(users, args.requests, args.duration, deadline, args.think_time, args.songs,
+                                  offset)
+                level["server"] = dict(server.stats)
+                report["levels"].append(level)
+                offset += level["lookups"]
+                print(f"{users} users: p50 {level['latency_ms'].get('p50')} ms, "
+                      f"p99 {level['latency_ms'].get('p99')} ms, {level['throughput_per_second']}/s",
+                      file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
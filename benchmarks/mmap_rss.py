@@ -0,0 +1,105 @@
+"""
+Peak-RSS comparison of the librosa and memory-mapped WAV decode paths.
+
+Writes (or reuses) a large 16-bit stereo WAV and decodes it in a fresh
+process per method, reporting peak resident memory, wall time and the size
+of the decoded signal. A method the machine cannot fit is reported as
+killed rather than failing the run.
+
+Usage:
+    python benchmarks/mmap_rss.py [--size-gb 2] [--path big.wav] [--methods librosa mmap]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+METHODS = {
+    # Decoded at the default 22050 Hz analysis rate, as process_audio_file does
+    "librosa": "import librosa; audio, sr = librosa.load(PATH, sr=22050)",
+    "mmap": "from decode_profiles import decode_audio; audio, sr, _ = decode_audio(PATH)",
+    "mmap-native": "from wav_mmap import open_pcm; audio, sr = open_pcm(PATH).load()",
+}
+
+_CHILD = """
+import json, resource, sys, time
+PATH = %r
+started = time.perf_counter()
+%s
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "elapsed": elapsed,
+    "output_mb": audio.nbytes / 2 ** 20,
+    "output_seconds": len(audio) / sr,
+}))
+"""
+
+_BASELINE = "import numpy, librosa, soxr; audio, sr = numpy.zeros(1, dtype=numpy.float32), 1"
+
+
+def write_test_wav(path: str, size_gb: float, sample_rate: int = 44100, block_seconds: float = 60.0):
+    """Tone plus noise, 16-bit stereo, written block by block."""
+    import soundfile as sf
+    frames = int(size_gb * 2 ** 30 / 4)
+    block = int(block_seconds * sample_rate)
+    rng = np.random.default_rng(0)
+    with sf.SoundFile(path, "w", samplerate=sample_rate, channels=2, subtype="PCM_16",
+                      format="RF64" if size_gb >= 4 else "WAV") as f:
+        for start in range(0, frames, block):
+            n = min(block, frames - start)
+            t = (start + np.arange(n)) / sample_rate
+            tone = 0.3 * np.sin(2 * np.pi * 220.0 * t)
+            f.write(np.stack([tone, tone], axis=1) + 0.05 * rng.standard_normal((n, 2)))
+
+
+def measure(path: str, method: str) -> dict:
+    code = _BASELINE if method == "baseline" else METHODS[method]
+    result = subprocess.run([sys.executable, "-c", _CHILD % (path, code)], cwd=REPO_ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        killed = result.returncode < 0
+        return {"status": "killed" if killed else "error",
+                "returncode": result.returncode, "stderr": result.stderr.strip().splitlines()[-1:]}
+    return dict(json.loads(result.stdout.strip().splitlines()[-1]), status="ok")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-gb", type=float, default=2.0, help="Size of the generated WAV")
+    parser.add_argument("--path", help="Existing WAV to use (or where to keep the generated one)")
+    parser.add_argument("--methods", nargs="+", choices=sorted(METHODS), default=["mmap", "librosa"])
+    args = parser.parse_args(argv)
+
+    generated = False
+    path = args.path
+    if path is None or not os.path.exists(path):
+        if path is None:
+            handle, path = tempfile.mkstemp(suffix=".wav")
+            os.close(handle)
+            generated = True
+        print(f"Writing {args.size_gb:.1f} GiB test file to {path}", file=sys.stderr)
+        write_test_wav(path, args.size_gb)
+
+    try:
+        report = {"path": path, "file_mb": os.path.getsize(path) / 2 ** 20, "baseline": measure(path, "baseline")}
+        for method in args.methods:
+            print(f"Measuring {method}", file=sys.stderr)
+            report[method] = measure(path, method)
+            if report[method]["status"] == "ok":
+                report[method]["rss_over_baseline_mb"] = (
+                    report[method]["peak_rss_mb"] - report["baseline"]["peak_rss_mb"])
+    finally:
+        if generated:
+            os.remove(path)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Local mock of the Perplexity and OpenAI chat-completions endpoints.
+
+Answers both providers' request formats on POST .../chat/completions, with
+injectable misbehaviour so the lookup path can be exercised without real
+API calls:
+- latency drawn from a distribution ("fixed:0.5", "uniform:0.2:2",
+  "lognormal:0.8:0.5" (median, sigma) or "exp:1.0" (mean), in seconds)
+- random 429/500 responses, plus 429s once a token-bucket rate limit is
+  exceeded, optionally with a Retry-After header
+- malformed bodies: the answer wrapped in prose (which
+  `extract_json_from_text` should recover), truncated JSON, or a non-JSON
+  HTTP body
+- hangs: no response for `hang_seconds`
+
+The answers differ per provider (Perplexity says C major, OpenAI A minor)
+so callers can tell which provider an answer came from.
+
+Run standalone and point the app at it:
+
+    python benchmarks/mock_llm_server.py --port 8089 --latency lognormal:1.5:0.4 --rate-429 0.1
+    PERPLEXITY_BASE_URL=http://127.0.0.1:8089 OPENAI_BASE_URL=http://127.0.0.1:8089 \\
+        PERPLEXITY_API_KEY=mock OPENAI_API_KEY=mock streamlit run home.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable
+
+PERPLEXITY_ANSWER = {
+    "key": "C major",
+    "bpm": 120,
+    "mood": "Energetic, Happy",
+    "instruments": "Drums, Bass, Synth",
+    "confidence_scores": {"key": 0.9, "bpm": 0.9, "mood": 0.7, "instruments": 0.6},
+}
+OPENAI_ANSWER = {
+    "musical_key": "A minor",
+    "tempo_bpm": 118,
+    "mood_descriptors": ["Melancholic"],
+    "instruments_detected": ["Piano"],
+    "confidence_scores": {"musical_key": 0.6, "tempo_bpm": 0.6, "mood_descriptors": 0.5,
+                          "instruments_detected": 0.5},
+}
+MALFORMED_KINDS = ("prose", "truncated", "body")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Sampler for a latency spec such as "fixed:0.5", "uniform:0.2:2", "lognormal:0.8:0.5" or "exp:1"."""
+    name, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(":")] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec '{spec}'") from None
+    samplers = {
+        "fixed": (1, lambda rng, seconds: seconds),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "lognormal": (2, lambda rng, median, sigma: median * rng.lognormvariate(0.0, sigma)),
+        "exp": (1, lambda rng, mean: rng.expovariate(1.0 / mean) if mean > 0 else 0.0),
+    }
+    if name not in samplers or len(values) != samplers[name][0]:
+        raise ValueError(f"Invalid latency spec '{spec}'. Use fixed:S, uniform:LO:HI, lognormal:MEDIAN:SIGMA "
+                         "or exp:MEAN")
+    sample = samplers[name][1]
+    return lambda rng: max(0.0, sample(rng, *values))
+
+
+class MockLLMServer:
+    """Threaded mock chat-completions server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:0",
+                 rate_429: float = 0.0, rate_500: float = 0.0, malformed: float = 0.0, hang: float = 0.0,
+                 hang_seconds: float = 120.0, rate_limit: float = 0.0, retry_after: float = None, seed: int = None):
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.malformed = malformed
+        self.hang = hang
+        self.hang_seconds = hang_seconds
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # Wake hanging handlers so they exit instead of holding sockets open
+        self._stopping.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _rate_limited(self) -> bool:
+        if self.rate_limit <= 0:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1.0:
+            return True
+        self._tokens -= 1.0
+        return False
+
+    def _plan(self) -> Dict[str, Any]:
+        """Decide one response: its delay and what goes wrong, if anything."""
+        with self._lock:
+            rng = self._rng
+            plan = {"delay": self.sample_latency(rng), "fault": None}
+            if self._rate_limited():
+                plan.update(delay=0.0, fault="rate_limited")
+            elif rng.random() < self.hang:
+                plan.update(delay=self.hang_seconds, fault="hang")
+            elif rng.random() < self.rate_429:
+                plan["fault"] = "429"
+            elif rng.random() < self.rate_500:
+                plan["fault"] = "500"
+            elif rng.random() < self.malformed:
+                plan["fault"] = rng.choice(MALFORMED_KINDS)
+            self.stats["requests"] += 1
+            self.stats[plan["fault"] or "ok"] += 1
+            return plan
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+                plan = server._plan()
+                if server._stopping.wait(plan["delay"]):
+                    return
+                fault = plan["fault"]
+                if fault == "hang":
+                    # Give up on the request without answering
+                    self.close_connection = True
+                    return
+                if fault in ("429", "rate_limited"):
+                    headers = {"Retry-After": f"{server.retry_after:g}"} if server.retry_after is not None else {}
+                    return self._send(429, {"error": {"message": "Rate limit exceeded"}}, headers)
+                if fault == "500":
+                    return self._send(500, {"error": {"message": "Internal server error"}})
+                if fault == "body":
+                    return self._send(200, b"<html>502 Bad Gateway</html>")
+                self._send(200, completion(payload, fault))
+
+            def _send(self, status: int, body, headers: Dict[str, str] = None):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def completion(payload: Dict[str, Any], fault: str = None) -> Dict[str, Any]:
+    """A chat-completions response in the format the request asked for (function call or text)."""
+    if payload.get("functions"):
+        text = json.dumps(OPENAI_ANSWER)
+    else:
+        text = json.dumps(PERPLEXITY_ANSWER)
+    if fault == "prose":
+        text = f"Here is what I found on the web:\n{text}\nLet me know if you need more detail."
+    elif fault == "truncated":
+        text = text[:len(text) // 2]
+    message = {"role": "assistant", "content": text}
+    if payload.get("functions"):
+        message = {"role": "assistant", "content": None,
+                   "function_call": {"name": payload["functions"][0]["name"], "arguments": text}}
+    return {"id": "mock", "object": "chat.completion", "model": payload.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}
+
+
+def _latency_arg(spec: str) -> str:
+    try:
+        parse_latency(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=_latency_arg, default="lognormal:1.0:0.5",
+                        help="Response latency: fixed:S, uniform:LO:HI, lognormal:MEDIAN:SIGMA or exp:MEAN "
+                             "(default: lognormal:1.0:0.5)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Requests per second before the server answers 429 (0: unlimited)")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--malformed", type=float, default=0.0,
+                        help="Fraction of answers with prose-wrapped or truncated JSON, or a non-JSON body")
+    parser.add_argument("--hang", type=float, default=0.0, help="Fraction of requests never answered")
+    parser.add_argument("--hang-seconds", type=float, default=120.0, help="How long a hanging request stalls")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for latency and faults")
+
+
+def server_from_args(args, host: str = "127.0.0.1", port: int = 0) -> MockLLMServer:
+    return MockLLMServer(host, port, args.latency, args.rate_429, args.rate_500, args.malformed, args.hang,
+                         args.hang_seconds, args.rate_limit, args.retry_after, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Perplexity/OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    server = server_from_args(args, args.host, args.port).start()
+    print(f"Mock LLM server on {server.url} (Ctrl-C to stop)", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(dict(server.stats)), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+Performance and accuracy benchmarks on synthetic ground-truth audio.
+
+Measures wall time, CPU time, peak RSS, peak allocation and accuracy of
+`estimate_key`, `estimate_tempo`, `detect_instruments`, `analyze_mood` and
+the full `analyze_audio_data` on the fixtures in `fixtures.py`, writes a
+JSON report, and compares it against a stored baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py                      # 30 s and 2 min fixtures
+    python benchmarks/run_benchmarks.py --durations 30s,2m,10m,60m
+    python benchmarks/run_benchmarks.py --save-baseline      # store as benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fixtures import DURATIONS, QUICK_DURATIONS, SAMPLE_RATE, PITCH_CLASSES, fixture_specs, render  # noqa: E402
+
+TARGETS = ("estimate_key", "estimate_tempo", "detect_instruments", "analyze_mood", "analyze_audio_data")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+TIME_TOLERANCE = 0.15  # relative slowdown before a run counts as a regression
+RSS_TOLERANCE = 0.15
+ACCURACY_TOLERANCE = 0.0
+
+
+def score_tempo(bpm: float, truth: float) -> float:
+    """1.0 within 4% of the truth, 0.5 for octave/triple errors, else 0."""
+    if abs(bpm - truth) <= 0.04 * truth:
+        return 1.0
+    for factor in (2.0, 0.5, 3.0, 1 / 3):
+        if abs(bpm - truth * factor) <= 0.04 * truth * factor:
+            return 0.5
+    return 0.0
+
+
+def score_key(key: str, truth: str) -> float:
+    """MIREX-style key score: exact 1.0, fifth 0.5, relative 0.3, parallel 0.2."""
+    if key == truth:
+        return 1.0
+    try:
+        tonic, mode = key.split()
+        true_tonic, true_mode = truth.split()
+        distance = (PITCH_CLASSES.index(tonic) - PITCH_CLASSES.index(true_tonic)) % 12
+    except ValueError:
+        return 0.0
+    if mode == true_mode and distance in (5, 7):
+        return 0.5
+    if true_mode == "major" and mode == "minor" and distance == 9:
+        return 0.3
+    if true_mode == "minor" and mode == "major" and distance == 3:
+        return 0.3
+    if distance == 0:
+        return 0.2
+    return 0.0
+
+
+def score_labels(predicted: List[str], truth: List[str]) -> float:
+    """Fraction of expected labels that were predicted."""
+    return sum(label in predicted for label in truth) / len(truth)
+
+
+def _predictions(target: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if target == "estimate_key":
+        return {"key": result["key"]}
+    if target == "estimate_tempo":
+        return {"bpm": result["bpm"]}
+    if target == "detect_instruments":
+        return {"instruments": result["detected_instruments"]}
+    if target == "analyze_mood":
+        return {"moods": result["moods"]}
+    return {"key": result["key"], "bpm": result["tempo"], "instruments": result["instruments"],
+            "moods": result["mood"]}
+
+
+def score(predictions: Dict[str, Any], truth: Dict[str, Any]) -> Optional[float]:
+    """Mean score over the ground-truth fields this target predicts, or None if none apply."""
+    scores = []
+    if "key" in predictions and "key" in truth:
+        scores.append(score_key(predictions["key"], truth["key"]))
+    if "bpm" in predictions and "bpm" in truth:
+        scores.append(score_tempo(predictions["bpm"], truth["bpm"]))
+    if "instruments" in predictions and "instruments" in truth:
+        scores.append(score_labels(predictions["instruments"], truth["instruments"]))
+    if "moods" in predictions and "moods" in truth:
+        scores.append(score_labels(predictions["moods"], truth["moods"]))
+    return sum(scores) / len(scores) if scores else None
+
+
+def _target_function(target: str):
+    if target == "estimate_key":
+        from key_analyzer import estimate_key
+        return estimate_key
+    if target == "estimate_tempo":
+        from tempo_analyzer import estimate_tempo
+        return estimate_tempo
+    if target == "detect_instruments":
+        from instrument_analyzer import detect_instruments
+        return detect_instruments
+    if target == "analyze_mood":
+        from mood_analyzer import analyze_mood
+        return analyze_mood
+    from audio_analysis import analyze_audio_data
+    return analyze_audio_data
+
+
+def run_fixture(spec: Dict[str, Any], targets: List[str]) -> List[Dict[str, Any]]:
+    """
+    Benchmark `targets` on one fixture inside a fresh worker process.
+
+    The worker warms up librosa first so JIT compilation is not billed to
+    the first target. `peak_alloc_mb` is per target (tracemalloc);
+    `peak_rss_mb` is the process high-water mark after the target ran.
+    """
+    import warnings
+    from audio_analysis import warmup
+
+    warnings.simplefilter("ignore")
+    warmup()
+    y = render(spec)
+    records = []
+    for target in targets:
+        fn = _target_function(target)
+        gc.collect()
+        tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = fn(y, SAMPLE_RATE)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        _, peak_alloc = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        predictions = _predictions(target, result)
+        records.append({
+            "fixture": spec["name"],
+            "target": target,
+            "audio_seconds": spec["duration"],
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "realtime_factor": spec["duration"] / wall if wall else None,
+            "peak_alloc_mb": peak_alloc / 2 ** 20,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "accuracy": score(predictions, spec["truth"]),
+            "predictions": predictions,
+        })
+    return records
+
+
+def _environment() -> Dict[str, Any]:
+    import numpy
+    import librosa
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "librosa": librosa.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def run_suite(durations, targets: List[str], workers: int = 1, isolate: bool = False,
+              cold_start: bool = True) -> Dict[str, Any]:
+    """Run every fixture/target pair and return the full report."""
+    specs = fixture_specs(durations)
+    # One process per fixture (or per fixture/target with `isolate`) keeps peak RSS attributable
+    jobs = [(spec, [target]) for spec in specs for target in targets] if isolate else [(spec, targets) for spec in specs]
+    context = multiprocessing.get_context("spawn")
+    records = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, max_tasks_per_child=1) as pool:
+        futures = [pool.submit(run_fixture, spec, job_targets) for spec, job_targets in jobs]
+        for (spec, _), future in zip(jobs, futures):
+            for record in future.result():
+                records.append(record)
+                accuracy = record["accuracy"]
+                print(f"{record['fixture']:28s} {record['target']:20s} {record['wall_seconds']:8.2f}s "
+                      f"{record['peak_rss_mb']:8.0f} MB  acc={'-' if accuracy is None else f'{accuracy:.2f}'}",
+                      file=sys.stderr)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(),
+        "durations": list(durations),
+        "elapsed_seconds": time.perf_counter() - started,
+        "results": records,
+        "summary": summarize(records),
+    }
+    if cold_start:
+        from import_budget import measure
+        report["cold_start"] = measure(runs=1)
+    return report
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-target totals: wall time, worst peak RSS and mean accuracy."""
+    summary = {}
+    for target in TARGETS:
+        rows = [r for r in records if r["target"] == target]
+        if not rows:
+            continue
+        scored = [r["accuracy"] for r in rows if r["accuracy"] is not None]
+        summary[target] = {
+            "wall_seconds": sum(r["wall_seconds"] for r in rows),
+            "audio_seconds": sum(r["audio_seconds"] for r in rows),
+            "max_peak_rss_mb": max(r["peak_rss_mb"] for r in rows),
+            "mean_accuracy": sum(scored) / len(scored) if scored else None,
+        }
+    return summary
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], time_tolerance: float = TIME_TOLERANCE,
+            rss_tolerance: float = RSS_TOLERANCE, accuracy_tolerance: float = ACCURACY_TOLERANCE) -> Dict[str, Any]:
+    """Compare matching fixture/target runs against `baseline` and flag regressions."""
+    base = {(r["fixture"], r["target"]): r for r in baseline.get("results", [])}
+    rows, regressions = [], []
+    for record in report["results"]:
+        old = base.get((record["fixture"], record["target"]))
+        if old is None:
+            continue
+        row = {
+            "fixture": record["fixture"],
+            "target": record["target"],
+            "wall_ratio": record["wall_seconds"] / old["wall_seconds"] if old["wall_seconds"] else None,
+            "rss_ratio": record["peak_rss_mb"] / old["peak_rss_mb"] if old["peak_rss_mb"] else None,
+            "accuracy_delta": (record["accuracy"] - old["accuracy"]
+                               if record["accuracy"] is not None and old["accuracy"] is not None else None),
+        }
+        problems = []
+        if row["wall_ratio"] is not None and row["wall_ratio"] > 1 + time_tolerance:
+            problems.append("time")
+        if row["rss_ratio"] is not None and row["rss_ratio"] > 1 + rss_tolerance:
+            problems.append("memory")
+        if row["accuracy_delta"] is not None and row["accuracy_delta"] < -accuracy_tolerance:
+            problems.append("accuracy")
+        row["regressions"] = problems
+        rows.append(row)
+        if problems:
+            regressions.append(row)
+    return {
+        "baseline_created": baseline.get("created"),
+        "baseline_commit": baseline.get("environment", {}).get("commit"),
+        "rows": rows,
+        "regressions": regressions,
+    }
+
+
+def _describe_ratio(ratio: Optional[float]) -> str:
+    # A baseline without a value (e.g. no RSS measured) has no ratio
+    return f"x{ratio:.2f}" if ratio is not None else "-"
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic-audio performance and accuracy benchmarks")
+    parser.add_argument("--durations", default=",".join(QUICK_DURATIONS),
+                        help=f"Comma-separated fixture lengths from {', '.join(DURATIONS)}")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma-separated functions to benchmark")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="Where to write the JSON report")
+    parser.add_argument("--baseline", default=None,
+                        help=f"Baseline report to compare against (default: {DEFAULT_BASELINE} if present)")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, default=None, metavar="PATH",
+                        help="Also store this report as the baseline")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Fixtures benchmarked in parallel (keep at 1 for stable timings)")
+    parser.add_argument("--isolate", action="store_true",
+                        help="Run every fixture/target pair in its own process for per-target peak RSS")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--skip-cold-start", action="store_true", help="Skip the import-time measurement")
+    args = parser.parse_args(argv)
+
+    durations = [d.strip() for d in args.durations.split(",") if d.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [d for d in durations if d not in DURATIONS] + [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"Unknown durations/targets: {', '.join(unknown)}")
+
+    report = run_suite(durations, targets, max(1, args.workers), args.isolate, not args.skip_cold_start)
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) else None)
+    exit_code = 0
+    if baseline_path and os.path.abspath(baseline_path) != os.path.abspath(args.save_baseline or ""):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.time_tolerance)
+        for row in report["comparison"]["regressions"]:
+            print(f"REGRESSION {row['fixture']} {row['target']}: {', '.join(row['regressions'])} "
+                  f"(wall {_describe_ratio(row['wall_ratio'])}, rss {_describe_ratio(row['rss_ratio'])}, "
+                  f"accuracy {row['accuracy_delta'] if row['accuracy_delta'] is not None else '-'})",
+                  file=sys.stderr)
+        exit_code = 1 if report["comparison"]["regressions"] else 0
+
+    _write_json(args.output, report)
+    if args.save_baseline:
+        _write_json(args.save_baseline, report)
+    print(json.dumps(report["summary"], indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Similar-track search latency over a large synthetic catalog.
+
+Writes N synthetic feature vectors to a temporary VectorStore, then times
+index build and single-track queries for brute force and for a partitioned
+index, reporting the partitioned index's recall@k against brute force.
+
+Usage:
+    python benchmarks/similarity_search.py [--tracks 1000000] [--partitions 1024] [--nprobe 8 16 32]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature_store import FEATURE_DIM, VectorStore, SimilarityIndex  # noqa: E402
+
+
+def synthetic_vectors(count: int, styles: int = 200, seed: int = 0) -> np.ndarray:
+    """Tracks drawn around a few hundred "styles", so neighbours are meaningful."""
+    rng = np.random.default_rng(seed)
+    style = rng.integers(styles, size=count)
+    chroma_centres = rng.dirichlet(np.ones(12), size=styles)
+    timbre_centres = rng.uniform([800, 2000, 800], [4000, 9000, 3000], size=(styles, 3))
+    vectors = np.empty((count, FEATURE_DIM), dtype=np.float32)
+    chroma = chroma_centres[style] * rng.gamma(20.0, 1 / 20.0, size=(count, 12))
+    vectors[:, :12] = chroma / chroma.sum(axis=1, keepdims=True)
+    vectors[:, 12:15] = timbre_centres[style] * rng.normal(1.0, 0.1, size=(count, 3))
+    vectors[:, 15] = rng.gamma(4.0, 0.03, size=count)
+    vectors[:, 16] = rng.uniform(60, 180, size=styles)[style] + rng.normal(0, 4, size=count)
+    return vectors
+
+
+def time_queries(index: SimilarityIndex, queries, k: int, nprobe: int = None):
+    latencies, results = [], []
+    for track_id in queries:
+        started = time.perf_counter()
+        results.append(index.similar(track_id, k, nprobe))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies), results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=1_000_000)
+    parser.add_argument("--partitions", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    report = {"tracks": args.tracks, "k": args.k}
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        store = VectorStore(directory)
+        vectors = synthetic_vectors(args.tracks)
+        for i, vector in enumerate(vectors):
+            store.add(f"track-{i:07d}", vector)
+        store.flush()
+        report["write_seconds"] = round(time.perf_counter() - started, 2)
+        report["store_mb"] = round(sum(os.path.getsize(os.path.join(directory, name))
+                                       for name in os.listdir(directory)) / 2 ** 20, 1)
+
+        queries = [f"track-{i:07d}" for i in np.random.default_rng(1).integers(args.tracks, size=args.queries)]
+
+        started = time.perf_counter()
+        brute = SimilarityIndex.from_store(store)
+        report["brute_build_seconds"] = round(time.perf_counter() - started, 2)
+        latencies, exact = time_queries(brute, queries, args.k)
+        report["brute_ms"] = {"p50": round(float(np.percentile(latencies, 50)), 2),
+                              "p95": round(float(np.percentile(latencies, 95)), 2)}
+
+        started = time.perf_counter()
+        partitioned = SimilarityIndex.from_store(store, partitions=args.partitions)
+        report["partitioned_build_seconds"] = round(time.perf_counter() - started, 2)
+        report["partitioned"] = {}
+        for nprobe in args.nprobe:
+            latencies, found = time_queries(partitioned, queries, args.k, nprobe)
+            recall = np.mean([len({r["id"] for r in a} & {r["id"] for r in b}) / args.k
+                              for a, b in zip(exact, found)])
+            report["partitioned"][nprobe] = {"p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                                             "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+                                             "recall": round(float(recall), 3)}
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
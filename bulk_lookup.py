@@ -0,0 +1,222 @@
+"""
+Bulk song metadata enrichment through the LLM lookup backends.
+
+Usage:
+    python bulk_lookup.py songs.csv -o enriched.jsonl [--concurrency 8] [--rate 1.0]
+
+Input is a CSV with `title`/`song` and `artist` columns, or JSONL with the
+same fields (or a free-text `prompt`). Rows are deduplicated by normalized
+song/artist, looked up with bounded concurrency under a per-provider
+token-bucket rate limit on every request sent (song extraction and retries
+included), and written as one normalized record per song. The output file
+doubles as the checkpoint: rerunning skips songs already written.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, Iterator, List, Optional
+from models.http_client import get_backend, rate_limited
+from models.lookup_cache import normalize_song_key
+
+PROVIDERS = ("perplexity", "openai")
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _row_prompt(row: Dict[str, Any]) -> Optional[str]:
+    title = (row.get("title") or row.get("song") or "").strip()
+    artist = (row.get("artist") or "").strip()
+    if title and artist:
+        return f"{title} by {artist}"
+    if title:
+        return title
+    prompt = (row.get("prompt") or "").strip()
+    return prompt or None
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield input rows from a CSV or JSONL file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def dedupe_rows(rows: Iterator[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Map normalized song key -> first row seen for it, with a lookup prompt."""
+    unique = {}
+    for row in rows:
+        prompt = _row_prompt(row)
+        if not prompt:
+            continue
+        song_id = normalize_song_key(prompt)
+        if song_id not in unique:
+            unique[song_id] = {"id": song_id, "prompt": prompt, "title": row.get("title") or row.get("song"),
+                               "artist": row.get("artist")}
+    return unique
+
+
+def load_checkpoint(path: str) -> set:
+    """IDs of songs already written successfully to `path`."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from a crash
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def normalize_record(song: Dict[str, Any], result: Dict[str, Any], provider: str) -> Dict[str, Any]:
+    """Flatten a provider result into the key/bpm/mood/instruments record schema."""
+    bpm = result.get("bpm", result.get("tempo"))
+    try:
+        bpm = float(bpm) if bpm not in (None, "") else None
+    except (TypeError, ValueError):
+        bpm = None
+    return {
+        "id": song["id"],
+        "title": song.get("title"),
+        "artist": song.get("artist"),
+        "status": "ok",
+        "provider": provider,
+        "key": result.get("key") or None,
+        "bpm": bpm,
+        "mood": [m for m in result.get("mood") or [] if m],
+        "instruments": [i for i in result.get("instruments") or [] if i],
+        "confidence_scores": result.get("confidence_scores") or {},
+    }
+
+
+async def lookup_song(song: Dict[str, Any], providers: List[str], buckets: Dict[str, TokenBucket],
+                      deadline: float) -> Dict[str, Any]:
+    """Try providers in order and return the first usable normalized record."""
+    from models.perplexity import get_perplexity_analysis_async
+    from models.openai_model import get_openai_analysis_async
+    from llm_analyzers import normalize_openai_analysis
+
+    errors = []
+    for provider in providers:
+        try:
+            # Each HTTP request takes a token, so cached answers cost nothing
+            with rate_limited(buckets[provider]):
+                if provider == "perplexity":
+                    result = await asyncio.wait_for(get_perplexity_analysis_async(song["prompt"]), deadline)
+                else:
+                    result = normalize_openai_analysis(
+                        await asyncio.wait_for(get_openai_analysis_async(song["prompt"]), deadline)
+                    )
+        except Exception as e:
+            errors.append(f"{provider}: {type(e).__name__}: {e}")
+            continue
+        if result and result.get("key"):
+            return normalize_record(song, result, provider)
+        errors.append(f"{provider}: no result")
+    return {"id": song["id"], "title": song.get("title"), "artist": song.get("artist"),
+            "status": "error", "error": "; ".join(errors)}
+
+
+async def run_bulk_lookup(songs: List[Dict[str, Any]], output_path: str, providers: List[str],
+                          concurrency: int, rates: Dict[str, float], deadline: float,
+                          quiet: bool = False) -> Dict[str, Any]:
+    """Look up `songs` concurrently and append one record per song to `output_path`."""
+    buckets = {provider: TokenBucket(rates[provider]) for provider in providers}
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"ok": 0, "error": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        async def worker(song):
+            async with semaphore:
+                record = await lookup_song(song, providers, buckets, deadline)
+            # Each line is a checkpoint; flushed so a crash loses at most in-flight songs
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            stats[record["status"]] += 1
+            if not quiet:
+                done = stats["ok"] + stats["error"]
+                print(f"[{done}/{len(songs)}] {record['status']:5s} {song['prompt']} "
+                      f"({done / (time.perf_counter() - started):.2f} songs/s)", file=sys.stderr)
+
+        try:
+            await asyncio.gather(*(worker(song) for song in songs))
+        finally:
+            # The pool belongs to this asyncio.run loop; close it before the loop goes away
+            await get_backend().aclose()
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk song metadata lookup to JSON Lines")
+    parser.add_argument("input", help="CSV or JSONL with title/song and artist columns")
+    parser.add_argument("-o", "--output", required=True, help="Output JSONL; also the resume checkpoint")
+    parser.add_argument("--providers", default="perplexity,openai",
+                        help="Comma-separated providers in fallback order (default: perplexity,openai)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum lookups in flight")
+    parser.add_argument("--perplexity-rate", type=float, default=1.0,
+                        help="Perplexity requests per second, retries included (token-bucket refill rate)")
+    parser.add_argument("--openai-rate", type=float, default=2.0,
+                        help="OpenAI requests per second, retries included")
+    parser.add_argument("--deadline", type=float, default=120.0, help="Per-lookup deadline in seconds")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    providers = [p.strip() for p in args.providers.split(",") if p.strip()]
+    unknown = [p for p in providers if p not in PROVIDERS]
+    if unknown or not providers:
+        parser.error(f"Unknown providers: {', '.join(unknown) or '(none)'}")
+
+    unique = dedupe_rows(read_rows(args.input))
+    done = load_checkpoint(args.output)
+    songs = [song for song_id, song in unique.items() if song_id not in done]
+    print(f"{len(unique)} unique songs, {len(unique) - len(songs)} already done, {len(songs)} to look up",
+          file=sys.stderr)
+
+    rates = {"perplexity": args.perplexity_rate, "openai": args.openai_rate}
+    stats = asyncio.run(run_bulk_lookup(songs, args.output, providers, max(1, args.concurrency), rates,
+                                        args.deadline, args.quiet))
+    print(f"Done: {stats['ok']} ok, {stats['error']} errors in {stats['elapsed']:.1f}s", file=sys.stderr)
+    return 1 if stats["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,517 @@
+"""
+Resumable, sharded catalog processing across machines sharing a filesystem.
+
+Every node runs the same command against the same manifest and work
+directory. The entries are split into shards by a hash of each entry, so all nodes
+agree on the split without talking to each other. Each node then claims
+shards one at a time through lock files in the work directory:
+
+    python catalog_shards.py run /shared/job catalog.txt --shards 64 [--workers N]
+    python catalog_shards.py status /shared/job
+    python catalog_shards.py merge /shared/job -o results.jsonl
+
+Work directory layout:
+    catalog.json              shard count, analysis options, manifest digest
+    claims/shard-0007.lock    the node working on shard 7 (mtime is its heartbeat)
+    results/shard-0007.jsonl  append-only results, one fsync'd line per track
+    done/shard-0007.json      written once every track of shard 7 has a result
+
+A claim whose heartbeat is older than `--stale-after` seconds, or held by
+a dead process on this host, is taken over. A resumed shard skips tracks
+that already have a result in its checkpoint. `merge` combines the shards
+into one result set with one record per entry, preferring successes over
+errors. Lock files rely on O_EXCL creation being atomic, which holds on
+local filesystems and NFSv3+.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from batch_analyze import AUDIO_EXTENSIONS, add_instrumentation_arguments, configure_instrumentation, run_batch
+from decode_profiles import DECODE_PROFILES, DEFAULT_DECODE_PROFILE
+from result_cache import DEFAULT_CACHE_PATH
+
+DEFAULT_SHARDS = 64
+DEFAULT_STALE_AFTER = 600.0  # seconds without a heartbeat before a claim is taken over
+CATALOG_FILE = "catalog.json"
+
+
+def iter_catalog(inputs: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (key, path) for each track in directories and manifest files.
+
+    The key is the manifest line as written, or the path relative to the
+    directory walked, so it stays the same on nodes that mount the catalog
+    at different paths. Keys decide shards and identify tracks in `merge`.
+    Each file is yielded once, under the first key that names it: a repeated
+    line, or another spelling of the same file ("a.wav", "./a.wav",
+    "/catalog/a.wav"), is skipped, so every result maps back to one key.
+    """
+    seen = set()
+    for key, path in _iter_entries(inputs):
+        resolved = os.path.realpath(path)
+        if resolved not in seen:
+            seen.add(resolved)
+            yield key, path
+
+
+def _iter_entries(inputs: List[str]) -> Iterator[Tuple[str, str]]:
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        yield os.path.relpath(path, item), path
+        else:
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item, "r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    yield line, line if os.path.isabs(line) else os.path.join(base, line)
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Stable shard number of an entry; the same on every node and Python version."""
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") % shards
+
+
+def _shard_name(shard: int) -> str:
+    return f"shard-{shard:04d}"
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_checkpoint(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of a shard's results file, skipping a line cut off by a crash."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return
+
+
+class Claim:
+    """A node's exclusive claim on one shard, kept alive by a heartbeat thread."""
+
+    def __init__(self, path: str, node: str, stale_after: float = DEFAULT_STALE_AFTER):
+        self.path = path
+        self.node = node
+        self.stale_after = stale_after
+        self.token = uuid.uuid4().hex
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _is_stale(self, owner: Optional[Dict[str, Any]], mtime: float) -> bool:
+        if time.time() - mtime > self.stale_after:
+            return True
+        # Our own node's claim from a process that has since died (e.g. this node was interrupted)
+        if owner and owner.get("node") == self.node and owner.get("host") == socket.gethostname():
+            try:
+                os.kill(owner["pid"], 0)
+            except ProcessLookupError:
+                return True
+            except (OSError, KeyError, TypeError):
+                pass
+        return False
+
+    def _create(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"node": self.node, "host": socket.gethostname(), "pid": os.getpid(),
+                       "token": self.token, "claimed": time.time()}, f)
+        return True
+
+    def acquire(self) -> bool:
+        """Take the claim if it is free or stale; False if another live node holds it."""
+        if not self._create():
+            try:
+                mtime = os.path.getmtime(self.path)
+            except FileNotFoundError:
+                return self._create() and self._start()
+            owner = _read_json(self.path)
+            if not self._is_stale(owner, mtime):
+                return False
+            # Move the stale lock aside, then check we moved the one we judged stale
+            # and not a fresh claim another node made in between
+            moved = f"{self.path}.stale-{self.token}"
+            try:
+                os.rename(self.path, moved)
+            except FileNotFoundError:
+                return False
+            if (_read_json(moved) or {}).get("token") != (owner or {}).get("token"):
+                try:
+                    os.link(moved, self.path)
+                except FileExistsError:
+                    pass
+                os.unlink(moved)
+                return False
+            os.unlink(moved)
+            print(f"Taking over stale claim {os.path.basename(self.path)} from {(owner or {}).get('node')}",
+                  file=sys.stderr)
+            if not self._create():
+                return False
+        return self._start()
+
+    def _start(self) -> bool:
+        self._thread = threading.Thread(target=self._heartbeat, name="claim-heartbeat", daemon=True)
+        self._thread.start()
+        return True
+
+    def _heartbeat(self):
+        while not self._stop.wait(max(1.0, self.stale_after / 4)):
+            if (_read_json(self.path) or {}).get("token") != self.token:
+                print(f"Lost claim {os.path.basename(self.path)} to another node", file=sys.stderr)
+                self.lost.set()
+                return
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost.set()
+                return
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.lost.is_set() and (_read_json(self.path) or {}).get("token") == self.token:
+            os.unlink(self.path)
+
+
+class CheckpointWriter:
+    """
+    File-like sink for `run_batch` appending each record to a shard's results
+    file, tagged with the entry's key and fsync'd so a crash loses at most the
+    line being written.
+    """
+
+    def __init__(self, path: str, keys: Dict[str, str], node: str):
+        self.keys = keys
+        self.node = node
+        self.written = {}
+        self._repair(path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _repair(path: str):
+        # Drop a partial last line, so the next record starts on a line of its own
+        try:
+            with open(path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def write(self, text: str):
+        for line in text.splitlines():
+            record = json.loads(line)
+            record["key"] = self.keys.get(record["path"], record["path"])
+            record["node"] = self.node
+            self._file.write(json.dumps(record) + "\n")
+            self.written[record["key"]] = record["status"]
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class Catalog:
+    """A sharded catalog's work directory."""
+
+    def __init__(self, workdir: str):
+        self.workdir = workdir
+        self.config = _read_json(os.path.join(workdir, CATALOG_FILE))
+
+    @property
+    def shards(self) -> int:
+        return self.config["shards"]
+
+    def path(self, kind: str, shard: int) -> str:
+        suffix = {"claims": ".lock", "results": ".jsonl", "done": ".json"}[kind]
+        return os.path.join(self.workdir, kind, _shard_name(shard) + suffix)
+
+    def init(self, shards: int, options: Dict[str, Any], entries: List[Tuple[str, str]]):
+        """Create the work directory, or check this node agrees with the one that did."""
+        for kind in ("claims", "results", "done"):
+            os.makedirs(os.path.join(self.workdir, kind), exist_ok=True)
+        digest = hashlib.sha1("\n".join(sorted(key for key, _ in entries)).encode("utf-8")).hexdigest()
+        config = {"shards": shards, "options": options, "entries": len(entries), "manifest_sha1": digest,
+                  "created": time.time()}
+        try:
+            fd = os.open(os.path.join(self.workdir, CATALOG_FILE), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            # Another node created it; it may still be writing it
+            while True:
+                self.config = _read_json(os.path.join(self.workdir, CATALOG_FILE))
+                if self.config is not None:
+                    break
+                time.sleep(0.1)
+            for field in ("shards", "options", "manifest_sha1"):
+                if self.config[field] != config[field]:
+                    raise ValueError(f"{self.workdir} was started with a different {field}: "
+                                     f"{self.config[field]!r} (this node: {config[field]!r})")
+            return
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        self.config = config
+
+    def finished_keys(self, shard: int, retry_errors: bool = False) -> set:
+        """Keys with a result in the shard's checkpoint (only successes with `retry_errors`)."""
+        return {record["key"] for record in read_checkpoint(self.path("results", shard))
+                if "key" in record and (record["status"] == "ok" or not retry_errors)}
+
+    def is_done(self, shard: int, retry_errors: bool = False) -> bool:
+        done = _read_json(self.path("done", shard))
+        return done is not None and not (retry_errors and done.get("error"))
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Per-shard state: done, claimed (by whom, heartbeat age) or pending, with results so far."""
+        shards = []
+        for shard in range(self.shards):
+            records = list(read_checkpoint(self.path("results", shard)))
+            info = {"shard": shard, "results": len({record["key"] for record in records if "key" in record}),
+                    "errors": sum(1 for record in records if record.get("status") == "error")}
+            done = _read_json(self.path("done", shard))
+            owner = _read_json(self.path("claims", shard))
+            if done is not None:
+                info.update(state="done", node=done.get("node"), entries=done.get("entries"))
+            elif owner is not None:
+                try:
+                    age = time.time() - os.path.getmtime(self.path("claims", shard))
+                except FileNotFoundError:
+                    age = None
+                info.update(state="claimed", node=owner.get("node"),
+                            heartbeat_age=round(age, 1) if age is not None else None)
+            else:
+                info["state"] = "pending"
+            shards.append(info)
+        return shards
+
+
+def run_node(catalog: Catalog, entries: List[Tuple[str, str]], node: str, workers: int, max_in_flight: int,
+             stale_after: float = DEFAULT_STALE_AFTER, retry_errors: bool = False, **batch_options) -> Dict[str, Any]:
+    """
+    Claim and process shards until none is left unclaimed; returns this
+    node's totals. `batch_options` are passed on to `run_batch`.
+    """
+    by_shard = {}
+    for key, path in entries:
+        by_shard.setdefault(shard_of(key, catalog.shards), []).append((key, path))
+    totals = {"shards": 0, "ok": 0, "error": 0, "skipped": 0, "busy": 0, "audio_seconds": 0.0}
+
+    # Start at a node-specific shard so nodes starting together rarely race for the same claims
+    first = shard_of(node, catalog.shards)
+    for shard in [(first + i) % catalog.shards for i in range(catalog.shards)]:
+        if catalog.is_done(shard, retry_errors):
+            continue
+        claim = Claim(catalog.path("claims", shard), node, stale_after)
+        if not claim.acquire():
+            totals["busy"] += 1
+            continue
+        try:
+            # Checked again under the claim: another node may have finished it meanwhile
+            if catalog.is_done(shard, retry_errors):
+                continue
+            shard_entries = by_shard.get(shard, [])
+            finished = catalog.finished_keys(shard, retry_errors)
+            todo = [(key, path) for key, path in shard_entries if key not in finished]
+            totals["skipped"] += len(shard_entries) - len(todo)
+            print(f"{_shard_name(shard)}: {len(todo)} of {len(shard_entries)} tracks to analyze", file=sys.stderr)
+
+            def paths():
+                for _, path in todo:
+                    if claim.lost.is_set():
+                        return
+                    yield path
+
+            if not todo:
+                stats = {"ok": 0, "error": 0, "audio_seconds": 0.0}
+                writer = None
+            else:
+                writer = CheckpointWriter(catalog.path("results", shard), {path: key for key, path in todo}, node)
+                try:
+                    stats = run_batch(paths(), writer, workers, max_in_flight, **batch_options)
+                finally:
+                    writer.close()
+            for field in ("ok", "error", "audio_seconds"):
+                totals[field] += stats[field]
+
+            if claim.lost.is_set() or (writer is not None and not {key for key, _ in todo} <= writer.written.keys()):
+                continue
+            results = {}
+            for record in read_checkpoint(catalog.path("results", shard)):
+                if record.get("key") is not None and results.get(record["key"]) != "ok":
+                    results[record["key"]] = record["status"]
+            _write_json_atomic(catalog.path("done", shard), {
+                "node": node, "finished": time.time(), "entries": len(shard_entries),
+                "ok": sum(1 for status in results.values() if status == "ok"),
+                "error": sum(1 for status in results.values() if status == "error"),
+            })
+            totals["shards"] += 1
+        finally:
+            claim.release()
+    return totals
+
+
+def merge_results(catalog: Catalog, output, keys: Optional[set] = None) -> Dict[str, Any]:
+    """
+    Write one record per entry, sorted by key, from every shard's checkpoint.
+    Duplicates (a resumed or taken-over shard) keep the latest success, or
+    the latest error if the entry never succeeded. With `keys` (the manifest),
+    entries without any result are counted as missing.
+    """
+    merged = {}
+    duplicates = 0
+    for shard in range(catalog.shards):
+        for record in read_checkpoint(catalog.path("results", shard)):
+            key = record.get("key")
+            if key is None:
+                continue
+            previous = merged.get(key)
+            if previous is not None:
+                duplicates += 1
+                if previous["status"] == "ok" and record["status"] != "ok":
+                    continue
+            merged[key] = record
+    for key in sorted(merged):
+        output.write(json.dumps(merged[key]) + "\n")
+    stats = {"entries": len(merged), "duplicates": duplicates,
+             "ok": sum(1 for record in merged.values() if record["status"] == "ok"),
+             "error": sum(1 for record in merged.values() if record["status"] == "error")}
+    if keys is not None:
+        stats["missing"] = len(keys - merged.keys())
+    return stats
+
+
+def main(argv=None):
+    from analyzer_registry import ANALYZERS
+    parser = argparse.ArgumentParser(description="Resumable sharded catalog analysis on a shared filesystem")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Claim and analyze shards until none is left")
+    run.add_argument("workdir", help="Shared work directory (claims, checkpoints, done markers)")
+    run.add_argument("inputs", nargs="+", help="Directories to walk or manifest files with one path per line")
+    run.add_argument("--shards", type=int, default=DEFAULT_SHARDS,
+                     help=f"Number of shards, fixed when the work directory is created (default: {DEFAULT_SHARDS})")
+    run.add_argument("--node", default=socket.gethostname(), help="This node's name (default: hostname)")
+    run.add_argument("--stale-after", type=float, default=DEFAULT_STALE_AFTER,
+                     help="Seconds without a heartbeat before another node's claim is taken over")
+    run.add_argument("--retry-errors", action="store_true", help="Re-analyze tracks that failed before")
+    run.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                     help="Worker processes (default: number of cores)")
+    run.add_argument("--max-in-flight", type=int, default=None,
+                     help="Maximum tracks decoded at once (default: number of workers)")
+    run.add_argument("--max-tasks-per-child", type=int, default=None,
+                     help="Recycle each worker after this many tracks to release memory")
+    run.add_argument("--streaming", action="store_true", help="Decode block by block")
+    run.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None, metavar="PATH",
+                     help="Reuse and store results in the on-disk result cache")
+    run.add_argument("--warmup", action="store_true", help="Compile librosa/numba kernels in each worker first")
+    run.add_argument("--profile", choices=sorted(DECODE_PROFILES), default=DEFAULT_DECODE_PROFILE,
+                     help=f"Decode profile (default: {DEFAULT_DECODE_PROFILE})")
+    run.add_argument("--segments", action="store_true", help="Add key and tempo tracks over sliding windows")
+    run.add_argument("--analyzers", nargs="+", choices=sorted(ANALYZERS), default=None, metavar="NAME",
+                     help="Only run these analyzers")
+    add_instrumentation_arguments(run)
+    run.add_argument("-q", "--quiet", action="store_true", help="Only print shard progress and the summary")
+
+    status = subparsers.add_parser("status", help="Show each shard's state")
+    status.add_argument("workdir")
+
+    merge = subparsers.add_parser("merge", help="Combine the shards into one deduplicated JSONL file")
+    merge.add_argument("workdir")
+    merge.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    merge.add_argument("--manifest", nargs="+", default=None,
+                       help="The run's inputs, to count entries that have no result yet")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog(args.workdir)
+    if args.command == "run":
+        entries = list(iter_catalog(args.inputs))
+        options = {"profile": args.profile, "streaming": args.streaming, "segments": args.segments,
+                   "analyzers": sorted(args.analyzers) if args.analyzers else None}
+        try:
+            catalog.init(args.shards, options, entries)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        exporter = configure_instrumentation(args)
+        workers = max(1, args.workers)
+        if workers > 1:
+            # Tracks already run in parallel; one analyzer thread per worker avoids oversubscribing cores
+            os.environ.setdefault("ANALYZER_WORKERS", "1")
+        totals = run_node(catalog, entries, args.node, workers, max(1, args.max_in_flight or workers),
+                          args.stale_after, args.retry_errors, max_tasks_per_child=args.max_tasks_per_child,
+                          quiet=args.quiet, streaming=args.streaming, cache_path=args.cache, warmup=args.warmup,
+                          profile=args.profile, segments=args.segments, analyzers=args.analyzers,
+                          exporter=exporter)
+        remaining = sum(1 for shard in range(catalog.shards) if not catalog.is_done(shard))
+        print(f"Node {args.node}: finished {totals['shards']} shards, analyzed {totals['ok'] + totals['error']} "
+              f"tracks ({totals['error']} errors), skipped {totals['skipped']} already done; "
+              f"{remaining} shards not done ({totals['busy']} claimed by other nodes)", file=sys.stderr)
+        return 1 if totals["error"] else 0
+
+    if catalog.config is None:
+        print(f"Error: {args.workdir} is not a catalog work directory", file=sys.stderr)
+        return 2
+    if args.command == "status":
+        shards = catalog.status()
+        for info in shards:
+            print(json.dumps(info))
+        states = [info["state"] for info in shards]
+        print(f"{states.count('done')} done, {states.count('claimed')} claimed, {states.count('pending')} pending "
+              f"of {catalog.shards} shards; {sum(info['results'] for info in shards)} of "
+              f"{catalog.config['entries']} entries have results", file=sys.stderr)
+        return 0
+
+    keys = {key for key, _ in iter_catalog(args.manifest)} if args.manifest else None
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = merge_results(catalog, output, keys)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Merged {stats['entries']} entries ({stats['ok']} ok, {stats['error']} errors), "
+          f"dropped {stats['duplicates']} duplicates"
+          + (f", {stats['missing']} missing" if "missing" in stats else ""), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Named decode profiles: analysis sample rate, resampler and excerpt windows.
+
+"accurate" reproduces the original behaviour (whole file, 22050 Hz, soxr_hq).
+"balanced" and "fast" resample more cheaply and only decode a few excerpts
+spread over the track, which is usually enough for key and tempo. The
+internal "preview" profile decodes a single short excerpt for a preliminary
+answer in about a second while the full analysis runs (see
+job_queue.PREVIEW_PROFILE); it is not listed in DECODE_PROFILES. Audio is
+always mixed down to mono, since every analyzer expects a 1-D signal.
+
+Every user-facing profile decodes at 22050 Hz: the mood and instrument
+thresholds are spectral centroid/rolloff values in Hz tuned at that rate,
+and a lower rate cuts off the band they look at (rolloff > 7000 Hz cannot
+happen below 14 kHz). "preview" decodes at 11025 Hz and is only used for
+key and tempo, which do not depend on that band.
+"""
+import io
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import librosa
+from instrumentation import stage
+from wav_mmap import open_pcm, SOXR_QUALITY
+
+DECODE_PROFILES = {
+    "fast": {
+        "sample_rate": 22050,
+        "res_type": "soxr_lq",
+        "offset": 0.0,
+        "duration": None,
+        "excerpts": 3,
+        "excerpt_duration": 20.0,
+    },
+    "balanced": {
+        "sample_rate": 22050,
+        "res_type": "soxr_mq",
+        "offset": 0.0,
+        "duration": None,
+        "excerpts": 4,
+        "excerpt_duration": 30.0,
+    },
+    "accurate": {
+        "sample_rate": 22050,
+        "res_type": "soxr_hq",
+        "offset": 0.0,
+        "duration": None,
+        "excerpts": None,
+        "excerpt_duration": None,
+    },
+}
+DEFAULT_DECODE_PROFILE = "accurate"
+# Profiles the app uses itself; accepted by name but not offered to users
+INTERNAL_DECODE_PROFILES = {
+    "preview": {
+        "sample_rate": 11025,
+        "res_type": "soxr_lq",
+        "offset": 0.0,
+        "duration": None,
+        "excerpts": 1,
+        "excerpt_duration": 15.0,
+    },
+}
+
+EXCERPT_FADE = 0.05  # seconds faded in/out at excerpt joins so splices do not read as onsets
+
+
+def get_decode_profile(profile=None) -> Dict[str, Any]:
+    """Resolve a profile name (or a dict overriding "accurate") to a full profile with its name."""
+    if profile is None:
+        profile = DEFAULT_DECODE_PROFILE
+    if isinstance(profile, str):
+        settings = DECODE_PROFILES.get(profile) or INTERNAL_DECODE_PROFILES.get(profile)
+        if settings is None:
+            raise ValueError(f"Unknown decode profile '{profile}', expected one of {sorted(DECODE_PROFILES)}")
+        return dict(settings, name=profile)
+    resolved = dict(DECODE_PROFILES[DEFAULT_DECODE_PROFILE], name="custom")
+    resolved.update(profile)
+    return resolved
+
+
+def plan_segments(total_duration: Optional[float], profile: Dict[str, Any]) -> List[Tuple[float, Optional[float]]]:
+    """
+    (offset, duration) windows to decode.
+
+    Excerpts are spread evenly inside the profile's offset/duration window,
+    centred away from the intro and outro; a track shorter than the excerpts
+    combined is decoded whole.
+    """
+    offset = profile["offset"] or 0.0
+    window = profile["duration"]
+    if total_duration is not None:
+        available = max(0.0, total_duration - offset)
+        window = available if window is None else min(window, available)
+
+    count, length = profile["excerpts"], profile["excerpt_duration"]
+    if not count or not length or window is None or window <= count * length:
+        return [(offset, window)]
+    spacing = (window - length) / (count + 1)
+    return [(offset + spacing * (i + 1), length) for i in range(count)]
+
+
+def _source_duration(source) -> Optional[float]:
+    try:
+        return float(librosa.get_duration(path=source))
+    except Exception:
+        return None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+def _splice(excerpts: List[np.ndarray], sample_rate: int) -> np.ndarray:
+    if len(excerpts) == 1:
+        return excerpts[0]
+    fade_len = int(EXCERPT_FADE * sample_rate)
+    ramp = np.linspace(0.0, 1.0, fade_len, dtype=np.float32)
+    faded = []
+    for excerpt in excerpts:
+        excerpt = excerpt.copy()
+        n = min(fade_len, len(excerpt) // 2)
+        excerpt[:n] *= ramp[:n]
+        excerpt[len(excerpt) - n:] *= ramp[:n][::-1]
+        faded.append(excerpt)
+    return np.concatenate(faded)
+
+
+def _load(source, profile: Dict[str, Any], offset: float, duration: Optional[float]):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return librosa.load(source, sr=profile["sample_rate"], mono=True, offset=offset, duration=duration,
+                        res_type=profile["res_type"])
+
+
+def decode_audio(source, profile=None) -> Tuple[np.ndarray, int, Dict[str, Any]]:
+    """
+    Decode a path, file-like object or raw bytes according to a decode profile.
+
+    Returns mono audio, its sample rate, and a description of what was
+    decoded (profile name, settings and the windows actually read), meant
+    for the result's "decode" section.
+    """
+    profile = get_decode_profile(profile)
+    # Uncompressed WAV is read straight from a file mapping (or the bytes themselves)
+    pcm = open_pcm(source) if profile["res_type"] in SOXR_QUALITY else None
+    if pcm is None and isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    reader = "librosa" if pcm is None else "mmap"
+
+    with stage("decode", profile=profile["name"], reader=reader) as record:
+        total_duration = None
+        if pcm is None and profile["excerpts"]:
+            total_duration = _source_duration(source)
+
+        if pcm is not None:
+            segments = plan_segments(pcm.duration, profile)
+            excerpts = []
+            for offset, duration in segments:
+                audio_data, sample_rate = pcm.load(profile["sample_rate"], offset, duration, profile["res_type"])
+                excerpts.append(audio_data)
+        elif profile["excerpts"] and total_duration is None:
+            # Length unknown up front (e.g. some compressed streams): decode the
+            # window once and cut the excerpts from memory instead
+            audio_data, sample_rate = _load(source, profile, profile["offset"], profile["duration"])
+            window = dict(profile, offset=0.0, duration=None)
+            segments = plan_segments(len(audio_data) / sample_rate, window)
+            excerpts = [audio_data[int(offset * sample_rate):
+                                   None if duration is None else int((offset + duration) * sample_rate)]
+                        for offset, duration in segments]
+            segments = [(offset + profile["offset"], duration) for offset, duration in segments]
+        else:
+            segments = plan_segments(total_duration, profile)
+            excerpts = []
+            for offset, duration in segments:
+                audio_data, sample_rate = _load(source, profile, offset, duration)
+                excerpts.append(audio_data)
+        audio_data = _splice(excerpts, sample_rate)
+        record["input_duration"] = len(audio_data) / sample_rate
+
+    decode_info = dict(profile, reader=reader, sample_rate=sample_rate,
+                       segments=[[round(offset, 3), duration] for offset, duration in segments],
+                       analyzed_seconds=round(len(audio_data) / sample_rate, 3))
+    return audio_data, sample_rate, decode_info
@@ -0,0 +1,327 @@
+"""
+Per-track feature vectors and "find similar tracks" search.
+
+The analyzers' numeric descriptors are kept as one fixed-width float32 vector
+per track:
+- the key estimator's 12-bin chroma average, normalized to sum to 1,
+- the instrument detector's spectral centroid, rolloff and bandwidth (Hz),
+- the mood analyzer's energy (RMS) and tempo (BPM).
+
+`VectorStore` is an append-only columnar store of these vectors: immutable
+segments of shape (FEATURE_DIM, n), one contiguous float32 column per
+feature, opened with mmap. `SimilarityIndex` standardizes the columns and
+answers nearest-neighbour queries by cosine similarity, either with one
+BLAS matrix-vector product over every track or, with `partitions`, only
+over the few k-means partitions closest to the query.
+
+    python feature_store.py similar vectors/ --track song.wav [-k 10] [--partitions 1024]
+    python feature_store.py info vectors/
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from key_engine import PITCH_CLASSES
+from key_analyzer import combined_chroma
+
+FEATURE_NAMES = [f"chroma_{pitch_class}" for pitch_class in PITCH_CLASSES] + [
+    "spectral_centroid", "spectral_rolloff", "spectral_bandwidth", "energy", "tempo",
+]
+FEATURE_DIM = len(FEATURE_NAMES)
+# Each group gets equal total weight in the similarity, so 12 chroma bins do not drown out tempo
+FEATURE_GROUPS = {
+    "chroma": [name for name in FEATURE_NAMES if name.startswith("chroma_")],
+    "timbre": ["spectral_centroid", "spectral_rolloff", "spectral_bandwidth"],
+    "energy": ["energy"],
+    "tempo": ["tempo"],
+}
+
+STORE_VERSION = 1
+DEFAULT_SEGMENT_SIZE = 1 << 16
+DEFAULT_NPROBE = 8
+_SCAN_ROWS = 1 << 18  # rows per BLAS call when scanning or assigning partitions
+
+
+def feature_vector(features) -> np.ndarray:
+    """Descriptor vector for a whole-file or streaming feature context, in FEATURE_NAMES order."""
+    chroma = combined_chroma(features)
+    chroma = chroma / max(float(np.sum(chroma)), 1e-12)
+    return np.concatenate([chroma, [
+        features.spectral_centroid_mean, features.spectral_rolloff_mean, features.spectral_bandwidth_mean,
+        features.rms_mean, features.tempo,
+    ]]).astype(np.float32)
+
+
+class VectorStore:
+    """
+    Append-only columnar float32 store of per-track feature vectors.
+
+    Rows are buffered by `add` and written by `flush` (automatically every
+    `segment_size` rows) as a new segment: `seg-NNNNNN.npy` holding a
+    (dim, n) array and `seg-NNNNNN.ids` with the n track IDs, one per line.
+    `store.json` lists the segments and is replaced atomically, so readers
+    only ever see complete segments. Re-adding a track ID appends a new row;
+    readers keep the latest. One writer at a time.
+    """
+
+    def __init__(self, path: str, names: Sequence[str] = FEATURE_NAMES, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        self._buffer_ids = []
+        self._buffer_rows = []
+        manifest_path = os.path.join(path, "store.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest["names"] != list(names):
+                raise ValueError(f"Store at {path} has features {self.manifest['names']}, expected {list(names)}")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.manifest = {"version": STORE_VERSION, "names": list(names), "segments": [], "next_segment": 0}
+
+    @property
+    def names(self) -> List[str]:
+        return self.manifest["names"]
+
+    @property
+    def dim(self) -> int:
+        return len(self.manifest["names"])
+
+    def __len__(self) -> int:
+        """Stored rows, including superseded ones and unflushed adds."""
+        return sum(segment["rows"] for segment in self.manifest["segments"]) + len(self._buffer_ids)
+
+    def add(self, track_id: str, vector: Sequence[float]):
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Expected a vector of {self.dim} features, got shape {vector.shape}")
+        if "\n" in track_id:
+            raise ValueError("Track IDs cannot contain newlines")
+        self._buffer_ids.append(track_id)
+        self._buffer_rows.append(vector)
+        if len(self._buffer_ids) >= self.segment_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as a new segment."""
+        if not self._buffer_ids:
+            return
+        self._write_segment(self._buffer_ids, np.stack(self._buffer_rows, axis=1))
+        self._buffer_ids, self._buffer_rows = [], []
+
+    def _write_segment(self, ids: List[str], columns: np.ndarray):
+        self.manifest["segments"].append(self._write_segment_files(ids, columns))
+        self._write_manifest()
+
+    def _write_segment_files(self, ids: List[str], columns: np.ndarray) -> Dict[str, Any]:
+        """Write a segment's files without listing it in the manifest; returns its manifest entry."""
+        name = f"seg-{self.manifest['next_segment']:06d}"
+        self.manifest["next_segment"] += 1
+        with open(os.path.join(self.path, name + ".ids.tmp"), "w", encoding="utf-8") as f:
+            f.write("\n".join(ids) + "\n")
+        with open(os.path.join(self.path, name + ".npy.tmp"), "wb") as f:
+            np.save(f, np.ascontiguousarray(columns, dtype=np.float32))
+        for suffix in (".ids", ".npy"):
+            os.replace(os.path.join(self.path, name + suffix + ".tmp"), os.path.join(self.path, name + suffix))
+        return {"name": name, "rows": len(ids)}
+
+    def _write_manifest(self):
+        manifest_path = os.path.join(self.path, "store.json")
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def segments(self) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """(track IDs, memory-mapped (dim, n) columns) per flushed segment, oldest first."""
+        for segment in self.manifest["segments"]:
+            base = os.path.join(self.path, segment["name"])
+            with open(base + ".ids", encoding="utf-8") as f:
+                ids = f.read().splitlines()
+            yield ids, np.load(base + ".npy", mmap_mode="r")
+
+    def column(self, name: str) -> np.ndarray:
+        """One feature across every stored row (a copy, gathered from each segment's mapping)."""
+        index = self.names.index(name)
+        return np.concatenate([columns[index] for _, columns in self.segments()] or [np.zeros(0, np.float32)])
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Track IDs and their (n, dim) vectors, latest row per ID, in storage order.
+        """
+        ids, blocks = [], []
+        for segment_ids, columns in self.segments():
+            ids.extend(segment_ids)
+            blocks.append(np.asarray(columns).T)
+        if not ids:
+            return np.array([], dtype=object), np.zeros((0, self.dim), dtype=np.float32)
+        vectors = np.concatenate(blocks)
+        latest = {track_id: row for row, track_id in enumerate(ids)}
+        ids = np.array(ids, dtype=object)
+        if len(latest) < len(ids):
+            keep = np.sort(np.fromiter(latest.values(), dtype=np.int64, count=len(latest)))
+            ids, vectors = ids[keep], vectors[keep]
+        return ids, vectors
+
+    def compact(self):
+        """Rewrite the store as superseded-row-free segments of `segment_size` rows."""
+        self.flush()
+        old_segments = self.manifest["segments"]
+        ids, vectors = self.load()
+        # Write every new segment before switching the manifest over in one atomic replace, so an
+        # interrupted compaction leaves the old segments listed (plus unlisted files) and loses nothing
+        new_segments = [self._write_segment_files(list(ids[start:start + self.segment_size]),
+                                                  vectors[start:start + self.segment_size].T)
+                        for start in range(0, len(ids), self.segment_size)]
+        self.manifest["segments"] = new_segments
+        self._write_manifest()
+        for segment in old_segments:
+            for suffix in (".ids", ".npy"):
+                os.remove(os.path.join(self.path, segment["name"] + suffix))
+
+
+class SimilarityIndex:
+    """
+    Nearest neighbours by cosine similarity of standardized, group-weighted vectors.
+
+    Everything is precomputed into one unit-norm (n, dim) float32 matrix, so
+    a query is a single BLAS matrix-vector product plus a partial sort. With
+    `partitions`, rows are clustered by spherical k-means and stored
+    partition by partition; a query then scans only the `nprobe` partitions
+    whose centroids are closest, trading a little recall for speed.
+    """
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, names: Sequence[str] = FEATURE_NAMES,
+                 partitions: int = 0, nprobe: int = DEFAULT_NPROBE, seed: int = 0):
+        self.names = list(names)
+        self.nprobe = nprobe
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mean = vectors.mean(axis=0, dtype=np.float64).astype(np.float32) if len(vectors) else 0.0
+        std = vectors.std(axis=0, dtype=np.float64).astype(np.float32) if len(vectors) else 1.0
+        self.scale = self._group_weights() / np.where(std > 1e-12, std, 1.0)
+        self.matrix = self._normalize(vectors)
+        self.ids = np.asarray(ids, dtype=object)
+        self.centroids = None
+        self.offsets = None
+        self._rows = None
+        if partitions and len(self.ids) > partitions:
+            self._partition(partitions, seed)
+
+    @classmethod
+    def from_store(cls, store: VectorStore, **kwargs) -> "SimilarityIndex":
+        ids, vectors = store.load()
+        return cls(ids, vectors, store.names, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _group_weights(self) -> np.ndarray:
+        weights = np.ones(len(self.names), dtype=np.float32)
+        for group in FEATURE_GROUPS.values():
+            members = [self.names.index(name) for name in group if name in self.names]
+            weights[members] = 1.0 / np.sqrt(len(members)) if members else 1.0
+        return weights
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        standardized = (np.atleast_2d(vectors) - self.mean) * self.scale
+        norms = np.linalg.norm(standardized, axis=1, keepdims=True)
+        return np.ascontiguousarray(standardized / np.maximum(norms, 1e-12), dtype=np.float32)
+
+    def _partition(self, partitions: int, seed: int, iterations: int = 10):
+        rng = np.random.default_rng(seed)
+        sample = self.matrix[rng.choice(len(self.matrix), min(len(self.matrix), 64 * partitions), replace=False)]
+        centroids = sample[rng.choice(len(sample), partitions, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            # Re-seed empty clusters from random sample rows
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignment = np.concatenate([np.argmax(self.matrix[start:start + _SCAN_ROWS] @ centroids.T, axis=1)
+                                     for start in range(0, len(self.matrix), _SCAN_ROWS)])
+        order = np.argsort(assignment, kind="stable")
+        self.matrix = self.matrix[order]
+        self.ids = self.ids[order]
+        self.centroids = centroids.astype(np.float32)
+        self.offsets = np.searchsorted(assignment[order], np.arange(partitions + 1))
+
+    def row(self, track_id: str) -> Optional[int]:
+        if self._rows is None:
+            self._rows = {track_id: i for i, track_id in enumerate(self.ids)}
+        return self._rows.get(track_id)
+
+    def search(self, vector: Sequence[float], k: int = 10, nprobe: int = None,
+               exclude: str = None) -> List[Dict[str, Any]]:
+        """The `k` stored tracks most similar to a raw feature vector, best first."""
+        return self._search(self._normalize(np.asarray(vector, dtype=np.float32))[0], k, nprobe, exclude)
+
+    def similar(self, track_id: str, k: int = 10, nprobe: int = None) -> List[Dict[str, Any]]:
+        """The `k` tracks most similar to a stored track, excluding the track itself."""
+        row = self.row(track_id)
+        if row is None:
+            raise KeyError(f"Track '{track_id}' is not in the index")
+        return self._search(self.matrix[row], k, nprobe, exclude=track_id)
+
+    def _search(self, query: np.ndarray, k: int, nprobe: Optional[int], exclude: Optional[str]):
+        if self.centroids is None:
+            rows = None
+            scores = self.matrix @ query
+        else:
+            probes = np.argsort(self.centroids @ query)[::-1][:nprobe or self.nprobe]
+            ranges = [(self.offsets[p], self.offsets[p + 1]) for p in probes]
+            rows = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+            scores = np.concatenate([self.matrix[start:stop] @ query for start, stop in ranges])
+
+        wanted = min(len(scores), k + (exclude is not None))
+        if wanted == 0:
+            return []
+        top = np.argpartition(-scores, wanted - 1)[:wanted]
+        top = top[np.argsort(-scores[top])]
+        found = top if rows is None else rows[top]
+        results = [{"id": self.ids[row], "score": float(scores[i])} for row, i in zip(found, top)]
+        return [result for result in results if result["id"] != exclude][:k]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Feature-vector store and similar-track search")
+    commands = parser.add_subparsers(dest="command", required=True)
+    similar = commands.add_parser("similar", help="Tracks most similar to a stored track")
+    similar.add_argument("store", help="Vector store directory")
+    similar.add_argument("--track", required=True, help="Track ID (the analyzed path)")
+    similar.add_argument("-k", type=int, default=10, help="Number of results")
+    similar.add_argument("--partitions", type=int, default=0, help="k-means partitions (0: brute force)")
+    similar.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="Partitions scanned per query")
+    info = commands.add_parser("info", help="Store size and per-feature ranges")
+    info.add_argument("store", help="Vector store directory")
+    compact = commands.add_parser("compact", help="Drop superseded rows and merge small segments")
+    compact.add_argument("store", help="Vector store directory")
+    args = parser.parse_args(argv)
+
+    store = VectorStore(args.store)
+    if args.command == "similar":
+        started = time.perf_counter()
+        index = SimilarityIndex.from_store(store, partitions=args.partitions, nprobe=args.nprobe)
+        built = time.perf_counter()
+        results = index.similar(args.track, args.k)
+        print(json.dumps({"track": args.track, "tracks": len(index), "build_seconds": round(built - started, 3),
+                          "query_ms": round((time.perf_counter() - built) * 1000, 3), "similar": results}, indent=2))
+    elif args.command == "info":
+        ids, vectors = store.load()
+        print(json.dumps({
+            "rows": len(store), "tracks": len(ids), "segments": len(store.manifest["segments"]),
+            "features": {name: [float(vectors[:, i].min()), float(vectors[:, i].max())] if len(ids) else []
+                         for i, name in enumerate(store.names)},
+        }, indent=2))
+    else:
+        store.compact()
+        print(json.dumps({"rows": len(store), "segments": len(store.manifest["segments"])}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
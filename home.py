@@ -1,37 +1,75 @@
-import io
-import librosa
+import threading
+import time
+import uuid
 import streamlit as st
-from typing import Dict, Any
-import numpy as np
-from key_analyzer import estimate_key
-from tempo_analyzer import estimate_tempo
-from instrument_analyzer import detect_instruments
-from mood_analyzer import analyze_mood 
-from llm_analyzers import get_perplexity_analysis_llm
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+from llm_analyzers import analyze_text_with_llms_async
+from models.http_client import run_sync, get_backend, get_event_loop
+from models.lookup_cache import DEFAULT_TTL as LOOKUP_TTL, normalize_song_key
+from audio_analysis import get_standardized_output
+from decode_profiles import DECODE_PROFILES, DEFAULT_DECODE_PROFILE
+from result_cache import ResultCache, hash_bytes
+from instrumentation import (PrometheusExporter, collect, configure_from_env, metrics_port_from_env,
+                             start_prometheus_server, summarize_timings)
+from live_analysis import LiveAnalyzer, FileSource, MicrophoneSource
+from hybrid_analysis import DEFAULT_HYBRID_DEADLINE, analyze_hybrid
+from job_queue import (JobQueue, QueueFull, QUEUED, RUNNING, DONE, FAILED, CANCELLED, PREVIEW_ANALYZERS,
+                       PREVIEW_PROFILE, analyze_upload, upload_cache_key)
 
+# Streamlit re-executes this script on every widget interaction, so anything
+# expensive lives in st.cache_resource (one per process) or st.cache_data
+# (memoized across reruns and sessions) rather than at module level
+RESULT_MEMO_ENTRIES = 128
+# The lookup cache already expires entries at LOOKUP_TTL; a short memo TTL keeps
+# the two layers from stacking into twice that
+LOOKUP_MEMO_TTL = min(LOOKUP_TTL, 15 * 60)
+JOB_POLL_SECONDS = 0.5
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """On-disk analysis cache shared by every session in this process"""
+    return ResultCache()
+
+
+@st.cache_resource
+def get_http_backend():
+    """Start the HTTP loop and connection pool once per process"""
+    get_event_loop()
+    return get_backend()
+
+
+@st.cache_resource
+def get_metrics_exporter() -> Optional[PrometheusExporter]:
+    """Apply the ANALYSIS_* instrumentation settings once per process; the exporter if ANALYSIS_METRICS_PORT is set"""
+    configure_from_env()
+    port = metrics_port_from_env()
+    if port is None:
+        return None
+    return start_prometheus_server(port)[1]
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Background workers shared by every session; analysis never runs on the request thread"""
+    return JobQueue(warmup=True)
+
+
+def session_user() -> str:
+    """Per-browser-session ID used for the job queue's per-user limits"""
+    if "user_id" not in st.session_state:
+        st.session_state["user_id"] = uuid.uuid4().hex
+    return st.session_state["user_id"]
+
+
+class _Uncacheable(Exception):
+    """Carries a result out of an st.cache_data function without it being memoized"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__("result not cached")
+        self.result = result
 
 
-def get_standardized_output() -> Dict[str, Any]:
-    """
-    Standard output format for all analysis types
-    """
-    return {
-        "key": "",
-        "tempo": 0.0,
-        "mood": [],
-        "instruments": [],
-        "confidence_scores": {
-            "key": 0.0,
-            "tempo": 0.0,
-            "mood": 0.0,
-            "instruments": 0.0
-        }
-    }
-def process_audio_file(file_content):
-    """Process audio file content and return audio data with sample rate"""
-    audio_bytes = io.BytesIO(file_content)
-    audio_data, sample_rate = librosa.load(audio_bytes)
-    return audio_data, sample_rate
 
 # def download_youtube_audio(url: str):
 #     """Download audio from YouTube URL using youtube-dl"""
@@ -42,61 +80,202 @@ def process_audio_file(file_content):
 #         audio_data, sample_rate = librosa.load(filename, sr=None)
 #         return audio_data, sample_rate, info['title']
 
-def analyze_audio_data(audio_data: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+def analyze_text_with_llms(prompt: str, timings: bool = False) -> Dict[str, Any]:
     """
-    Common analysis function for all audio data
+    Function to analyze text using multiple LLM models
     """
-    output = get_standardized_output()
-    
-    if audio_data is not None and sample_rate is not None:
-        # Analyze key
-        key_info = estimate_key(audio_data, sample_rate)
-        output["key"] = key_info["key"]
-        output["confidence_scores"]["key"] = key_info["confidence"]
-        
-        # Analyze tempo
-        tempo_info = estimate_tempo(audio_data, sample_rate)
-        if "tempo" in output:
-            output["tempo"] = tempo_info["bpm"]
-            output["confidence_scores"]["tempo"] = tempo_info["confidence"]
-        else:
-            output["bpm"] = tempo_info["bpm"]
-            output["confidence_scores"]["bpm"] = tempo_info["confidence"]
-        
-        # Analyze instruments
-        instrument_info = detect_instruments(audio_data, sample_rate)
-        output["instruments"] = instrument_info["detected_instruments"]
-        
-        # Analyze mood based on audio features
-        mood_info = analyze_mood(audio_data, sample_rate)
-        output["mood"] = mood_info["moods"]
-        output["confidence_scores"]["mood"] = mood_info["confidence"]
-    
-    return output
+    with collect() as records:
+        try:
+            results = _analyze_text_with_llms(normalize_song_key(prompt), prompt)
+        except _Uncacheable as e:
+            results = e.result
+    if timings:
+        results = dict(results, timings=summarize_timings(records))
+    return results
+
+@st.cache_data(max_entries=RESULT_MEMO_ENTRIES, ttl=LOOKUP_MEMO_TTL, show_spinner=False)
+def _analyze_text_with_llms(song_key: str, _prompt: str) -> Dict[str, Any]:
+    # Keyed by the normalized prompt, so rephrasings of the same song share an entry
+    get_http_backend()
+    # Fan out to Perplexity and OpenAI concurrently on the shared HTTP loop
+    results = run_sync(analyze_text_with_llms_async(_prompt))
+    if not results.get("key"):
+        # Nothing found (or every provider failed): let the next press retry
+        raise _Uncacheable(results)
+    return results
+
 
 
-def analyze_text_with_llms(prompt: str) -> Dict[str, Any]:
+def analyze_audio_file(uploaded_file, streaming: bool = False, timings: bool = False,
+                       profile: str = DEFAULT_DECODE_PROFILE, segments: bool = False,
+                       song: str = "", deadline: float = DEFAULT_HYBRID_DEADLINE,
+                       progressive: bool = False) -> Optional[Dict[str, Any]]:
     """
-    Function to analyze text using multiple LLM models
+    Function to analyze uploaded audio file on the background workers; None while its job is running.
+    With a `song` title, the LLM lookup runs alongside and both are fused within `deadline` seconds.
+    With `progressive`, a preliminary result from a short excerpt is returned while the full
+    analysis runs; the "progressive" section says which stage a result is from and what each cost.
     """
-    # Get analysis from Perplexity
-    perplexity_result = get_perplexity_analysis_llm(prompt)
-    
-    # Since perplexity_result is already a dictionary, return it directly
-    return perplexity_result
+    content_hash = upload_hash(uploaded_file)
+    if song.strip():
+        # Fused answers depend on how the lookup went this time, so they skip the result cache
+        return background_result(
+            "audio", (content_hash, "hybrid", normalize_song_key(song), deadline, profile),
+            lambda: get_job_queue().submit(analyze_hybrid, uploaded_file.getvalue(), song, deadline, profile,
+                                           user=session_user(), kind="hybrid"),
+        )
+    # Once this upload's preview has run, the full result comes from its job (with its cost), not the cache
+    preview_job = st.session_state.get("jobs", {}).get("preview")
+    previewed = progressive and preview_job is not None and preview_job["request"] == (content_hash,)
+    if not timings and not previewed:
+        # Cached results are served straight away rather than waiting for a free worker
+        cached = get_result_cache().get(upload_cache_key(content_hash, streaming, profile, segments))
+        if cached is not None:
+            return cached
+    if not progressive:
+        # Timings are also collected for the metrics endpoint, but only shown when asked for
+        collect_timings = timings or get_metrics_exporter() is not None
+        results = background_result(
+            "audio", (content_hash, streaming, profile, segments, collect_timings),
+            lambda: get_job_queue().submit(analyze_upload, uploaded_file.getvalue(), content_hash, streaming,
+                                           profile, segments, collect_timings, user=session_user(), kind="audio"),
+        )
+        if results is not None and not timings and "timings" in results:
+            results = {name: value for name, value in results.items() if name != "timings"}
+        return results
 
+    # Submitted first, so it runs ahead of the full analysis in this session's worker slot
+    preview = background_result(
+        "preview", (content_hash,),
+        lambda: get_job_queue().submit(analyze_upload, uploaded_file.getvalue(), content_hash, False,
+                                       PREVIEW_PROFILE, False, True, PREVIEW_ANALYZERS, user=session_user(),
+                                       kind="preview"),
+        show_status=False,
+    )
+    watch = ()
+    preview_job = st.session_state["jobs"].get("preview")
+    if preview is None and preview_job is not None:
+        preview_status = get_job_queue().status(preview_job["job_id"])
+        if preview_status is not None and preview_status["state"] in (QUEUED, RUNNING, DONE):
+            # Redraw as soon as the preview is in, not only when the full result is
+            watch = (preview_job["job_id"],)
+    final = background_result(
+        "audio", (content_hash, streaming, profile, segments, True),
+        lambda: get_job_queue().submit(analyze_upload, uploaded_file.getvalue(), content_hash, streaming, profile,
+                                       segments, True, user=session_user(), kind="audio"),
+        watch=watch,
+    )
+    results, stage = (final, "final") if final is not None else (preview, "preview")
+    if results is None:
+        return None
+    progressive_info = {"stage": stage, "preview": job_cost("preview"), "final": job_cost("audio")}
+    if final is not None and preview is not None and progressive_info["preview"] is not None:
+        progressive_info["preview"].update(key=preview["key"], tempo=preview["tempo"])
+    if final is None or progressive_info["final"] is not None:
+        # A failed full analysis has already been reported; there is nothing refined to describe
+        results = dict(results, progressive=progressive_info)
+    else:
+        results = dict(results)
+    if not timings:
+        results.pop("timings", None)
+    return results
+
+def job_cost(slot: str) -> Optional[Dict[str, float]]:
+    """Seconds from submission to result and seconds of analysis in the worker, for this session's job in `slot`"""
+    entry = st.session_state.get("jobs", {}).get(slot)
+    if entry is None or not entry.get("result"):
+        return None
+    cost = {"ready_seconds": entry.get("ready_seconds")}
+    if entry["result"].get("timings"):
+        cost["compute_seconds"] = entry["result"]["timings"]["total_wall_seconds"]
+    return cost
 
+def upload_hash(uploaded_file) -> str:
+    """Content hash of an upload, computed once per upload per session"""
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hash_bytes(uploaded_file.getvalue())
+    return hashes[uploaded_file.file_id]
 
-def analyze_audio_file(uploaded_file) -> Dict[str, Any]:
+def background_result(slot: str, request: Hashable, submit: Callable[[], str], resubmit: bool = False,
+                      show_status: bool = True, watch: Tuple[str, ...] = (),
+                      show_progress: Callable[[str], None] = None) -> Optional[Dict[str, Any]]:
     """
-    Function to analyze uploaded audio file
+    Result of this session's background job for `request` in `slot`, submitting it when the
+    request changes (or on `resubmit`). Returns None, after drawing the job's status, until it finishes;
+    the status also reruns the page when a job in `watch` finishes. `show_status=False` draws nothing,
+    and `show_progress(job_id)` replaces the default status while the job is queued or running.
     """
-    try:
-        audio_data, sample_rate = process_audio_file(uploaded_file.read())
-        return analyze_audio_data(audio_data, sample_rate)
-    except Exception as e:
-        st.error(f"Error processing audio file: {str(e)}")
-        return get_standardized_output()
+    job_queue = get_job_queue()
+    jobs = st.session_state.setdefault("jobs", {})
+    entry = jobs.get(slot)
+    if entry is None or entry["request"] != request or resubmit:
+        if entry is not None:
+            # Superseded by new options or a new upload
+            job_queue.cancel(entry["job_id"])
+        try:
+            job_id = submit()
+        except QueueFull as e:
+            jobs.pop(slot, None)
+            st.warning(f"The server is busy, please try again shortly: {str(e)}")
+            return None
+        entry = jobs[slot] = {"request": request, "job_id": job_id}
+
+    if "result" in entry:
+        return entry["result"]
+    status = job_queue.status(entry["job_id"])
+    if status is None:
+        # Finished long enough ago to have been purged without us seeing it; start over
+        jobs.pop(slot)
+        return None
+    if status["state"] == DONE:
+        entry["result"] = job_queue.result(entry["job_id"])
+        entry["ready_seconds"] = status["finished"] - status["submitted"]
+        exporter = get_metrics_exporter()
+        if exporter is not None and status["pool"] == "process" and (entry["result"] or {}).get("timings"):
+            # Worker processes cannot reach this process's exporter; count their stages here
+            exporter.add_timings(entry["result"]["timings"])
+        return entry["result"]
+    if status["state"] == FAILED:
+        if not show_status:
+            entry["result"] = None
+            return None
+        st.error(f"Error processing {slot}: {status['error']}")
+        entry["result"] = get_standardized_output()
+        return entry["result"]
+    if not show_status:
+        return None
+    if status["state"] == CANCELLED:
+        if st.button("Run again", key=f"rerun_{slot}"):
+            jobs.pop(slot)
+            st.rerun()
+        st.info("Analysis cancelled")
+        return None
+    if show_progress is not None:
+        show_progress(entry["job_id"])
+    else:
+        show_job_status(entry["job_id"], watch)
+    return None
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_status(job_id: str, watch: Tuple[str, ...] = ()):
+    """Polls a job without rerunning the page, then reruns it once the result (or one of `watch`) is in"""
+    job_queue = get_job_queue()
+    status = job_queue.status(job_id)
+    if status is None or status["state"] not in (QUEUED, RUNNING):
+        st.rerun()
+    for watched in watch:
+        watched_status = job_queue.status(watched)
+        if watched_status is None or watched_status["state"] not in (QUEUED, RUNNING):
+            st.rerun()
+    status_col, cancel_col = st.columns([4, 1])
+    if status["state"] == QUEUED:
+        status_col.info(f"Waiting for a worker ({status['position']} ahead)")
+    else:
+        status_col.info(f"Analyzing... {time.time() - status['started']:.0f}s")
+    if cancel_col.button("Cancel", key=f"cancel_{job_id}"):
+        job_queue.cancel(job_id)
+        st.rerun()
 
 # def analyze_url_audio(url: str) -> Dict[str, Any]:
 #     """
@@ -109,15 +288,64 @@ def analyze_audio_file(uploaded_file) -> Dict[str, Any]:
 #         st.error(f"Error processing URL audio: {str(e)}")
 #         return get_standardized_output()
 
-def analyze_system_recording() -> Dict[str, Any]:
+def analyze_system_recording(source, on_update=None, duration: float = None,
+                             stop: threading.Event = None) -> Dict[str, Any]:
     """
-    Function to analyze system recording
+    Function to analyze live input (microphone, or a file played back in real time).
+    `source` may also be a callable returning the source, so a file is decoded off the request thread.
     """
-    # This would be implemented with actual recording functionality
     output = get_standardized_output()
-    # Placeholder for recording implementation
+    if callable(source):
+        source = source()
+    last = LiveAnalyzer().run(source, on_update, duration, stop)
+    if last is not None:
+        output["key"] = last["key"]
+        output["tempo"] = last["bpm"]
+        output["confidence_scores"]["key"] = last["key_confidence"]
+        output["confidence_scores"]["tempo"] = last["tempo_confidence"]
     return output
 
+def live_result(live: Dict[str, Any], source=None) -> Optional[Dict[str, Any]]:
+    """
+    Result of this session's live recording `live` (see `main`), run as a thread job on the queue;
+    None, after drawing its newest update, while it is still recording. `source` starts it.
+    """
+    def record_update(update):
+        live["update"] = update
+
+    return background_result(
+        "live", (live["id"],),
+        lambda: get_job_queue().submit(analyze_system_recording, source, record_update, live["duration"],
+                                       live["stop"], user=session_user(), pool="thread", kind="live"),
+        show_progress=lambda job_id: show_live_updates(job_id, live),
+    )
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_live_updates(job_id: str, live: Dict[str, Any]):
+    """Draws the newest live BPM/key while the recording's job runs, then reruns the page for its result"""
+    job_queue = get_job_queue()
+    status = job_queue.status(job_id)
+    if status is None or status["state"] not in (QUEUED, RUNNING):
+        st.rerun()
+    update = live["update"]
+    if status["state"] == QUEUED:
+        st.info(f"Waiting for a worker ({status['position']} ahead)")
+    elif update is None:
+        st.info("Listening...")
+    else:
+        live_col1, live_col2, live_col3 = st.columns(3)
+        live_col1.metric("Tempo", f"{update['bpm']:.1f} BPM")
+        live_col2.metric("Key", update["key"])
+        live_col3.metric("Time", f"{update['time']:.1f}s",
+                         help=f"CPU load {update['cpu_load']:.0%}, "
+                              f"{update['dropped_seconds']:.1f}s skipped to stay real-time")
+    if st.button("Stop", key=f"stop_{job_id}"):
+        # A running recording stops at its next block and still returns what it has heard
+        live["stop"].set()
+        if status["state"] == QUEUED:
+            job_queue.cancel(job_id)
+        st.rerun()
+
 def display_analysis_results(results: Dict[str, Any]):
     """
     Standardized display of analysis results
@@ -142,35 +370,115 @@ def display_analysis_results(results: Dict[str, Any]):
         )
     
     with col2:
+        # A preview has key and tempo only; moods and instruments come with the full analysis
+        refining = results.get("progressive", {}).get("stage") == "preview"
         st.subheader("Detected Mood")
-        if results["mood"]:
+        if refining:
+            st.write("Analyzing the full track...")
+        elif results["mood"]:
             for mood in results["mood"]:
                 st.write(f"• {mood}")
         else:
             st.write("No mood detected")
             
         st.subheader("Detected Instruments")
-        if results["instruments"]:
+        if refining:
+            st.write("Analyzing the full track...")
+        elif results["instruments"]:
             for instrument in results["instruments"]:
                 st.write(f"• {instrument}")
         else:
             st.write("No instruments detected")
+
+    if results.get("segments"):
+        display_segment_tracks(results["segments"])
+
+    if results.get("hybrid"):
+        hybrid = results["hybrid"]
+        in_time = [source.upper() for source, status in hybrid["sources"].items() if status == "done"]
+        notes = []
+        if hybrid["key_agreement"]:
+            notes.append(f"keys {hybrid['key_agreement']}")
+        if hybrid["tempo_ratio"]:
+            notes.append("tempos agree" if hybrid["tempo_ratio"] == 1 else
+                         f"tempos agree at a {hybrid['tempo_ratio']:.2g}x ratio")
+        st.caption(f"Fused from {' + '.join(in_time) or 'nothing'} in {hybrid['elapsed']:.1f}s"
+                   + (f" ({', '.join(notes)})" if notes else ""))
+
+    if results.get("progressive"):
+        progressive = results["progressive"]
+        preview = progressive.get("preview")
+        if progressive["stage"] == "preview":
+            st.caption(f"Preliminary result from a short excerpt, ready in {describe_cost(preview)}; "
+                       "refining on the full track...")
+        else:
+            steps = []
+            if preview and "key" in preview:
+                steps.append(f"preview ({preview['key']}, {preview['tempo']:.1f} BPM) in {describe_cost(preview)}")
+            steps.append(f"full track in {describe_cost(progressive['final'])}")
+            st.caption("Refined: " + ", then ".join(steps))
+
+    if results.get("decode"):
+        decode = results["decode"]
+        st.caption(f"Decode profile: {decode['name']} ({decode['sample_rate']} Hz, "
+                   f"{decode['analyzed_seconds']:.0f}s analyzed)")
+
+    if results.get("timings"):
+        with st.expander(f"Stage timings ({results['timings']['total_wall_seconds']:.2f}s total)"):
+            st.table(results["timings"]["stages"])
+
+def describe_cost(cost: Optional[Dict[str, float]]) -> str:
+    """"1.2s (0.8s analysis)": time until a job's result was ready, and how much of it the worker spent analyzing"""
+    if not cost or cost.get("ready_seconds") is None:
+        return "an unknown time"
+    text = f"{cost['ready_seconds']:.1f}s"
+    if cost.get("compute_seconds") is not None:
+        text += f" ({cost['compute_seconds']:.1f}s analysis)"
+    return text
+
+def display_segment_tracks(tracks: Dict[str, Any]):
+    """
+    Tempo curve and key changes from sliding-window analysis
+    """
+    st.subheader("Key and Tempo Over Time")
+    segments = tracks["segments"]
+    if not segments:
+        st.write("Track too short for segment analysis")
+        return
+    st.line_chart({"Time (s)": [s["start"] for s in segments], "BPM": [s["bpm"] for s in segments]},
+                  x="Time (s)", y="BPM")
+    if tracks["key_changes"]:
+        for change in tracks["key_changes"]:
+            st.write(f"• {change['time']:.0f}s: {change['from']} → {change['to']}")
+    else:
+        st.write(f"No key changes ({segments[0]['key']} throughout)")
+
 def main():
+    get_metrics_exporter()
     st.title("🎯 Music Analysis Hub")
+    show_timings = st.sidebar.checkbox("Show stage timings", help="Wall time, CPU time and input duration per stage")
     
-    tab1, tab2, = st.tabs([
+    tab1, tab2, tab4 = st.tabs([
         "LLM Analysis", 
         "Audio File Analysis (Librosa)",
         # "URL Audio Analysis (librosa)",
-        # "Live Recording Analysis (librosa)"
+        "Live Recording Analysis (librosa)"
     ])
     
     with tab1:
         st.header("Multi-LLM Analysis")
         prompt = st.text_area("Enter your prompt:")
-        if st.button("Analyze Text"):
-            with st.spinner("Processing with LLMs..."):
-                results = analyze_text_with_llms(prompt)
+        pressed = st.button("Analyze Text")
+        # Keep showing the last answer across reruns until the prompt changes
+        text_job = st.session_state.get("jobs", {}).get("text")
+        if pressed or (text_job is not None and text_job["request"][0] == normalize_song_key(prompt)):
+            results = background_result(
+                "text", (normalize_song_key(prompt), show_timings),
+                lambda: get_job_queue().submit_text(prompt, user=session_user(), fn=analyze_text_with_llms,
+                                                    timings=show_timings),
+                resubmit=pressed,
+            )
+            if results is not None:
                 display_analysis_results(results)
     
     with tab2:
@@ -179,10 +487,39 @@ def main():
             "Upload audio file",
             type=["mp3", "wav", "ogg", "flac"]
         )
+        streaming = st.checkbox(
+            "Streaming mode (long recordings)",
+            help="Analyze block by block instead of decoding the whole file into memory"
+        )
+        profile = st.selectbox(
+            "Decode profile",
+            list(DECODE_PROFILES),
+            index=list(DECODE_PROFILES).index(DEFAULT_DECODE_PROFILE),
+            disabled=streaming,
+            help="fast/balanced analyze a few excerpts at a lower-cost resampling; accurate decodes the whole file"
+        )
+        segments = st.checkbox(
+            "Key and tempo over time",
+            help="Track key modulations and tempo drift over sliding windows"
+        )
+        progressive = st.checkbox(
+            "Quick preview first", value=True,
+            help="Show a preliminary key and BPM from a short excerpt within about a second, "
+                 "then refine it on the full track"
+        )
+        song = st.text_input(
+            "Song title and artist (optional)",
+            help="Also look the song up with the LLMs and fuse both answers"
+        )
+        deadline = DEFAULT_HYBRID_DEADLINE
+        if song.strip():
+            deadline = st.slider("Answer within (seconds)", 5, 60, int(DEFAULT_HYBRID_DEADLINE),
+                                 help="Whatever has finished by then is fused; a late source is left out")
         if uploaded_file:
             st.audio(uploaded_file)
-            with st.spinner("Analyzing audio..."):
-                results = analyze_audio_file(uploaded_file)
+            results = analyze_audio_file(uploaded_file, streaming, show_timings, profile, segments, song, deadline,
+                                         progressive)
+            if results is not None:
                 display_analysis_results(results)
     
     # with tab3:
@@ -193,15 +530,43 @@ def main():
     #             results = analyze_url_audio(url)
     #             display_analysis_results(results)
     
-    # with tab4:
-    #     st.header("Live Recording Analysis")
-    #     if st.button("Start Recording"):
-    #         with st.spinner("Recording and analyzing..."):
-    #             results = analyze_system_recording()
-    #             display_analysis_results(results)
+    with tab4:
+        st.header("Live Recording Analysis")
+        input_type = st.radio("Input", ["Audio file (played back in real time)", "Microphone"])
+        live_file = None
+        if input_type == "Microphone":
+            duration = st.slider("Recording length (seconds)", 5, 120, 30)
+        else:
+            live_file = st.file_uploader("Upload audio file", type=["mp3", "wav", "ogg", "flac"], key="live_file")
+            duration = None
+        source = None
+        if st.button("Start Recording"):
+            try:
+                if input_type == "Microphone":
+                    source = MicrophoneSource(duration=duration)
+                elif live_file is not None:
+                    # Decoded in the job, not here
+                    live_bytes = live_file.getvalue()
+                    source = lambda: FileSource(live_bytes)
+                else:
+                    st.warning("Upload a file to play back")
+            except RuntimeError as e:
+                st.error(str(e))
+        # The recording runs on the job queue; this session keeps its newest update and a stop switch
+        live = st.session_state.get("live")
+        if source is not None:
+            if live is not None:
+                live["stop"].set()
+            live = st.session_state["live"] = {"id": uuid.uuid4().hex, "duration": duration,
+                                               "stop": threading.Event(), "update": None}
+        if live is not None:
+            live_results = live_result(live, source)
+            if live_results is not None:
+                results = live_results
+                display_analysis_results(results)
     
     with st.expander("Show Raw JSON Output"):
-        if 'results' in locals():
+        if locals().get('results') is not None:
             st.json(results)
 
 if __name__ == "__main__":
@@ -0,0 +1,250 @@
+"""
+Hybrid analysis: the local DSP pipeline and the LLM lookup run side by side
+and are fused into one answer within a latency deadline.
+
+Both start at once. When both finish, or the deadline passes, whatever is
+available is fused:
+- Keys that agree reinforce each other; related keys (relative, parallel,
+  or a fifth apart) partially do.
+- Tempos are compared up to octave (x2, x0.5) and 3:2 errors, so a
+  half-time DSP estimate and a published BPM count as agreement. The fused
+  tempo is reported at the more trusted source's metrical level.
+
+The call returns at the deadline. A lookup still running then is
+cancelled, and a late DSP pass is told to stop at its next stage and
+winds down in the background; the answer is then the LLM's alone. DSP
+passes run on a small shared pool, and at most HYBRID_DSP_PASSES of them
+(late ones included) exist at once, so late passes cannot pile up behind
+a stream of short deadlines: a call that finds every slot taken answers
+from the lookup alone.
+
+    python hybrid_analysis.py song.wav "Song Title by Artist" [--deadline 20]
+"""
+import argparse
+import contextvars
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional, Tuple
+from audio_analysis import get_standardized_output, analyze_audio_source
+from key_engine import PITCH_CLASSES
+from llm_analyzers import analyze_text_with_llms_async
+from models.http_client import submit_async
+from instrumentation import StageCancelled, cancel_on, stage
+
+DEFAULT_HYBRID_DEADLINE = float(os.environ.get("HYBRID_DEADLINE", 20.0))
+# DSP passes in progress at once, counting late ones that are still stopping
+HYBRID_DSP_PASSES = int(os.environ.get("HYBRID_DSP_PASSES", 2))
+# Trust in each source's self-reported confidence
+DSP_WEIGHT = 1.0
+LLM_WEIGHT = 0.8
+TEMPO_TOLERANCE = 0.04  # relative difference still counted as agreement
+TEMPO_RATIOS = (1.0, 2.0, 0.5, 1.5, 2.0 / 3.0)  # DSP / LLM ratios reconciled, in order of preference
+
+_KEY_PATTERN = re.compile(r"^\s*([A-G])\s*(#|♯|b|♭|-?sharp|-?flat)?\s*(major|maj|minor|min|m)?(?![a-z])",
+                          re.IGNORECASE)
+
+def parse_key(text: Any) -> Optional[str]:
+    """Canonical "C# minor"-style label for free-text keys like "Db Major", "F♯m" or "a minor"."""
+    if not isinstance(text, str):
+        return None
+    match = _KEY_PATTERN.match(text.replace("♮", ""))
+    if match is None:
+        return None
+    letter, accidental, mode = match.groups()
+    pitch = PITCH_CLASSES.index(letter.upper())
+    if accidental:
+        pitch += 1 if accidental.lower().lstrip("-") in ("#", "♯", "sharp") else -1
+    # "Am"/"A min"/"A minor" are minor; a bare letter or "maj" is major
+    minor = mode is not None and mode.lower() in ("minor", "min", "m") and mode != "M"
+    return f"{PITCH_CLASSES[pitch % 12]} {'minor' if minor else 'major'}"
+
+
+def key_relation(first: str, second: str) -> str:
+    """"same", "related" (relative, parallel or a fifth apart) or "different"."""
+    if first == second:
+        return "same"
+    (tonic_a, mode_a), (tonic_b, mode_b) = ((PITCH_CLASSES.index(key.split()[0]), key.split()[1])
+                                            for key in (first, second))
+    interval = (tonic_b - tonic_a) % 12
+    if mode_a == mode_b:
+        return "related" if interval in (5, 7) else "different"
+    relative = 9 if mode_a == "major" else 3  # e.g. C major -> A minor, A minor -> C major
+    return "related" if interval in (0, relative) else "different"
+
+
+def _as_float(value: Any) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if math.isfinite(number) else 0.0
+
+
+def _either(first: float, second: float) -> float:
+    """Confidence that at least one of two independent sources is right."""
+    return 1.0 - (1.0 - first) * (1.0 - second)
+
+
+def fuse_key(dsp_key: Optional[str], dsp_confidence: float, llm_key: Optional[str],
+             llm_confidence: float) -> Tuple[str, float, Optional[str]]:
+    """Fused (key, confidence, relation between the two answers or None if only one)."""
+    if not llm_key or not dsp_key:
+        if llm_key:
+            return llm_key, llm_confidence, None
+        return dsp_key or "", dsp_confidence if dsp_key else 0.0, None
+    relation = key_relation(dsp_key, llm_key)
+    if DSP_WEIGHT * dsp_confidence >= LLM_WEIGHT * llm_confidence:
+        (key, winner), loser = (dsp_key, dsp_confidence), llm_confidence
+    else:
+        (key, winner), loser = (llm_key, llm_confidence), dsp_confidence
+    if relation == "same":
+        return key, _either(winner, loser), relation
+    if relation == "related":
+        return key, _either(winner, loser / 2), relation
+    return key, winner * (1.0 - loser / 2), relation
+
+
+def reconcile_tempo(dsp_bpm: float, llm_bpm: float) -> Optional[float]:
+    """The ratio r with dsp_bpm ≈ r * llm_bpm (octave and 3:2 errors), or None."""
+    for ratio in TEMPO_RATIOS:
+        if abs(dsp_bpm / (llm_bpm * ratio) - 1.0) <= TEMPO_TOLERANCE:
+            return ratio
+    return None
+
+
+def fuse_tempo(dsp_bpm: float, dsp_confidence: float, llm_bpm: float,
+               llm_confidence: float) -> Tuple[float, float, Optional[float]]:
+    """Fused (bpm, confidence, DSP/LLM ratio reconciled or None)."""
+    if llm_bpm <= 0 or dsp_bpm <= 0:
+        return (llm_bpm, llm_confidence, None) if llm_bpm > 0 else (dsp_bpm, dsp_confidence, None)
+    dsp_weight, llm_weight = DSP_WEIGHT * dsp_confidence, LLM_WEIGHT * llm_confidence
+    ratio = reconcile_tempo(dsp_bpm, llm_bpm)
+    if ratio is None:
+        if dsp_weight >= llm_weight:
+            return dsp_bpm, dsp_confidence * (1.0 - llm_confidence / 2), None
+        return llm_bpm, llm_confidence * (1.0 - dsp_confidence / 2), None
+    # Same pulse: average the two in the more trusted source's metrical level
+    if dsp_weight + llm_weight == 0:
+        return llm_bpm, 0.0, ratio
+    if dsp_weight >= llm_weight:
+        bpm = (dsp_weight * dsp_bpm + llm_weight * llm_bpm * ratio) / (dsp_weight + llm_weight)
+    else:
+        bpm = (dsp_weight * dsp_bpm / ratio + llm_weight * llm_bpm) / (dsp_weight + llm_weight)
+    return bpm, _either(dsp_confidence, llm_confidence), ratio
+
+
+def fuse_results(dsp: Optional[Dict[str, Any]], llm: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fuse a DSP result and an LLM result (either may be None) into the standard output."""
+    output = get_standardized_output()
+    dsp = dsp or {}
+    llm = llm or {}
+    dsp_scores = dsp.get("confidence_scores") or {}
+    llm_scores = llm.get("confidence_scores") or {}
+
+    key, key_confidence, relation = fuse_key(
+        dsp.get("key") or None, _as_float(dsp_scores.get("key")),
+        parse_key(llm.get("key")), _as_float(llm_scores.get("key")),
+    )
+    output["key"] = key
+    output["confidence_scores"]["key"] = key_confidence
+
+    bpm, tempo_confidence, ratio = fuse_tempo(
+        _as_float(dsp.get("tempo")), _as_float(dsp_scores.get("tempo")),
+        _as_float(llm.get("bpm")), _as_float(llm_scores.get("bpm")),
+    )
+    output["tempo"] = bpm
+    output["confidence_scores"]["tempo"] = tempo_confidence
+
+    # Named moods and instruments from the lookup beat the DSP's coarse spectral labels
+    for field in ("mood", "instruments"):
+        values = [value for value in llm.get(field) or [] if value]
+        if values:
+            output[field] = values
+            output["confidence_scores"][field] = _as_float(llm_scores.get(field))
+        elif dsp:
+            output[field] = dsp.get(field, [])
+            output["confidence_scores"][field] = _as_float(dsp_scores.get(field))
+
+    for section in ("decode", "segments", "feature_vector"):
+        if section in dsp:
+            output[section] = dsp[section]
+    output["hybrid"] = {"key_agreement": relation, "tempo_ratio": ratio}
+    return output
+
+
+_dsp_pool = ThreadPoolExecutor(max_workers=HYBRID_DSP_PASSES, thread_name_prefix="hybrid-dsp")
+_dsp_slots = threading.BoundedSemaphore(HYBRID_DSP_PASSES)
+
+
+def _outcome(future) -> Tuple[str, Optional[Dict[str, Any]]]:
+    if not future.done():
+        return "late", None
+    if future.cancelled() or isinstance(future.exception(), StageCancelled):
+        return "late", None
+    if future.exception() is not None:
+        return "failed", None
+    return "done", future.result()
+
+
+def analyze_hybrid(source, prompt: str, deadline: float = DEFAULT_HYBRID_DEADLINE,
+                   profile=None) -> Dict[str, Any]:
+    """
+    Analyze audio (a path, file-like object or bytes) and look the song up
+    (`prompt`, e.g. "Title by Artist") concurrently, fusing what finished
+    within `deadline` seconds. The "hybrid" section says which sources made
+    it in time ("busy" if no DSP slot was free) and how their answers related.
+    """
+    started = time.perf_counter()
+    cancel_dsp = threading.Event()
+
+    def run_dsp():
+        with cancel_on(cancel_dsp):
+            return analyze_audio_source(source, profile)
+
+    with stage("hybrid", deadline=deadline):
+        llm = submit_async(analyze_text_with_llms_async(prompt, deadline))
+        dsp = None
+        if _dsp_slots.acquire(timeout=deadline):
+            dsp = _dsp_pool.submit(contextvars.copy_context().run, run_dsp)
+            dsp.add_done_callback(lambda _: _dsp_slots.release())
+        wait([future for future in (dsp, llm) if future is not None],
+             timeout=max(0.0, deadline - (time.perf_counter() - started)))
+        # A lookup still waiting on the network is abandoned; a late DSP pass stops at its next stage
+        llm.cancel()
+        cancel_dsp.set()
+        # Sampled after the cancel, so a pass that finished in the meantime still counts
+        dsp_status, dsp_result = _outcome(dsp) if dsp is not None else ("busy", None)
+        llm_status, llm_result = _outcome(llm)
+    if llm_status == "done" and not (llm_result.get("key") or llm_result.get("bpm")):
+        llm_status, llm_result = "empty", None
+    if dsp_status == "failed":
+        print(f"Hybrid DSP analysis failed: {dsp.exception()}")
+
+    output = fuse_results(dsp_result, llm_result)
+    output["hybrid"].update({
+        "deadline": deadline,
+        "elapsed": round(time.perf_counter() - started, 3),
+        "sources": {"dsp": dsp_status, "llm": llm_status},
+    })
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuse local DSP analysis with an LLM lookup under a deadline")
+    parser.add_argument("input", help="Audio file")
+    parser.add_argument("prompt", help="Song to look up, e.g. 'Blinding Lights by The Weeknd'")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_HYBRID_DEADLINE, help="Seconds to answer within")
+    parser.add_argument("--profile", default=None, help="Decode profile for the DSP pass")
+    args = parser.parse_args(argv)
+    print(json.dumps(analyze_hybrid(args.input, args.prompt, args.deadline, args.profile), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,18 @@
 import numpy as np
-import librosa
 from typing import Dict, Any
+from audio_features import AudioFeatures, get_features
 
-def detect_instruments(audio_data: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+def detect_instruments(audio_data: np.ndarray, sample_rate: int, features: AudioFeatures = None) -> Dict[str, Any]:
     """
     Detect instruments based on spectral features.
     """
-    spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sample_rate)[0]
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=audio_data, sr=sample_rate)[0]
-    spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio_data, sr=sample_rate)[0]
-    
+    features = get_features(audio_data, sample_rate, features)
+
     instruments = []
     
-    mean_centroid = np.mean(spectral_centroids)
-    mean_rolloff = np.mean(spectral_rolloff)
-    mean_bandwidth = np.mean(spectral_bandwidth)
+    mean_centroid = features.spectral_centroid_mean
+    mean_rolloff = features.spectral_rolloff_mean
+    mean_bandwidth = features.spectral_bandwidth_mean
     
     if mean_centroid > 3000 and mean_rolloff > 7000:
         instruments.append("High-frequency instruments (possibly cymbals/hi-hats)")
@@ -0,0 +1,320 @@
+"""
+Per-stage timing and memory instrumentation for the analysis pipeline.
+
+Wrap work in `stage("name")` (sync or inside coroutines) to record wall
+time, CPU time, peak traced allocation and input audio duration. Records
+go to registered hooks, e.g. the structured-log hook or the Prometheus
+exporter, and to any active `collect()` block, which is how results get
+their optional "timings" section.
+
+Memory tracking and structured logs are per process. `configure_from_env`
+turns them on from ANALYSIS_TRACE_MEMORY and ANALYSIS_LOG_STAGES, which
+worker processes inherit; ANALYSIS_METRICS_PORT is read by the processes
+that serve the Prometheus endpoint.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any, Callable, List, Optional
+
+logger = logging.getLogger("audio_analysis.timings")
+
+TRACE_MEMORY_ENV = "ANALYSIS_TRACE_MEMORY"
+LOG_STAGES_ENV = "ANALYSIS_LOG_STAGES"
+METRICS_PORT_ENV = "ANALYSIS_METRICS_PORT"
+
+_hooks: List[Callable[[Dict[str, Any]], None]] = []
+_hooks_lock = threading.Lock()
+_stack = contextvars.ContextVar("instrumentation_stack", default=())
+_cancel_event = contextvars.ContextVar("instrumentation_cancel_event", default=None)
+_collectors = contextvars.ContextVar("instrumentation_collectors", default=())
+
+
+def add_hook(hook: Callable[[Dict[str, Any]], None]):
+    """Call `hook(record)` for every finished stage."""
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[Dict[str, Any]], None]):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def set_memory_tracking(enabled: bool = True):
+    """Start or stop tracemalloc so stages report peak allocation (adds some overhead)."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _flush_peak(stack):
+    # Fold the traced peak since the last reset into every open stage, then reset,
+    # so nested stages each see their own peak without clobbering their parents
+    _, peak = tracemalloc.get_traced_memory()
+    for frame in stack:
+        frame["_peak"] = max(frame["_peak"], peak)
+    tracemalloc.reset_peak()
+
+
+class StageCancelled(Exception):
+    """Raised when a stage starts after the surrounding `cancel_on` event was set."""
+
+
+@contextmanager
+def cancel_on(event: threading.Event):
+    """
+    Make work inside the block stop at its next stage once `event` is set.
+
+    Stages are the only checkpoints, so a stage already running finishes
+    first. Threads that copy the caller's context see the same event.
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+@contextmanager
+def stage(name: str, input_duration: Optional[float] = None, **labels):
+    """
+    Time a pipeline stage.
+
+    Yields the record so callers can fill in `input_duration` or labels
+    once they are known (e.g. after decoding). Raises StageCancelled
+    instead of starting if a `cancel_on` event is set.
+    """
+    cancel = _cancel_event.get()
+    if cancel is not None and cancel.is_set():
+        raise StageCancelled(f"Stage '{name}' cancelled")
+    parent_stack = _stack.get()
+    tracing = tracemalloc.is_tracing()
+    record = {
+        "stage": name,
+        "parent": parent_stack[-1]["stage"] if parent_stack else None,
+        "input_duration": input_duration,
+        "labels": labels,
+    }
+    frame = {"stage": name, "_peak": 0, "_start_alloc": 0}
+    if tracing:
+        _flush_peak(parent_stack)
+        frame["_start_alloc"] = tracemalloc.get_traced_memory()[0]
+    token = _stack.set(parent_stack + (frame,))
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        yield record
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record["started"] = wall_start
+        record["wall_seconds"] = time.perf_counter() - wall_start
+        record["cpu_seconds"] = time.process_time() - cpu_start
+        if tracing and tracemalloc.is_tracing():
+            _flush_peak(_stack.get())
+            record["peak_alloc_bytes"] = max(0, frame["_peak"] - frame["_start_alloc"])
+        else:
+            record["peak_alloc_bytes"] = None
+        record["error"] = error
+        _stack.reset(token)
+        _emit(record)
+
+
+def instrumented(name: str):
+    """Decorator form of `stage` for functions and lazily computed features."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _emit(record: Dict[str, Any]):
+    for collected in _collectors.get():
+        collected.append(record)
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            logger.warning(f"Instrumentation hook failed: {e}")
+
+
+@contextmanager
+def collect():
+    """Collect every stage record finished inside the block (including nested calls)."""
+    records = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+
+def summarize_timings(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compact per-stage view for the result JSON's "timings" section."""
+    stages = []
+    for record in records:
+        entry = {
+            "stage": record["stage"],
+            "wall_seconds": round(record["wall_seconds"], 4),
+            "cpu_seconds": round(record["cpu_seconds"], 4),
+        }
+        if record.get("parent"):
+            entry["parent"] = record["parent"]
+        if record.get("input_duration") is not None:
+            entry["input_duration"] = round(record["input_duration"], 3)
+        if record.get("peak_alloc_bytes") is not None:
+            entry["peak_alloc_mb"] = round(record["peak_alloc_bytes"] / 2 ** 20, 2)
+        if record.get("labels"):
+            entry["labels"] = record["labels"]
+        if record.get("error"):
+            entry["error"] = record["error"]
+        stages.append(entry)
+    # Span rather than sum: top-level stages may overlap (e.g. concurrent LLM calls)
+    total = 0.0
+    if records:
+        total = max(r["started"] + r["wall_seconds"] for r in records) - min(r["started"] for r in records)
+    return {
+        "total_wall_seconds": round(total, 4),
+        "stages": stages,
+    }
+
+
+def log_hook(record: Dict[str, Any]):
+    """Structured-log hook: one JSON line per stage on the `audio_analysis.timings` logger."""
+    logger.info(json.dumps(record, default=str))
+
+
+def enable_structured_logging(level: int = logging.INFO):
+    logging.basicConfig(level=level)
+    logger.setLevel(level)
+    with _hooks_lock:
+        enabled = log_hook in _hooks
+    if not enabled:
+        add_hook(log_hook)
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def configure_from_env():
+    """Enable memory tracking and structured stage logs in this process if the environment asks for them."""
+    if _env_flag(TRACE_MEMORY_ENV):
+        set_memory_tracking(True)
+    if _env_flag(LOG_STAGES_ENV):
+        enable_structured_logging()
+
+
+def metrics_port_from_env() -> Optional[int]:
+    """The Prometheus port from ANALYSIS_METRICS_PORT, or None when unset."""
+    port = os.environ.get(METRICS_PORT_ENV, "").strip()
+    return int(port) if port else None
+
+
+class PrometheusExporter:
+    """Aggregates stage records and renders them in the Prometheus text format."""
+
+    BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+    def __init__(self, namespace: str = "audio_analysis"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def __call__(self, record: Dict[str, Any]):
+        with self._lock:
+            stats = self._stages.setdefault(record["stage"], {
+                "count": 0, "wall": 0.0, "cpu": 0.0, "audio": 0.0, "errors": 0, "peak": 0,
+                "buckets": [0] * len(self.BUCKETS),
+            })
+            stats["count"] += 1
+            stats["wall"] += record["wall_seconds"]
+            stats["cpu"] += record["cpu_seconds"]
+            stats["audio"] += record.get("input_duration") or 0.0
+            stats["errors"] += 1 if record.get("error") else 0
+            stats["peak"] = max(stats["peak"], record.get("peak_alloc_bytes") or 0)
+            for i, bound in enumerate(self.BUCKETS):
+                if record["wall_seconds"] <= bound:
+                    stats["buckets"][i] += 1
+
+    def add_timings(self, timings: Dict[str, Any]):
+        """Count the stages of a result's "timings" section, e.g. one computed in a worker process."""
+        for entry in timings.get("stages", []):
+            peak = entry.get("peak_alloc_mb")
+            self({
+                "stage": entry["stage"],
+                "wall_seconds": entry["wall_seconds"],
+                "cpu_seconds": entry["cpu_seconds"],
+                "input_duration": entry.get("input_duration"),
+                "error": entry.get("error"),
+                "peak_alloc_bytes": int(peak * 2 ** 20) if peak is not None else None,
+            })
+
+    def render(self) -> str:
+        ns = self.namespace
+        with self._lock:
+            stages = {name: dict(stats, buckets=list(stats["buckets"])) for name, stats in self._stages.items()}
+        lines = [
+            f"# HELP {ns}_stage_seconds Wall time per pipeline stage.",
+            f"# TYPE {ns}_stage_seconds histogram",
+        ]
+        for name, stats in sorted(stages.items()):
+            for bound, count in zip(self.BUCKETS, stats["buckets"]):
+                lines.append(f'{ns}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'{ns}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{name}"}} {stats["wall"]:.6f}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        for metric, key, kind, help_text in (
+            ("stage_cpu_seconds_total", "cpu", "counter", "CPU time per pipeline stage."),
+            ("stage_input_audio_seconds_total", "audio", "counter", "Audio seconds processed per stage."),
+            ("stage_errors_total", "errors", "counter", "Stages that raised."),
+            ("stage_peak_alloc_bytes", "peak", "gauge", "Largest traced peak allocation per stage."),
+        ):
+            lines.append(f"# HELP {ns}_{metric} {help_text}")
+            lines.append(f"# TYPE {ns}_{metric} {kind}")
+            for name, stats in sorted(stages.items()):
+                lines.append(f'{ns}_{metric}{{stage="{name}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
+
+
+def start_prometheus_server(port: int, exporter: PrometheusExporter = None, host: str = "0.0.0.0"):
+    """Serve `exporter` at http://host:port/metrics from a daemon thread; returns (server, exporter)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    if exporter is None:
+        exporter = PrometheusExporter()
+        add_hook(exporter)
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = exporter.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server, exporter
@@ -0,0 +1,319 @@
+"""
+Local background job queue for analysis work.
+
+Callers (e.g. the Streamlit request thread) only submit jobs and poll their
+status. CPU-bound audio analysis runs in a pool of worker processes, and
+network-bound LLM lookups run on a small thread pool. It is all plain
+`concurrent.futures` plus in-process bookkeeping, with no external broker.
+
+Admission control: `submit` raises `QueueFull` once `max_pending` jobs are
+waiting, or one user already has `per_user_pending` waiting, instead of
+letting the backlog grow without bound. At most `per_user_limit` jobs per
+user run at once in each pool, and other users' jobs are dispatched past a busy user's
+in FIFO order. Queued jobs can be cancelled outright. A running audio job
+cannot be interrupted inside its worker, so cancelling it discards its
+result.
+
+Worker processes are spawned rather than forked, since the submitting
+process (a web server) is multi-threaded.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, Optional
+import numpy as np
+from audio_analysis import ANALYZER_VERSION, analyze_audio_data, analyze_audio_stream
+from decode_profiles import decode_audio, get_decode_profile
+from instrumentation import collect, summarize_timings
+from result_cache import ResultCache, make_cache_key
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+DEFAULT_MAX_PENDING = 32
+DEFAULT_PER_USER_LIMIT = 1
+DEFAULT_PER_USER_PENDING = 4
+DEFAULT_IO_THREADS = 8
+DEFAULT_RETAIN_SECONDS = 15 * 60  # finished jobs are forgotten after this long
+# Preliminary result shown while the full analysis runs: one short, low-rate excerpt.
+# Moods and instruments come from spectral thresholds that need the full 22050 Hz band
+# (see decode_profiles), so the preview leaves them to the full analysis.
+PREVIEW_PROFILE = "preview"
+PREVIEW_ANALYZERS = ("key", "tempo")
+
+
+class QueueFull(RuntimeError):
+    """Raised by `submit` when admission control turns a job away."""
+
+
+class Job:
+    """One submitted call and its lifecycle."""
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: Dict[str, Any], user: str, pool: str, kind: str):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.user = user
+        self.pool = pool
+        self.kind = kind
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.exception = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "pool": self.pool,
+            "user": self.user,
+            "state": self.state,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "error": str(self.exception) if self.exception is not None else None,
+        }
+
+
+class JobQueue:
+    """
+    Job IDs, status polling and cancellation over a process pool (`pool="process"`)
+    and a thread pool (`pool="thread"`), with per-user limits and a bounded backlog.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = DEFAULT_MAX_PENDING,
+                 per_user_limit: int = DEFAULT_PER_USER_LIMIT, per_user_pending: int = DEFAULT_PER_USER_PENDING,
+                 io_threads: int = DEFAULT_IO_THREADS, warmup: bool = False,
+                 retain_seconds: float = DEFAULT_RETAIN_SECONDS):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.per_user_limit = per_user_limit
+        self.per_user_pending = per_user_pending
+        self.io_threads = io_threads
+        self.warmup = warmup
+        self.retain_seconds = retain_seconds
+        self._capacity = {"process": self.workers, "thread": io_threads}
+        self._pools = {}
+        self._jobs = {}
+        self._pending = deque()
+        self._running = Counter()
+        self._running_by_user = Counter()
+        self._lock = threading.RLock()
+        self._closed = False
+
+    def _pool(self, name: str):
+        if name not in self._pools:
+            if name == "process":
+                from audio_analysis import init_worker
+                # Jobs already run in parallel; one analyzer thread per worker avoids oversubscribing cores
+                analyzer_workers = 1 if self.workers > 1 else None
+                self._pools[name] = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                        initargs=(self.warmup, analyzer_workers),
+                                                        mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pools[name] = ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix="job")
+        return self._pools[name]
+
+    def submit(self, fn: Callable, *args, user: str = "anonymous", pool: str = "process", kind: str = None,
+               **kwargs) -> str:
+        """Queue `fn(*args, **kwargs)` and return its job ID; process jobs need a picklable `fn`."""
+        if pool not in self._capacity:
+            raise ValueError(f"Unknown pool '{pool}'. Available: {sorted(self._capacity)}")
+        job = Job(fn, args, kwargs, user, pool, kind or getattr(fn, "__name__", "job"))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Job queue is shut down")
+            self._purge()
+            if len(self._pending) >= self.max_pending:
+                raise QueueFull(f"{len(self._pending)} jobs already waiting; try again shortly")
+            if sum(1 for queued in self._pending if queued.user == user) >= self.per_user_pending:
+                raise QueueFull(f"You already have {self.per_user_pending} jobs waiting")
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._dispatch()
+        return job.id
+
+    def submit_audio(self, audio_data: np.ndarray, sample_rate: int, user: str = "anonymous", **kwargs) -> str:
+        """Queue `analyze_audio_data` in a worker process."""
+        return self.submit(analyze_audio_data, audio_data, sample_rate, user=user, kind="audio", **kwargs)
+
+    def submit_text(self, prompt: str, user: str = "anonymous", fn: Callable = None, **kwargs) -> str:
+        """Queue an LLM text analysis (`fn`, default `analyze_text`) on the I/O thread pool."""
+        return self.submit(fn or analyze_text, prompt, user=user, pool="thread", kind="text", **kwargs)
+
+    def _dispatch(self):
+        # Start every waiting job that has a free worker and is within its user's limit
+        for job in list(self._pending):
+            if self._running[job.pool] >= self._capacity[job.pool]:
+                continue
+            if self._running_by_user[job.user, job.pool] >= self.per_user_limit:
+                continue
+            self._pending.remove(job)
+            self._start(job)
+
+    def _start(self, job: Job):
+        job.state = RUNNING
+        job.started = time.time()
+        self._running[job.pool] += 1
+        self._running_by_user[job.user, job.pool] += 1
+        try:
+            future = self._pool(job.pool).submit(job.fn, *job.args, **job.kwargs)
+        except BrokenProcessPool:
+            # A worker died earlier; start a fresh pool
+            self._pools.pop(job.pool).shutdown(wait=False)
+            future = self._pool(job.pool).submit(job.fn, *job.args, **job.kwargs)
+        future.add_done_callback(lambda future, job=job: self._finished(job, future))
+
+    def _finished(self, job: Job, future):
+        with self._lock:
+            self._running[job.pool] -= 1
+            self._running_by_user[job.user, job.pool] -= 1
+            if job.state != CANCELLED:
+                exception = future.exception()
+                if exception is None:
+                    job.state, job.result = DONE, future.result()
+                else:
+                    job.state, job.exception = FAILED, exception
+                    if isinstance(exception, BrokenProcessPool) and job.pool in self._pools:
+                        self._pools.pop(job.pool).shutdown(wait=False)
+            job.finished = job.finished or time.time()
+            job.fn = job.args = job.kwargs = None  # let the inputs be freed
+            job.done.set()
+            if not self._closed:
+                self._dispatch()
+
+    def _purge(self):
+        cutoff = time.time() - self.retain_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.state in FINISHED and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state and timestamps (plus queue `position` while waiting), or None for an unknown ID."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = job.to_dict()
+            if job.state == QUEUED:
+                status["position"] = self._pending.index(job)
+            return status
+
+    def result(self, job_id: str, timeout: float = None) -> Any:
+        """
+        Wait for a job and return its result; re-raises its exception, and
+        raises CancelledError if it was cancelled or TimeoutError if still running.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job '{job_id}'")
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"Job {job_id} is still {job.state}")
+        if job.state == CANCELLED:
+            raise CancelledError(f"Job {job_id} was cancelled")
+        if job.exception is not None:
+            raise job.exception
+        return job.result
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it had already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED:
+                return False
+            if job.state == QUEUED:
+                self._pending.remove(job)
+                job.fn = job.args = job.kwargs = None
+            # A running job keeps its worker until it returns; `_finished` then drops the result
+            job.state = CANCELLED
+            job.finished = time.time()
+            job.done.set()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "running": dict(self._running),
+                "jobs": len(self._jobs),
+                "max_pending": self.max_pending,
+                "per_user_limit": self.per_user_limit,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Cancel waiting jobs and stop the pools."""
+        with self._lock:
+            self._closed = True
+            for job in list(self._pending):
+                self.cancel(job.id)
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_result_cache = None
+
+
+def _get_result_cache() -> ResultCache:
+    # One per worker process, so each job does not open its own SQLite connection
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+
+def upload_cache_key(content_hash: str, streaming: bool = False, profile: str = None,
+                     segments: bool = False, analyzers=None) -> str:
+    """Result-cache key for an uploaded file analyzed with the given options."""
+    params = {"streaming": True} if streaming else {"streaming": False, "decode": get_decode_profile(profile)}
+    if segments:
+        params["segments"] = True
+    if analyzers:
+        params["analyzers"] = sorted(analyzers)
+    return make_cache_key(content_hash, ANALYZER_VERSION, params)
+
+
+def analyze_upload(content: bytes, content_hash: str, streaming: bool = False, profile: str = None,
+                   segments: bool = False, timings: bool = False, analyzers=None) -> Dict[str, Any]:
+    """
+    Worker-side analysis of uploaded file bytes, through the on-disk result cache.
+    `analyzers` limits it to a subset of the analyzer registry (e.g. PREVIEW_ANALYZERS).
+    """
+    result_cache = _get_result_cache()
+    cache_key = upload_cache_key(content_hash, streaming, profile, segments, analyzers)
+    with collect() as records:
+        results = result_cache.get(cache_key)
+        if results is None:
+            if streaming:
+                # Decode block by block; memory is bounded by the block size
+                results = analyze_audio_stream(io.BytesIO(content), segments=segments, analyzers=analyzers)
+            else:
+                audio_data, sample_rate, decode_info = decode_audio(content, profile)
+                results = analyze_audio_data(audio_data, sample_rate, decode_info=decode_info, segments=segments,
+                                             analyzers=analyzers)
+            result_cache.put(cache_key, results)
+    if timings:
+        # Timings describe this run only, so they are never cached
+        results = dict(results, timings=summarize_timings(records))
+    return results
+
+
+def analyze_text(prompt: str, timings: bool = False) -> Dict[str, Any]:
+    """Perplexity/OpenAI fan-out on the shared HTTP loop, for use off the UI thread."""
+    from llm_analyzers import analyze_text_with_llms_async
+    from models.http_client import run_sync
+    with collect() as records:
+        results = run_sync(analyze_text_with_llms_async(prompt))
+    if timings:
+        results = dict(results, timings=summarize_timings(records))
+    return results
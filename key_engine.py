@@ -0,0 +1,119 @@
+"""
+Batched key-profile matching.
+
+Every rotation of every registered key profile is stacked into one
+z-normalized template matrix, so scoring any number of chroma vectors
+(tracks, segments, a whole catalog) against all 24 keys is a single matrix
+product rather than a Python loop of `np.roll` + `np.corrcoef`.
+"""
+from functools import lru_cache
+from typing import Dict, Any, List, Sequence, Union
+import numpy as np
+
+PITCH_CLASSES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+MODES = ['major', 'minor']
+KEY_LABELS = [f"{pitch} {mode}" for mode in MODES for pitch in PITCH_CLASSES]
+
+# (major, minor) weights per pitch class, tonic first
+KEY_PROFILES = {
+    # Krumhansl & Kessler (1982) probe-tone ratings
+    "krumhansl": (
+        [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88],
+        [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17],
+    ),
+    # Temperley (2001), revised from the Kostka-Payne corpus
+    "temperley": (
+        [5.0, 2.0, 3.5, 2.0, 4.5, 4.0, 2.0, 4.5, 2.0, 3.5, 1.5, 4.0],
+        [5.0, 2.0, 3.5, 4.5, 2.0, 4.0, 2.0, 4.5, 3.5, 2.0, 1.5, 4.0],
+    ),
+    # Albrecht & Shanahan (2013), pitch-class distributions of a classical corpus
+    "albrecht_shanahan": (
+        [0.238, 0.006, 0.111, 0.006, 0.137, 0.094, 0.016, 0.214, 0.009, 0.080, 0.008, 0.081],
+        [0.220, 0.006, 0.104, 0.123, 0.019, 0.103, 0.012, 0.214, 0.062, 0.022, 0.061, 0.052],
+    ),
+}
+DEFAULT_KEY_PROFILE = "krumhansl"
+# Scores are ranked at this precision, so keys that tie exactly (symmetric chroma such
+# as a diminished seventh) are ordered like KEY_LABELS rather than by rounding noise
+SCORE_DECIMALS = 12
+
+ProfileSpec = Union[str, Sequence[str], Dict[str, float]]
+
+
+def register_key_profile(name: str, major: Sequence[float], minor: Sequence[float]):
+    """Add (or replace) a user-supplied profile, given as 12 weights each starting at the tonic."""
+    major, minor = np.asarray(major, dtype=float), np.asarray(minor, dtype=float)
+    if major.shape != (12,) or minor.shape != (12,):
+        raise ValueError("Key profiles need exactly 12 weights per mode")
+    KEY_PROFILES[name] = (major.tolist(), minor.tolist())
+    _templates.cache_clear()
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    x = x - x.mean(axis=-1, keepdims=True)
+    std = x.std(axis=-1, keepdims=True)
+    # A flat vector correlates with nothing; avoid dividing by zero
+    return np.divide(x, std, out=np.zeros_like(x), where=std > 0)
+
+
+@lru_cache(maxsize=None)
+def _templates(name: str) -> np.ndarray:
+    """(24, 12) z-normalized templates: 12 major rotations, then 12 minor."""
+    if name not in KEY_PROFILES:
+        raise ValueError(f"Unknown key profile '{name}', expected one of {sorted(KEY_PROFILES)}")
+    major, minor = (np.asarray(p, dtype=float) for p in KEY_PROFILES[name])
+    # Row k is the profile rolled so its tonic sits on pitch class k
+    shifts = (np.arange(12)[None, :] - np.arange(12)[:, None]) % 12
+    templates = np.concatenate([major[shifts], minor[shifts]])
+    return _zscore(templates)
+
+
+def _profile_weights(profiles: ProfileSpec) -> Dict[str, float]:
+    if isinstance(profiles, str):
+        return {profiles: 1.0}
+    if isinstance(profiles, dict):
+        return dict(profiles)
+    return {name: 1.0 for name in profiles}
+
+
+def score_keys(chroma: np.ndarray, profiles: ProfileSpec = DEFAULT_KEY_PROFILE) -> np.ndarray:
+    """
+    Pearson correlation of each chroma vector with each of the 24 keys.
+
+    `chroma` is (12,) or (n, 12); the result is (24,) or (n, 24), ordered
+    like `KEY_LABELS`. Several profiles (a list, or a dict of weights) are
+    combined as a weighted mean of their correlations.
+    """
+    chroma = np.asarray(chroma, dtype=float)
+    z = _zscore(chroma)
+    weights = _profile_weights(profiles)
+    total = sum(weights.values())
+    scores = sum(weight * (z @ _templates(name).T) for name, weight in weights.items())
+    return scores / (12 * total)
+
+
+def estimate_keys(chroma: np.ndarray, profiles: ProfileSpec = DEFAULT_KEY_PROFILE) -> List[Dict[str, Any]]:
+    """
+    Key estimates for a batch of chroma vectors, shaped (n, 12).
+
+    Each entry matches `estimate_key`'s output: the best key, a confidence
+    from the margin over the runner-up, up to three alternatives within 80%
+    of the best score, and the best correlation itself. Tied keys are ranked
+    in `KEY_LABELS` order.
+    """
+    scores = np.round(np.atleast_2d(score_keys(chroma, profiles)), SCORE_DECIMALS)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    ranked = np.take_along_axis(scores, order, axis=1)
+    best, runner_up = ranked[:, 0], ranked[:, 1]
+    confidence = np.clip((best - runner_up) * 5, 0.0, 1.0)
+    alternative_mask = ranked[:, 1:4] > (best * 0.8)[:, None]
+
+    return [
+        {
+            "key": KEY_LABELS[order[i, 0]],
+            "confidence": float(confidence[i]),
+            "secondary_candidates": [KEY_LABELS[k] for k, keep in zip(order[i, 1:4], alternative_mask[i]) if keep],
+            "correlation_score": float(best[i]),
+        }
+        for i in range(len(scores))
+    ]
@@ -0,0 +1,289 @@
+"""
+Real-time key and tempo tracking for live input.
+
+A source thread pushes audio blocks into a ring buffer; the analysis loop
+turns new samples into STFT frames incrementally (chroma and onset
+strength only, no CQT/HPSS) and feeds a short-window `SegmentTracker`,
+emitting a BPM/key update every `update_interval` seconds. The loop keeps
+to a fixed CPU budget: it sleeps when ahead of budget and skips to the
+newest audio when the backlog exceeds `max_latency`.
+
+`FileSource` plays a file back at real-time speed, so everything can run
+headless without a sound card:
+
+    python live_analysis.py song.wav [--interval 0.25] [--cpu-budget 0.5]
+"""
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from typing import Dict, Any, Iterator, Callable, Optional
+import numpy as np
+import librosa
+from audio_features import N_FFT, HOP_LENGTH
+from segment_tracks import SegmentTracker
+
+LIVE_SAMPLE_RATE = 22050
+DEFAULT_UPDATE_INTERVAL = 0.25  # seconds between updates
+DEFAULT_WINDOW_SECONDS = 10.0  # rolling key/tempo window
+DEFAULT_CPU_BUDGET = 0.5  # fraction of one core
+DEFAULT_MAX_LATENCY = 1.0  # seconds of backlog before skipping ahead
+DEFAULT_BLOCK_SIZE = 1024  # samples per input block
+
+
+class RingBuffer:
+    """Fixed-size float32 sample buffer addressed by absolute sample index; safe for one writer and one reader."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def write(self, samples: np.ndarray):
+        samples = np.asarray(samples, dtype=np.float32)[-self.capacity:]
+        with self._lock:
+            start = self.written % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.written += len(samples)
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Samples [start, stop); `start` must still be inside the buffer."""
+        with self._lock:
+            if start < self.written - self.capacity or stop > self.written:
+                raise IndexError(f"Samples {start}-{stop} are no longer (or not yet) buffered")
+            indices = np.arange(start, stop) % self.capacity
+            return self._data[indices]
+
+
+class FileSource:
+    """Plays an audio file (path, file-like or bytes) back in blocks at real-time speed."""
+
+    def __init__(self, source, sample_rate: int = LIVE_SAMPLE_RATE, block_size: int = DEFAULT_BLOCK_SIZE,
+                 realtime: bool = True):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.audio_data, self.sample_rate = librosa.load(source, sr=sample_rate, mono=True)
+        self.block_size = block_size
+        self.realtime = realtime
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        started = time.perf_counter()
+        for i, start in enumerate(range(0, len(self.audio_data), self.block_size)):
+            if self.realtime:
+                # Pace against the start time so sleep jitter does not accumulate
+                due = started + (start + self.block_size) / self.sample_rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield self.audio_data[start:start + self.block_size]
+
+
+class MicrophoneSource:
+    """Default input device via the optional `sounddevice` package."""
+
+    def __init__(self, sample_rate: int = LIVE_SAMPLE_RATE, block_size: int = DEFAULT_BLOCK_SIZE,
+                 duration: float = None):
+        try:
+            import sounddevice
+        except ImportError as e:
+            raise RuntimeError("Microphone input needs the optional 'sounddevice' package") from e
+        self._sounddevice = sounddevice
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.duration = duration
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        import queue
+        blocks = queue.Queue()
+        with self._sounddevice.InputStream(samplerate=self.sample_rate, blocksize=self.block_size, channels=1,
+                                           dtype="float32", callback=lambda data, *_: blocks.put(data[:, 0].copy())):
+            received = 0
+            while self.duration is None or received < self.duration * self.sample_rate:
+                block = blocks.get()
+                received += len(block)
+                yield block
+
+
+class LiveFeatureExtractor:
+    """Incremental un-centered STFT -> chroma and onset-strength frames."""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.reset()
+
+    def reset(self):
+        """Forget carried-over samples, e.g. after skipping ahead."""
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._prev_mel_db = None
+
+    def process(self, samples: np.ndarray):
+        """Returns (chroma (12, n), onset (n,)) for the frames completed by `samples`, or None."""
+        samples = np.concatenate([self._carry, samples])
+        n_frames = 1 + (len(samples) - N_FFT) // HOP_LENGTH if len(samples) >= N_FFT else 0
+        if n_frames <= 0:
+            self._carry = samples
+            return None
+        used = (n_frames - 1) * HOP_LENGTH + N_FFT
+        self._carry = samples[n_frames * HOP_LENGTH:]
+
+        power = np.abs(librosa.stft(samples[:used], n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)) ** 2
+        chroma = librosa.feature.chroma_stft(S=power, sr=self.sample_rate, n_fft=N_FFT, n_chroma=12, tuning=0.0)
+        mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=self.sample_rate))
+        previous = mel_db[:, :1] if self._prev_mel_db is None else self._prev_mel_db
+        onset = librosa.onset.onset_strength(S=np.concatenate([previous, mel_db], axis=1), sr=self.sample_rate,
+                                             hop_length=HOP_LENGTH, center=False)[1:]
+        self._prev_mel_db = mel_db[:, -1:]
+        return chroma, onset
+
+
+class LiveAnalyzer:
+    """Rolling BPM/key over live audio under a fixed CPU budget."""
+
+    def __init__(self, sample_rate: int = LIVE_SAMPLE_RATE, update_interval: float = DEFAULT_UPDATE_INTERVAL,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS, cpu_budget: float = DEFAULT_CPU_BUDGET,
+                 max_latency: float = DEFAULT_MAX_LATENCY):
+        self.sample_rate = sample_rate
+        self.update_interval = update_interval
+        self.window_seconds = window_seconds
+        self.cpu_budget = cpu_budget
+        self.max_latency = max_latency
+        self.stats = {}
+
+    def updates(self, source, stop: threading.Event = None) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze `source` (anything with a `blocks()` iterator) and yield an update per window hop.
+
+        Each update has the rolling `bpm`/`key` with confidences, the audio
+        `time` it covers up to, the analysis `latency`, the measured
+        `cpu_load` and the total `dropped_seconds` skipped to stay real-time.
+        """
+        stop = stop or threading.Event()
+        sr = self.sample_rate
+        ring = RingBuffer(int(sr * max(4 * self.max_latency, 2 * self.update_interval + N_FFT / sr)))
+        source_done = threading.Event()
+        source_error = []
+
+        def produce():
+            try:
+                for block in source.blocks():
+                    ring.write(block)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                source_error.append(e)
+            finally:
+                source_done.set()
+
+        extractor = LiveFeatureExtractor(sr)
+        self._warmup(extractor)
+        threading.Thread(target=produce, name="live-audio-source", daemon=True).start()
+
+        tracker = SegmentTracker(sr, self.window_seconds, self.update_interval, emit_partial=True)
+        chunk = max(HOP_LENGTH, int(self.update_interval * sr / 2))
+        max_backlog = int(self.max_latency * sr)
+        position = 0
+        processed_seconds = dropped = 0.0
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        self.stats = {"cpu_load": 0.0, "dropped_seconds": 0.0, "updates": 0}
+
+        try:
+            while not stop.is_set():
+                available = ring.written
+                if available - position > max_backlog:
+                    # Fell behind: skip to the newest audio rather than drift further from real time
+                    skipped = available - position - chunk
+                    dropped += skipped / sr
+                    position += skipped
+                    extractor.reset()
+
+                if available - position >= chunk or (source_done.is_set() and available > position):
+                    samples = ring.read(position, available)
+                    position = available
+                    processed_seconds += len(samples) / sr
+                    frames = extractor.process(samples)
+                    new_segments = tracker.update(*frames) if frames is not None else []
+                elif source_done.is_set():
+                    new_segments = tracker.finish()
+                    stop.set()
+                else:
+                    time.sleep(chunk / sr / 4)
+                    continue
+
+                wall = time.perf_counter() - wall_start
+                cpu = time.thread_time() - cpu_start
+                self.stats = {"cpu_load": cpu / wall if wall else 0.0, "dropped_seconds": dropped,
+                              "updates": self.stats["updates"] + len(new_segments)}
+                for segment in new_segments:
+                    yield {
+                        "time": segment["end"],
+                        "bpm": segment["bpm"],
+                        "tempo_confidence": segment["tempo_confidence"],
+                        "key": segment["key"],
+                        "key_confidence": segment["key_confidence"],
+                        "latency": (ring.written - position) / sr,
+                        "cpu_load": self.stats["cpu_load"],
+                        "dropped_seconds": dropped,
+                    }
+
+                # Stay within the CPU budget: pausing lets audio queue up, and the
+                # backlog check above drops whatever cannot be caught up on
+                over = cpu / self.cpu_budget - (time.perf_counter() - wall_start)
+                if over > 0:
+                    time.sleep(over)
+        finally:
+            stop.set()
+        if source_error:
+            raise source_error[0]
+
+    def _warmup(self, extractor: LiveFeatureExtractor):
+        # Compile librosa's kernels before the CPU budget clock starts
+        scratch = SegmentTracker(self.sample_rate, self.window_seconds, self.update_interval, emit_partial=True)
+        scratch.update(*extractor.process(np.zeros(self.sample_rate, dtype=np.float32)))
+        extractor.reset()
+
+    def run(self, source, on_update: Callable[[Dict[str, Any]], None] = None,
+            duration: float = None, stop: threading.Event = None) -> Optional[Dict[str, Any]]:
+        """
+        Consume `updates`, optionally for at most `duration` seconds or until `stop`
+        is set from another thread; returns the last update.
+        """
+        stop = stop or threading.Event()
+        timer = None
+        if duration is not None:
+            timer = threading.Timer(duration, stop.set)
+            timer.daemon = True
+            timer.start()
+        last = None
+        try:
+            for update in self.updates(source, stop):
+                last = update
+                if on_update is not None:
+                    on_update(update)
+        finally:
+            if timer is not None:
+                timer.cancel()
+        return last
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live BPM/key tracking, with a file played back in real time")
+    parser.add_argument("input", help="Audio file to play back as live input")
+    parser.add_argument("--interval", type=float, default=DEFAULT_UPDATE_INTERVAL, help="Seconds between updates")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_SECONDS, help="Rolling window in seconds")
+    parser.add_argument("--cpu-budget", type=float, default=DEFAULT_CPU_BUDGET, help="Fraction of one core to use")
+    args = parser.parse_args(argv)
+
+    analyzer = LiveAnalyzer(update_interval=args.interval, window_seconds=args.window, cpu_budget=args.cpu_budget)
+    source = FileSource(args.input)
+    analyzer.run(source, on_update=lambda update: print(json.dumps(update), flush=True))
+    print(json.dumps(analyzer.stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
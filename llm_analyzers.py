@@ -1,9 +1,11 @@
 import os
 import json
+import asyncio
 from typing import Dict, Any
-import openai
-from models.perplexity import get_perplexity_analysis
-from models.openai_model import get_openai_analysis
+from models.perplexity import get_perplexity_analysis, get_perplexity_analysis_async
+from models.openai_model import get_openai_analysis, get_openai_analysis_async
+from models.http_client import DEFAULT_DEADLINE
+from instrumentation import stage
 
 
 def get_openai_analysis_llm(prompt: str) -> Dict[str, Any]:
@@ -11,9 +13,8 @@ def get_openai_analysis_llm(prompt: str) -> Dict[str, Any]:
     return get_openai_analysis(prompt)
 
 def get_perplexity_analysis_llm(prompt: str) -> Dict[str, Any]:
-    response =  get_perplexity_analysis(prompt)
-    print("Results for perplexity on llm analyzer", response)
-    return response
+    """Get music analysis from Perplexity"""
+    return get_perplexity_analysis(prompt)
 
 def get_empty_analysis() -> Dict[str, Any]:
     """Return empty analysis structure"""
@@ -29,3 +30,48 @@ def get_empty_analysis() -> Dict[str, Any]:
             "instruments": 0.0
         }
     }
+
+def normalize_openai_analysis(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Map the OpenAI function-call schema onto the Perplexity/display schema"""
+    scores = result.get("confidence_scores") or {}
+    return {
+        "key": result.get("musical_key") or "",
+        "bpm": result.get("tempo_bpm") or 0.0,
+        "mood": result.get("mood_descriptors") or [],
+        "instruments": result.get("instruments_detected") or [],
+        "confidence_scores": {
+            "key": scores.get("musical_key", scores.get("key", 0.0)),
+            "bpm": scores.get("tempo_bpm", scores.get("bpm", 0.0)),
+            "mood": scores.get("mood_descriptors", scores.get("mood", 0.0)),
+            "instruments": scores.get("instruments_detected", scores.get("instruments", 0.0))
+        }
+    }
+
+async def _timed_provider(name: str, coro, deadline: float):
+    with stage(f"llm.{name}"):
+        return await asyncio.wait_for(coro, deadline)
+
+async def analyze_text_with_llms_async(prompt: str, deadline: float = DEFAULT_DEADLINE) -> Dict[str, Any]:
+    """
+    Query Perplexity and OpenAI concurrently and return the best answer.
+
+    Perplexity (web-grounded) is preferred, so its answer is returned as
+    soon as it has a key and the OpenAI request is cancelled. OpenAI fills
+    in when Perplexity fails, times out or finds nothing. Must run on the
+    shared HTTP loop.
+    """
+    perplexity = asyncio.ensure_future(
+        _timed_provider("perplexity", get_perplexity_analysis_async(prompt), deadline))
+    openai = asyncio.ensure_future(_timed_provider("openai", get_openai_analysis_async(prompt), deadline))
+    try:
+        perplexity_result, = await asyncio.gather(perplexity, return_exceptions=True)
+        if isinstance(perplexity_result, dict) and perplexity_result.get("key"):
+            return perplexity_result
+        openai_result, = await asyncio.gather(openai, return_exceptions=True)
+    finally:
+        openai.cancel()
+        perplexity.cancel()
+
+    if isinstance(openai_result, dict) and openai_result.get("musical_key"):
+        return normalize_openai_analysis(openai_result)
+    return get_empty_analysis()
@@ -0,0 +1,21 @@
+import os
+
+
+def get_secret(name: str) -> str:
+    """
+    Resolve a secret on first use: environment first, then Streamlit secrets.
+
+    Streamlit is only imported when the environment does not provide the
+    value, so headless workers never pay for it.
+    """
+    value = os.environ.get(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        value = st.secrets[name]
+    except Exception:
+        value = None
+    if not value:
+        raise RuntimeError(f"{name} is not set; export it or add it to .streamlit/secrets.toml")
+    return value
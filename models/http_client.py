@@ -0,0 +1,191 @@
+"""
+Shared asyncio HTTP backend for the LLM providers.
+
+All provider calls go through one keep-alive connection pool running on a
+background event loop, with a per-request deadline and bounded, jittered
+retries on 429/5xx and transport errors. Sync callers (Streamlit) submit
+coroutines with `run_sync`, or `submit_async` to not wait. Code inside
+`rate_limited(limiter)` has every request it sends metered, retries
+included.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+import httpx
+from instrumentation import stage
+
+DEFAULT_TIMEOUT = float(os.environ.get("LLM_HTTP_TIMEOUT", 30.0))
+DEFAULT_DEADLINE = float(os.environ.get("LLM_HTTP_DEADLINE", 90.0))
+MAX_RETRIES = int(os.environ.get("LLM_HTTP_MAX_RETRIES", 3))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_limiter = contextvars.ContextVar("http_rate_limiter", default=None)
+
+
+@contextmanager
+def rate_limited(limiter):
+    """
+    Take one token from `limiter` (anything with an async `acquire()`) before
+    each request sent inside the block, retries included. Tasks started in
+    the block inherit it.
+    """
+    token = _limiter.set(limiter)
+    try:
+        yield
+    finally:
+        _limiter.reset(token)
+
+
+class AsyncHTTPBackend:
+    """Pooled async JSON client with deadlines and retries."""
+
+    def __init__(self, max_connections: int = 32, max_keepalive: int = 16, timeout: float = DEFAULT_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Pools are bound to an event loop; callers normally share the
+        # background loop, but a fresh loop (e.g. asyncio.run) gets its own
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                # A closed loop can no longer run its client's aclose(); just let it go
+                for closed in [other for other in self._clients if other.is_closed()]:
+                    del self._clients[closed]
+                client = self._clients[loop] = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return client
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        # Full jitter keeps concurrent clients from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str] = None,
+                        deadline: float = DEFAULT_DEADLINE) -> Dict[str, Any]:
+        """
+        POST `payload` and return the decoded JSON response.
+
+        `deadline` bounds the whole call, retries included. Raises
+        `httpx.HTTPStatusError` for non-retryable or exhausted error
+        statuses and `TimeoutError` when the deadline passes.
+        """
+        with stage("llm.http", host=httpx.URL(url).host) as record:
+            return await self._post_json(url, payload, headers, deadline, record)
+
+    async def _post_json(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]],
+                         deadline: float, record: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline
+        attempt = 0
+        while True:
+            record["labels"]["attempts"] = attempt + 1
+            remaining = deadline_at - loop.time()
+            if remaining <= 0:
+                raise TimeoutError(f"Deadline of {deadline:.1f}s exceeded for {url}")
+            limiter = _limiter.get()
+            if limiter is not None:
+                # Retries are metered too, so a throttling provider is not hit harder
+                try:
+                    await asyncio.wait_for(limiter.acquire(), remaining)
+                except asyncio.TimeoutError as e:
+                    raise TimeoutError(f"Deadline of {deadline:.1f}s exceeded for {url}") from e
+                remaining = deadline_at - loop.time()
+
+            response = None
+            try:
+                response = await asyncio.wait_for(
+                    self.client.post(url, json=payload, headers=headers, timeout=min(self.timeout, remaining)),
+                    remaining,
+                )
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise TimeoutError(f"Deadline of {deadline:.1f}s exceeded for {url}") from e
+                    raise
+            else:
+                record["labels"]["status"] = response.status_code
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+
+            delay = self._backoff(attempt, response)
+            attempt += 1
+            await asyncio.sleep(min(delay, max(0.0, deadline_at - loop.time())))
+
+    async def aclose(self):
+        """Close the connection pool of every loop, each on the loop it belongs to."""
+        current = asyncio.get_running_loop()
+        with self._clients_lock:
+            clients, self._clients = self._clients, {}
+        for loop, client in clients.items():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+
+
+_loop = None
+_loop_lock = threading.Lock()
+_backend = None
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-http-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def submit_async(coro) -> concurrent.futures.Future:
+    """
+    Schedule `coro` on the background loop without waiting for it.
+
+    The returned future can be polled, waited on with a timeout or cancelled
+    (which cancels the coroutine). The caller's context variables are carried
+    over, so e.g. stage timings recorded on the loop still reach the caller's
+    `instrumentation.collect()`.
+    """
+    context = contextvars.copy_context()
+
+    async def run_in_caller_context():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return asyncio.run_coroutine_threadsafe(run_in_caller_context(), get_event_loop())
+
+
+def run_sync(coro, timeout: float = None):
+    """Run `coro` on the background loop (see `submit_async`) and block until it finishes."""
+    return submit_async(coro).result(timeout)
+
+
+def get_backend() -> AsyncHTTPBackend:
+    """Process-wide backend sharing one connection pool."""
+    global _backend
+    if _backend is None:
+        _backend = AsyncHTTPBackend()
+    return _backend
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Optional
+from result_cache import ResultCache
+from models.song_parser import parse_song_query
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_PERSIST_PATH = os.environ.get(
+    "LLM_LOOKUP_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "beat-feature-extract", "lookups.sqlite3"),
+)
+
+
+def normalize_song_key(prompt: str) -> str:
+    """
+    Normalize a free-text song prompt into a cache key.
+
+    "Blinding Lights by The Weeknd" and "'Blinding Lights' - the weeknd" both
+    become "blinding lights|the weeknd". Prompts without a recognizable
+    title/artist split fall back to their case- and whitespace-folded text.
+    """
+    parsed = parse_song_query(prompt)
+    if parsed is not None:
+        title, artist = (re.sub(r"\s+", " ", part).lower() for part in parsed)
+        return f"{title}|{artist}"
+    text = unicodedata.normalize("NFKC", prompt or "").lower()
+    return re.sub(r"\s+", " ", text).strip(" .?!")
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries expire after `ttl` seconds.
+
+    With `persist_path` set, entries are also written through to an on-disk
+    ResultCache so they survive restarts and are shared between processes.
+    Coroutines use `get_async`/`set_async`, which do that disk I/O on a
+    worker thread instead of blocking the event loop.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 persist_path: str = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = ResultCache(persist_path, max_age=ttl) if persist_path else None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._recall(key)
+        if value is None and self._store is not None:
+            value = self._load(key)
+        return value
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._recall(key)
+        if value is None and self._store is not None:
+            value = await asyncio.to_thread(self._load, key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._remember(key, value, time.time())
+        if self._store is not None:
+            self._store.put(key, value)
+
+    async def set_async(self, key: str, value: Dict[str, Any]):
+        self._remember(key, value, time.time())
+        if self._store is not None:
+            await asyncio.to_thread(self._store.put, key, value)
+
+    def _recall(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+        return None
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._store.get_entry(key)
+        if entry is None:
+            return None
+        # Keep the stored entry's age, so it expires when it would have on disk
+        value, created_at = entry
+        self._remember(key, value, created_at)
+        return value
+
+    def _remember(self, key: str, value: Dict[str, Any], created_at: float):
+        with self._lock:
+            self._entries[key] = (created_at + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._store is not None:
+            self._store.clear()
+
+
+class AsyncSingleFlight:
+    """Coalesce concurrent coroutine calls for the same key, on one event loop, into one in-flight call."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = {"future": asyncio.ensure_future(fn()), "waiters": 0}
+            self._calls[key] = call
+            call["future"].add_done_callback(lambda _: self._forget(key, call))
+        call["waiters"] += 1
+        try:
+            # Shield so one cancelled waiter does not cancel the shared request
+            return await asyncio.shield(call["future"])
+        finally:
+            call["waiters"] -= 1
+            if not call["waiters"] and not call["future"].done():
+                # Every waiter gave up (cancelled or past its deadline): stop the request too
+                self._forget(key, call)
+                call["future"].cancel()
+
+    def _forget(self, key: str, call: Dict[str, Any]):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+lookup_cache = TTLCache(persist_path=DEFAULT_PERSIST_PATH)
+_inflight_async = AsyncSingleFlight()
+
+
+async def cached_lookup_async(provider: str, prompt: str, fetch: Callable[[str], Awaitable[Dict[str, Any]]],
+                              is_valid: Callable[[Dict[str, Any]], bool] = bool) -> Dict[str, Any]:
+    """
+    Return `await fetch(prompt)` from cache when an equivalent prompt was seen recently.
+
+    Concurrent callers asking for the same song share one request. Only
+    results accepted by `is_valid` are cached, so failures are retried.
+    """
+    key = f"{provider}:{normalize_song_key(prompt)}"
+    cached = await lookup_cache.get_async(key)
+    if cached is not None:
+        return cached
+
+    async def fetch_and_store():
+        result = await fetch(prompt)
+        if result is not None and is_valid(result):
+            await lookup_cache.set_async(key, result)
+        return result
+
+    return await _inflight_async.do(key, fetch_and_store)
@@ -1,10 +1,12 @@
 from pydantic import BaseModel
 from typing import Dict, Any
-import openai
 import json
 import os
+from models.lookup_cache import cached_lookup_async
+from models.http_client import get_backend, run_sync
+from models.credentials import get_secret
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 class OpenAIAnalysis(BaseModel):
     musical_key: str
@@ -23,6 +25,15 @@ def get_empty_analysis() -> Dict[str, Any]:
     }
 
 def get_openai_analysis(prompt: str) -> Dict[str, Any]:
+    """Get music analysis from OpenAI, reusing recent answers for the same song"""
+    return run_sync(get_openai_analysis_async(prompt))
+
+async def get_openai_analysis_async(prompt: str) -> Dict[str, Any]:
+    """Coroutine version of `get_openai_analysis`; must run on the shared HTTP loop"""
+    return await cached_lookup_async("openai", prompt, _fetch_openai_analysis,
+                                     is_valid=lambda result: bool(result.get("musical_key")))
+
+async def _fetch_openai_analysis(prompt: str) -> Dict[str, Any]:
     """Get music analysis from OpenAI with structured output"""
     system_prompt = """Analyze this song and provide:
     - Musical key
@@ -31,23 +42,29 @@ def get_openai_analysis(prompt: str) -> Dict[str, Any]:
     - Instruments detected
     Include confidence scores (0.0-1.0) for each parameter. """
     
+    headers = {
+        "Authorization": f"Bearer {get_secret('OPENAI_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+    data = {
+        "model": "gpt-4-turbo-preview",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        "functions": [{
+            "name": "process_music_analysis",
+            "description": "Process the music analysis results",
+            "parameters": OpenAIAnalysis.model_json_schema()
+        }],
+        "function_call": {"name": "process_music_analysis"},
+        "temperature": 0.7
+    }
+
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            functions=[{
-                "name": "process_music_analysis",
-                "description": "Process the music analysis results",
-                "parameters": OpenAIAnalysis.model_json_schema()
-            }],
-            function_call={"name": "process_music_analysis"},
-            temperature=0.7
-         )
-        
-        return json.loads(response.choices[0].message.function_call.arguments)
+        response_json = await get_backend().post_json(f"{OPENAI_BASE_URL}/chat/completions", data, headers=headers)
+        return json.loads(response_json["choices"][0]["message"]["function_call"]["arguments"])
     except Exception as e:
         print(f"Error in OpenAI analysis: {e}")
         return get_empty_analysis()
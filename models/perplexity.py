@@ -1,12 +1,22 @@
 import json
-import requests
-import streamlit as st
+import os
+import threading
+import httpx
 from pydantic import BaseModel
 from typing import Dict, Any
+from models.lookup_cache import cached_lookup_async
+from models.http_client import get_backend, run_sync
+from models.song_parser import parse_song_query, format_song_prompt
+from models.credentials import get_secret
+from instrumentation import stage
 
 
 
-PERPLEXITY_API_KEY = st.secrets["PERPLEXITY_API_KEY"]
+PERPLEXITY_BASE_URL = os.environ.get("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+
+# How often song extraction was resolved locally vs. by the model fallback
+_extraction_stats = {"local": 0, "model": 0}
+_extraction_lock = threading.Lock()
 
 class PerplexityAnalysis(BaseModel):
     musical_key: str | None
@@ -25,6 +35,10 @@ def get_empty_analysis() -> Dict[str, Any]:
     }
 
 def extract_song_name_with_model(user_input: str) -> str:
+    """Use an AI model to extract the song name from user input."""
+    return run_sync(extract_song_name_with_model_async(user_input))
+
+async def extract_song_name_with_model_async(user_input: str) -> str:
     """Use an AI model to extract the song name from user input."""
     if not user_input or not user_input.strip():
         print("Error: Empty user input")
@@ -41,10 +55,10 @@ def extract_song_name_with_model(user_input: str) -> str:
     - Input: "Tell me about 'Imagine' by John Lennon" → Output: "Get me accurate key, bpm, moods, instruments, for Imagine by John Lennon"
     """
     
-    url = "https://api.perplexity.ai/chat/completions"
+    url = f"{PERPLEXITY_BASE_URL}/chat/completions"
     
     headers = {
-        "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
+        "Authorization": f"Bearer {get_secret('PERPLEXITY_API_KEY')}",
         "Content-Type": "application/json"
     }
     
@@ -57,16 +71,13 @@ def extract_song_name_with_model(user_input: str) -> str:
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        
-        response_json = response.json()
+        response_json = await get_backend().post_json(url, data, headers=headers)
         
         if "choices" in response_json and len(response_json["choices"]) > 0:
             content = response_json["choices"][0].get("message", {}).get("content", "").strip()
             return content  # Expected to be just the song name
         
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, TimeoutError) as e:
         print(f"API Request Error: {e}")
     except Exception as e:
         print(f"Unexpected Error: {e}")
@@ -74,6 +85,34 @@ def extract_song_name_with_model(user_input: str) -> str:
     return ""  # Default empty if extraction fails
 
 
+def get_song_extraction_stats() -> Dict[str, Any]:
+    """Counts of local vs. model song extraction, with the model fallback rate."""
+    with _extraction_lock:
+        stats = dict(_extraction_stats)
+    total = stats["local"] + stats["model"]
+    stats["fallback_rate"] = stats["model"] / total if total else 0.0
+    return stats
+
+async def resolve_song_prompt_async(user_input: str) -> str:
+    """
+    Build the lookup prompt locally when possible, falling back to the model.
+
+    Recorded as a "song_extract.local" or "song_extract.model" stage, so
+    exporters count the fallback rate alongside the other stages.
+    """
+    parsed = parse_song_query(user_input)
+    method = "local" if parsed else "model"
+    with _extraction_lock:
+        _extraction_stats[method] += 1
+    with stage(f"song_extract.{method}"):
+        if parsed:
+            return format_song_prompt(*parsed)
+        stats = get_song_extraction_stats()
+        print(f"Local song parser could not resolve input, using model "
+              f"(fallback rate {stats['fallback_rate']:.0%} of {stats['local'] + stats['model']}): {user_input!r}")
+        return await extract_song_name_with_model_async(user_input)
+
+
 def extract_json_from_text(text: str) -> dict:
     """Extract JSON object from text that might contain additional content."""
     try:
@@ -100,8 +139,17 @@ def extract_json_from_text(text: str) -> dict:
         return get_empty_analysis()
 
 def get_perplexity_analysis(prompt: str) -> Dict[str, Any]:
+    """Get music analysis from Perplexity AI, reusing recent answers for the same song."""
+    return run_sync(get_perplexity_analysis_async(prompt))
+
+async def get_perplexity_analysis_async(prompt: str) -> Dict[str, Any]:
+    """Coroutine version of `get_perplexity_analysis`; must run on the shared HTTP loop."""
+    return await cached_lookup_async("perplexity", prompt, _fetch_perplexity_analysis,
+                                     is_valid=lambda result: bool(result.get("key")))
+
+async def _fetch_perplexity_analysis(prompt: str) -> Dict[str, Any]:
     """Get music analysis from Perplexity AI with Sonar Pro structured output."""
-    user_prompt = extract_song_name_with_model(prompt)
+    user_prompt = await resolve_song_prompt_async(prompt)
     print(f"User prompt: {user_prompt}")
     if not user_prompt:
         print("Failed to extract valid song information from prompt")
@@ -122,10 +170,10 @@ def get_perplexity_analysis(prompt: str) -> Dict[str, Any]:
             }
         }"""
 
-    url = "https://api.perplexity.ai/chat/completions"
+    url = f"{PERPLEXITY_BASE_URL}/chat/completions"
     
     headers = {
-        "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
+        "Authorization": f"Bearer {get_secret('PERPLEXITY_API_KEY')}",
         "Content-Type": "application/json"
     }
     
@@ -137,11 +185,7 @@ def get_perplexity_analysis(prompt: str) -> Dict[str, Any]:
         ]
     }
     
-    # try:
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    
-    response_json = response.json()
+    response_json = await get_backend().post_json(url, data, headers=headers)
     
     if "choices" in response_json and len(response_json["choices"]) > 0:
         content = response_json["choices"][0].get("message", {}).get("content", "")
@@ -159,3 +203,4 @@ def get_perplexity_analysis(prompt: str) -> Dict[str, Any]:
             }
             return respomse_data
 
+    return get_empty_analysis()
@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from typing import Optional, Tuple
+
+_QUOTE_PAIRS = {'"': '"', "'": "'", "`": "`", "‘": "’", "“": "”"}
+_QUOTE_CHARS = "\"'`‘’“”"
+_FILLER = re.compile(
+    r"^(?:please\s+)?(?:can\s+you\s+)?"
+    r"(?:find|get|give|tell|show|look\s+up|analy[sz]e|search(?:\s+for)?)\b.*?\b(?:for|of|about|on)\s+",
+    re.IGNORECASE,
+)
+# "What's the key of ...": a question about the song, followed by the song itself
+_QUESTION_LEAD = re.compile(
+    r"^(?:what|which)(?:'s|\s+is|\s+are|\s+was)\s+(?:the\s+)?"
+    r"(?:key|bpm|tempo|mood|moods|instruments|genre)\s+(?:of|for|in|on)\s+",
+    re.IGNORECASE,
+)
+# "Tell me what ...": the question that follows is about the song
+_ASK_ME = re.compile(r"^(?:please\s+)?(?:can\s+you\s+)?(?:tell|show)\s+me\s+(?=what|which|how)", re.IGNORECASE)
+# Question words still leading once the filler is gone ("What key is X by Y in?")
+_QUESTION_WORDS = re.compile(r"^(?:what|which|how|who|where|when|why|does|do|did|is|are|can|could)\b",
+                             re.IGNORECASE)
+_TRAILING_FILLER = re.compile(r"\s+(?:for\s+me|please|thanks|thank\s+you)\s*[?.!]*$", re.IGNORECASE)
+_SEPARATOR = re.compile(r"\s+(?:by|-|–|—)\s+", re.IGNORECASE)
+# "from" is common inside titles ("Songs from the Big Chair"), so it only
+# separates after an explicit cue: "the song X from Y", or a quoted title
+_SONG_CUE = re.compile(r"^(?:the\s+)?(?:song|track|tune)\s+", re.IGNORECASE)
+_CUED_SEPARATOR = re.compile(r"\s+(?:by|from|-|–|—)\s+", re.IGNORECASE)
+_LEADING_SEPARATOR = re.compile(r"^\s*(?:by|from|-|–|—)\s+", re.IGNORECASE)
+_TRAILING_PUNCTUATION = " ,.;:?!"
+MAX_ARTIST_WORDS = 8
+
+
+def _clean(text: str) -> str:
+    text = re.sub(r"\s+", " ", text).strip(_TRAILING_PUNCTUATION)
+    return text.strip(_QUOTE_CHARS + _TRAILING_PUNCTUATION)
+
+
+def _split(text: str, separator: re.Pattern = _SEPARATOR) -> Optional[Tuple[str, str]]:
+    # Split on the last separator: titles ("Stand by Me") contain them more often than artists
+    matches = list(separator.finditer(text))
+    if not matches:
+        return None
+    last = matches[-1]
+    title, artist = _clean(text[:last.start()]), _clean(text[last.end():])
+    if not title or not artist or len(artist.split()) > MAX_ARTIST_WORDS:
+        return None
+    return title, artist
+
+
+def _quoted(text: str) -> Optional[Tuple[str, str, str]]:
+    """Return (before, quoted, after) for the first balanced quoted span."""
+    for i, char in enumerate(text):
+        closer = _QUOTE_PAIRS.get(char)
+        if closer is None:
+            continue
+        # Apostrophes inside words ("Don't") are not quotes
+        if char == "'" and i > 0 and text[i - 1].isalnum():
+            continue
+        end = text.find(closer, i + 1)
+        while end != -1 and closer == "'" and end + 1 < len(text) and text[end + 1].isalnum():
+            end = text.find(closer, end + 1)
+        if end == -1:
+            return None
+        return text[:i], text[i + 1:end], text[end + 1:]
+    return None
+
+
+def parse_song_query(user_input: str) -> Optional[Tuple[str, str]]:
+    """
+    Extract (title, artist) from common free-text phrasings without a model call.
+
+    Handles quoted titles, "X by Y" and "X - Y", plus "X from Y" after a cue
+    ("the song X from Y", or a quoted X), with leading filler such as "Get
+    me the BPM of" or "What's the key of" and trailing filler such as "for
+    me". Returns None when the input cannot be resolved locally, e.g. when
+    no artist is given ("Songs from the Big Chair") or question text would
+    be left in the title ("What key is Hey Jude by The Beatles in?").
+    """
+    text = unicodedata.normalize("NFKC", user_input or "").strip()
+    if not text:
+        return None
+    question = text.endswith("?")
+    text = _FILLER.sub("", text)
+    ask = _ASK_ME.match(text)
+    if ask:
+        question, text = True, text[ask.end():]
+    text = _TRAILING_FILLER.sub("", _QUESTION_LEAD.sub("", text))
+    if question and _QUESTION_WORDS.match(text):
+        # Left-over question text would end up in the title; let the model read it
+        return None
+    separator = _SEPARATOR
+    cue = _SONG_CUE.match(text)
+    if cue:
+        separator, text = _CUED_SEPARATOR, text[cue.end():]
+
+    quoted = _quoted(text)
+    if quoted is not None:
+        _, inner, after = quoted
+        match = _LEADING_SEPARATOR.match(after)
+        if match:
+            title, artist = _clean(inner), _clean(after[match.end():])
+            if title and artist and len(artist.split()) <= MAX_ARTIST_WORDS:
+                return title, artist
+            return None
+        if not after.strip(_TRAILING_PUNCTUATION + _QUOTE_CHARS):
+            # The whole "Title by Artist" was quoted
+            return _split(inner, separator)
+        return None
+
+    return _split(text, separator)
+
+
+def format_song_prompt(title: str, artist: str) -> str:
+    """The lookup prompt the analysis call expects, matching the model extractor's output."""
+    return f"Get me accurate key, bpm, moods, instruments, for {title} by {artist}"
@@ -1,22 +1,21 @@
 import numpy as np
-import librosa
 from typing import Dict, Any
+from audio_features import AudioFeatures, get_features
 
-def analyze_mood(audio_data: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+def analyze_mood(audio_data: np.ndarray, sample_rate: int, features: AudioFeatures = None) -> Dict[str, Any]:
     """
     Analyze the mood of the audio based on various audio features.
     """
+    features = get_features(audio_data, sample_rate, features)
+
     # Extract relevant features for mood analysis
-    spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sample_rate)[0]
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=audio_data, sr=sample_rate)[0]
-    tempo = librosa.beat.tempo(y=audio_data, sr=sample_rate)[0]
+    tempo = features.tempo
     
     # Calculate energy
-    rms = librosa.feature.rms(y=audio_data)[0]
-    energy = np.mean(rms)
+    energy = features.rms_mean
     
     # Calculate brightness
-    brightness = np.mean(spectral_centroids)
+    brightness = features.spectral_centroid_mean
     
     # Determine moods based on audio features
     moods = []
@@ -0,0 +1,174 @@
+"""
+Content-addressed on-disk cache for audio analysis results.
+
+Results are keyed by a hash of the file bytes plus the analyzer version and
+the analysis parameters, and stored in a SQLite database in WAL mode so any
+number of worker processes can read and write it concurrently.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "AUDIO_ANALYSIS_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "beat-feature-extract", "results.sqlite3"),
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+EVICT_EVERY = 64  # puts between automatic eviction passes
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    """Content hash of an in-memory file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Content hash of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash: str, version: str, params: Dict[str, Any] = None) -> str:
+    """Combine the content hash with the analyzer version and parameters."""
+    payload = json.dumps(
+        {"content": content_hash, "version": version, "params": params or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed result cache with size- and age-based eviction.
+
+    Entries older than `max_age` seconds are dropped, and once the stored
+    results exceed `max_bytes` the least recently used entries go first.
+    Connections are opened per process, so an instance can be inherited by
+    forked workers, and shared between threads under a lock.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored result for `key`, or None on a miss or expired entry."""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Like `get`, but return (result, created_at) so callers can tell how old it is."""
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if self.max_age is not None and now - row[1] > self.max_age:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0]), row[1]
+        except sqlite3.Error as e:
+            print(f"Result cache read error: {e}")
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store `result` under `key`, evicting old entries every few writes."""
+        value = json.dumps(result)
+        now = time.time()
+        try:
+            with self._lock:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now),
+                )
+                self._puts += 1
+                evict = self._puts % EVICT_EVERY == 1
+        except sqlite3.Error as e:
+            print(f"Result cache write error: {e}")
+            return
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under `max_bytes`."""
+        removed = 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if self.max_age is not None:
+                        removed += conn.execute(
+                            "DELETE FROM results WHERE created_at < ?", (time.time() - self.max_age,)
+                        ).rowcount
+                    if self.max_bytes is not None:
+                        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                        if total > self.max_bytes:
+                            excess = total - self.max_bytes
+                            rows = conn.execute("SELECT key, size FROM results ORDER BY accessed_at").fetchall()
+                            doomed = []
+                            for key, size in rows:
+                                if excess <= 0:
+                                    break
+                                doomed.append((key,))
+                                excess -= size
+                            conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+                            removed += len(doomed)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            print(f"Result cache eviction error: {e}")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
@@ -0,0 +1,215 @@
+"""
+Time-varying key and tempo over sliding windows.
+
+Frames are folded into per-hop block sums as they arrive, and each window
+is the sum of its blocks, so overlapping windows share all their chroma
+and tempogram work and the total cost stays close to one global pass.
+The same tracker serves whole-file analysis (fed once), streaming
+analysis (fed block by block) and live input.
+
+Times are positions in the analyzed audio; with an excerpt-sampling decode
+profile that is the spliced excerpts, not the original track.
+"""
+from typing import Dict, Any, List, Optional
+import numpy as np
+import librosa
+from audio_features import HOP_LENGTH
+from key_engine import DEFAULT_KEY_PROFILE, ProfileSpec, estimate_keys
+
+DEFAULT_WINDOW_SECONDS = 20.0
+DEFAULT_HOP_SECONDS = 5.0
+TEMPO_AC_SECONDS = 8.0  # autocorrelation window, as in librosa.feature.tempo
+
+
+class BlockSums:
+    """Per-block sum, max and frame count of a (dims, frames) series, fed in arbitrary chunks."""
+
+    def __init__(self, block_frames: int):
+        self.block_frames = block_frames
+        self.blocks = {}
+        self.completed = 0
+        self._pending = []
+        self._pending_count = 0
+
+    def add(self, frames: np.ndarray):
+        while frames.shape[-1]:
+            take = min(self.block_frames - self._pending_count, frames.shape[-1])
+            self._pending.append(frames[..., :take])
+            self._pending_count += take
+            frames = frames[..., take:]
+            if self._pending_count == self.block_frames:
+                self._close()
+
+    def flush(self):
+        """Close a partially filled final block."""
+        if self._pending_count:
+            self._close()
+
+    def _close(self):
+        block = np.concatenate(self._pending, axis=-1)
+        self.blocks[self.completed] = (block.sum(axis=-1, dtype=np.float64), block.max(axis=-1), block.shape[-1])
+        self.completed += 1
+        self._pending = []
+        self._pending_count = 0
+
+    def window(self, first: int, last: int):
+        """Sum, max and count over blocks `first`..`last` inclusive."""
+        sums, maxes, counts = zip(*(self.blocks[i] for i in range(first, last + 1)))
+        return np.sum(sums, axis=0), np.max(maxes, axis=0), sum(counts)
+
+    def drop_before(self, index: int):
+        for i in [i for i in self.blocks if i < index]:
+            del self.blocks[i]
+
+
+class SegmentTracker:
+    """
+    Incremental key/tempo tracker over sliding windows.
+
+    Feed per-frame chroma (12, n) and onset strength (n,) with `update`, in
+    any chunk sizes; completed windows are returned as they become available,
+    and `finish` closes the trailing partial window. Tempo uses a trailing
+    autocorrelation window, so tempo changes register a few seconds late.
+    """
+
+    def __init__(self, sample_rate: int, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 hop_seconds: float = DEFAULT_HOP_SECONDS, key_profiles: ProfileSpec = DEFAULT_KEY_PROFILE,
+                 hop_length: int = HOP_LENGTH, emit_partial: bool = False):
+        self.sample_rate = sample_rate
+        self.hop_length = hop_length
+        self.hop_frames = max(1, int(round(hop_seconds * sample_rate / hop_length)))
+        self.window_blocks = max(1, int(round(window_seconds / hop_seconds)))
+        self.window_seconds = self.window_blocks * self.hop_frames * hop_length / sample_rate
+        self.hop_seconds = self.hop_frames * hop_length / sample_rate
+        self.key_profiles = key_profiles
+        self.ac_frames = int(librosa.time_to_frames(TEMPO_AC_SECONDS, sr=sample_rate, hop_length=hop_length))
+
+        self._chroma = BlockSums(self.hop_frames)
+        self._tempogram = BlockSums(self.hop_frames)
+        self._onset = BlockSums(self.hop_frames)
+        self._streams = set()
+        self._onset_context = np.zeros(self.ac_frames - 1)
+        # With emit_partial, windows grow from the start instead of waiting for a full window
+        self._next_end = 0 if emit_partial else self.window_blocks - 1
+        self.segments = []
+
+    def update(self, chroma: Optional[np.ndarray] = None, onset: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Add frames of chroma and/or onset strength; returns the newly completed windows."""
+        if chroma is not None:
+            self._streams.add("chroma")
+            self._chroma.add(np.asarray(chroma))
+        if onset is not None:
+            self._streams.add("onset")
+            onset = np.asarray(onset, dtype=np.float64)
+        if onset is not None and len(onset):
+            # Only the new frames' tempogram columns are computed, with the previous
+            # frames carried over as autocorrelation context
+            context = np.concatenate([self._onset_context, onset])
+            self._tempogram.add(librosa.feature.tempogram(
+                onset_envelope=context, sr=self.sample_rate, hop_length=self.hop_length,
+                win_length=self.ac_frames, center=False,
+            ))
+            self._onset.add(onset[None, :])
+            self._onset_context = context[len(context) - (self.ac_frames - 1):]
+        return self._emit_ready()
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Close the trailing partial block; a track shorter than one window yields one segment."""
+        for sums in (self._chroma, self._tempogram, self._onset):
+            sums.flush()
+        if not self.segments and self._ready() < self.window_blocks:
+            self._next_end = self._ready() - 1
+        return self._emit_ready()
+
+    def _ready(self) -> int:
+        counts = []
+        if "chroma" in self._streams:
+            counts.append(self._chroma.completed)
+        if "onset" in self._streams:
+            counts.append(self._onset.completed)
+        return min(counts) if counts else 0
+
+    def _emit_ready(self) -> List[Dict[str, Any]]:
+        windows = []
+        while 0 <= self._next_end < self._ready():
+            windows.append((max(0, self._next_end - self.window_blocks + 1), self._next_end))
+            self._next_end += 1
+        if not windows:
+            return []
+
+        frame_seconds = self.hop_length / self.sample_rate
+        new_segments = []
+        for first, last in windows:
+            start = first * self.hop_frames * frame_seconds
+            frames = (last - first) * self.hop_frames + self._block_count(last)
+            new_segments.append({"start": round(start, 3), "end": round(start + frames * frame_seconds, 3)})
+
+        if "chroma" in self._streams:
+            chroma = np.array([s / n for s, _, n in (self._chroma.window(*w) for w in windows)])
+            for segment, key_info in zip(new_segments, estimate_keys(chroma, self.key_profiles)):
+                segment["key"] = key_info["key"]
+                segment["key_confidence"] = key_info["confidence"]
+
+        if "onset" in self._streams:
+            tempogram = np.stack([s / n for s, _, n in (self._tempogram.window(*w) for w in windows)], axis=1)
+            bpms = librosa.feature.tempo(tg=tempogram, sr=self.sample_rate, hop_length=self.hop_length,
+                                         aggregate=None)
+            for segment, bpm, window in zip(new_segments, bpms, windows):
+                total, peak, count = self._onset.window(*window)
+                segment["bpm"] = float(bpm)
+                segment["tempo_confidence"] = float(np.clip(total[0] / count / (peak[0] + 1e-6), 0.0, 1.0))
+
+        oldest_needed = self._next_end - self.window_blocks + 1
+        for sums in (self._chroma, self._tempogram, self._onset):
+            sums.drop_before(oldest_needed)
+        self.segments.extend(new_segments)
+        return new_segments
+
+    def _block_count(self, index: int) -> int:
+        for sums in (self._chroma, self._onset):
+            if index in sums.blocks:
+                return sums.blocks[index][2]
+        return self.hop_frames
+
+    def summary(self) -> Dict[str, Any]:
+        """Segments plus the points where the key changes and the tempo range."""
+        key_changes = [
+            {"time": current["start"], "from": previous["key"], "to": current["key"]}
+            for previous, current in zip(self.segments, self.segments[1:])
+            if "key" in current and current["key"] != previous["key"]
+        ]
+        bpms = [s["bpm"] for s in self.segments if "bpm" in s]
+        return {
+            "window_seconds": round(self.window_seconds, 3),
+            "hop_seconds": round(self.hop_seconds, 3),
+            "segments": self.segments,
+            "key_changes": key_changes,
+            "tempo_range": [min(bpms), max(bpms)] if bpms else [],
+        }
+
+
+def frame_chroma(features) -> np.ndarray:
+    """Per-frame version of the weighted chroma mix `estimate_key` uses."""
+    frames = min(features.chroma_cqt.shape[1], features.chroma_stft.shape[1], features.chroma_harmonic.shape[1])
+    return (0.4 * features.chroma_cqt[:, :frames] + 0.2 * features.chroma_stft[:, :frames]
+            + 0.4 * features.chroma_harmonic[:, :frames])
+
+
+def analyze_segments(features, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                     hop_seconds: float = DEFAULT_HOP_SECONDS,
+                     key_profiles: ProfileSpec = DEFAULT_KEY_PROFILE) -> Dict[str, Any]:
+    """
+    Key and tempo tracks for a feature context.
+
+    Whole-file contexts are fed to a fresh tracker in one go; streaming
+    contexts built with `track_segments=True` already fed theirs block by block.
+    """
+    if getattr(features, "tracker", None) is not None:
+        features.tracker.finish()
+        return features.tracker.summary()
+    if features.audio_data is None:
+        raise ValueError("Streaming features need track_segments=True to produce segment tracks")
+    tracker = SegmentTracker(features.sample_rate, window_seconds, hop_seconds, key_profiles)
+    tracker.update(chroma=frame_chroma(features), onset=features.onset_envelope)
+    tracker.finish()
+    return tracker.summary()
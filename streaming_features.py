@@ -0,0 +1,194 @@
+import numpy as np
+import librosa
+from audio_features import N_FFT, HOP_LENGTH, BINS_PER_OCTAVE, N_OCTAVES
+
+DEFAULT_BLOCK_LENGTH = 256  # STFT frames per block (~6 s at 22050 Hz)
+
+
+class RunningMean:
+    """Running per-row mean over frames, fed one block of frames at a time."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, frames: np.ndarray):
+        self.total = self.total + np.sum(frames, axis=-1, dtype=np.float64)
+        self.count += frames.shape[-1]
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return self.total
+        return self.total / self.count
+
+
+class StreamingFeatures:
+    """
+    Feature context built from block-wise decoded audio.
+
+    Exposes the same summary features the analyzers read from `AudioFeatures`
+    (chroma means, spectral means, RMS mean, onset envelope and tempo) but
+    keeps only running accumulators, so memory is bounded by the block size.
+    The onset envelope is the one per-frame series kept for the whole track,
+    since tempo estimation needs it; it costs one float per hop.
+    """
+
+    def __init__(self, sample_rate: int, track_segments: bool = False):
+        self.audio_data = None
+        self.sample_rate = sample_rate
+        self.duration = 0.0
+        self.tuning = None
+        self._chroma_cqt = RunningMean()
+        self._chroma_stft = RunningMean()
+        self._chroma_harmonic = RunningMean()
+        self._rms = RunningMean()
+        self._centroid = RunningMean()
+        self._rolloff = RunningMean()
+        self._bandwidth = RunningMean()
+        self._onset_blocks = []
+        self._prev_mel_db = None
+        self._tempo = None
+        self.tracker = None
+        if track_segments:
+            from segment_tracks import SegmentTracker
+            self.tracker = SegmentTracker(sample_rate)
+
+    def _chroma_from_signal(self, signal: np.ndarray) -> np.ndarray:
+        cqt = np.abs(librosa.cqt(signal, sr=self.sample_rate, hop_length=HOP_LENGTH,
+                                 n_bins=N_OCTAVES * BINS_PER_OCTAVE, bins_per_octave=BINS_PER_OCTAVE,
+                                 tuning=self.tuning))
+        return librosa.feature.chroma_cqt(C=cqt, sr=self.sample_rate, hop_length=HOP_LENGTH,
+                                          n_chroma=12, bins_per_octave=BINS_PER_OCTAVE)
+
+    def update(self, block: np.ndarray):
+        """
+        Accumulate one block from `librosa.stream`.
+
+        Blocks overlap by `N_FFT - HOP_LENGTH` samples, so un-centered STFT
+        frames line up across block boundaries.
+        """
+        stft = librosa.stft(block, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)
+        magnitude = np.abs(stft)
+        power = magnitude ** 2
+        self.duration += magnitude.shape[1] * HOP_LENGTH / self.sample_rate
+
+        if self.tuning is None:
+            self.tuning = float(librosa.estimate_tuning(S=magnitude, sr=self.sample_rate, n_fft=N_FFT,
+                                                        bins_per_octave=BINS_PER_OCTAVE))
+
+        # Spectral descriptors and energy
+        self._centroid.add(librosa.feature.spectral_centroid(S=magnitude, sr=self.sample_rate, n_fft=N_FFT)[0])
+        self._rolloff.add(librosa.feature.spectral_rolloff(S=magnitude, sr=self.sample_rate, n_fft=N_FFT)[0])
+        self._bandwidth.add(librosa.feature.spectral_bandwidth(S=magnitude, sr=self.sample_rate, n_fft=N_FFT)[0])
+        self._rms.add(librosa.feature.rms(y=block, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)[0])
+
+        # Chroma from the STFT, the full CQT and the harmonic CQT
+        chroma_stft = librosa.feature.chroma_stft(S=power, sr=self.sample_rate, n_fft=N_FFT,
+                                                  n_chroma=12, tuning=self.tuning)
+        chroma_cqt = self._chroma_from_signal(block)
+        harmonic_stft, _ = librosa.decompose.hpss(stft)
+        harmonic = librosa.istft(harmonic_stft, hop_length=HOP_LENGTH, n_fft=N_FFT, center=False,
+                                 length=len(block))
+        chroma_harmonic = self._chroma_from_signal(harmonic)
+        self._chroma_stft.add(chroma_stft)
+        self._chroma_cqt.add(chroma_cqt)
+        self._chroma_harmonic.add(chroma_harmonic)
+
+        # Onset envelope, carrying the previous block's last frame for the lag-1 difference
+        mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=self.sample_rate))
+        if self._prev_mel_db is None:
+            # Line up with the centered whole-file envelope: un-centered frame j is centered
+            # frame j + N_FFT / (2 * HOP_LENGTH), and both envelopes pad one lag
+            self._onset_blocks.append(np.zeros(2 + N_FFT // (2 * HOP_LENGTH), dtype=mel_db.dtype))
+            frames = mel_db
+        else:
+            frames = np.concatenate([self._prev_mel_db, mel_db], axis=1)
+        onset = None
+        if frames.shape[1] > 1:
+            onset = librosa.onset.onset_strength(S=frames, sr=self.sample_rate, hop_length=HOP_LENGTH,
+                                                 center=False)
+            if self._prev_mel_db is not None:
+                # onset_strength pads one leading zero for the lag; the carried frame already covers it
+                onset = onset[1:]
+            self._onset_blocks.append(onset)
+        self._prev_mel_db = mel_db[:, -1:]
+        self._tempo = None
+
+        if self.tracker is not None:
+            # Centered CQT frames lead the un-centered STFT frames by N_FFT / 2 samples
+            lead = N_FFT // (2 * HOP_LENGTH)
+            n = chroma_stft.shape[1]
+            self.tracker.update(
+                chroma=0.4 * chroma_cqt[:, lead:lead + n] + 0.2 * chroma_stft + 0.4 * chroma_harmonic[:, lead:lead + n],
+                onset=onset,
+            )
+
+    @property
+    def chroma_cqt_mean(self) -> np.ndarray:
+        return self._chroma_cqt.mean
+
+    @property
+    def chroma_stft_mean(self) -> np.ndarray:
+        return self._chroma_stft.mean
+
+    @property
+    def chroma_harmonic_mean(self) -> np.ndarray:
+        return self._chroma_harmonic.mean
+
+    @property
+    def onset_envelope(self) -> np.ndarray:
+        if len(self._onset_blocks) > 1:
+            self._onset_blocks = [np.concatenate(self._onset_blocks)]
+        if not self._onset_blocks:
+            return np.zeros(1)
+        return self._onset_blocks[0]
+
+    @property
+    def tempo(self) -> float:
+        if self._tempo is None:
+            tempo = librosa.feature.tempo(onset_envelope=self.onset_envelope, sr=self.sample_rate,
+                                          hop_length=HOP_LENGTH, aggregate=np.median)
+            self._tempo = float(tempo[0])
+        return self._tempo
+
+    @property
+    def rms_mean(self) -> float:
+        return float(self._rms.mean)
+
+    @property
+    def spectral_centroid_mean(self) -> float:
+        return float(self._centroid.mean)
+
+    @property
+    def spectral_rolloff_mean(self) -> float:
+        return float(self._rolloff.mean)
+
+    @property
+    def spectral_bandwidth_mean(self) -> float:
+        return float(self._bandwidth.mean)
+
+
+def stream_features(source, block_length: int = DEFAULT_BLOCK_LENGTH,
+                    track_segments: bool = False) -> StreamingFeatures:
+    """
+    Decode `source` (a path or file-like object) block by block and accumulate features.
+
+    Audio is analyzed at its native sample rate, mixed down to mono. With
+    `track_segments`, sliding-window key/tempo tracks are built along the way.
+    """
+    sample_rate = librosa.get_samplerate(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    features = StreamingFeatures(sample_rate, track_segments)
+    blocks = librosa.stream(
+        source,
+        block_length=block_length,
+        frame_length=N_FFT,
+        hop_length=HOP_LENGTH,
+        mono=True,
+        fill_value=0,
+    )
+    for block in blocks:
+        features.update(block)
+    return features
@@ -1,22 +1,24 @@
 import numpy as np
-import librosa
 from typing import Dict
+from audio_features import AudioFeatures, get_features
 
-def estimate_tempo(audio_data: np.ndarray, sample_rate: int) -> Dict[str, float]:
+def estimate_tempo(audio_data: np.ndarray, sample_rate: int, features: AudioFeatures = None) -> Dict[str, float]:
     """
     Estimate the tempo (BPM) and confidence level of an audio signal.
     """
-    # Compute the onset envelope with logarithmic scaling
-    onset_env = librosa.onset.onset_strength(y=audio_data, sr=sample_rate)
+    features = get_features(audio_data, sample_rate, features)
+
+    # Onset envelope with logarithmic scaling, shared with the other analyzers
+    onset_env = features.onset_envelope
     
-    # Estimate tempo with median aggregation for better accuracy
-    tempo = librosa.beat.tempo(onset_envelope=onset_env, sr=sample_rate, aggregate=np.median)
+    # Tempo with median aggregation for better accuracy
+    tempo = features.tempo
     
     # Normalize onset strength to determine confidence
     onset_env_max = np.max(onset_env)
     confidence = np.clip(np.mean(onset_env) / (onset_env_max + 1e-6), 0.0, 1.0)
     
     return {
-        "bpm": float(tempo[0]),
+        "bpm": float(tempo),
         "confidence": float(confidence)
     }
@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from catalog_shards import Catalog, CheckpointWriter, Claim, iter_catalog, merge_results, read_checkpoint, shard_of
+
+
+def owner(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_claim_acquire_and_release(tmp_path):
+    path = str(tmp_path / "shard-0000.lock")
+    claim = Claim(path, "node-a")
+    assert claim.acquire()
+    assert owner(path)["token"] == claim.token
+    # A second claim on a live, fresh lock fails, whichever node asks
+    assert not Claim(path, "node-b").acquire()
+    claim.release()
+    assert not os.path.exists(path)
+    assert Claim(path, "node-b").acquire()
+
+
+def test_stale_claim_is_taken_over(tmp_path):
+    path = str(tmp_path / "shard-0000.lock")
+    held = Claim(path, "node-a")
+    assert held.acquire()
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    taker = Claim(path, "node-b", stale_after=60)
+    assert taker.acquire()
+    assert owner(path)["token"] == taker.token
+    assert [name for name in os.listdir(tmp_path) if ".stale-" in name] == []
+    # The old holder's release must not remove the new holder's lock
+    held.release()
+    assert owner(path)["token"] == taker.token
+    taker.release()
+
+
+def test_claim_of_dead_process_on_this_host_is_taken_over(tmp_path):
+    path = str(tmp_path / "shard-0000.lock")
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    claim = Claim(path, "node-a")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"node": "node-a", "host": socket.gethostname(), "pid": dead.pid, "token": "old"}, f)
+    # Another node cannot tell whether the process is alive, so only the same node takes over early
+    assert not Claim(path, "node-b").acquire()
+    assert claim.acquire()
+    assert owner(path)["token"] == claim.token
+    claim.release()
+
+
+def test_lost_claim_is_detected(tmp_path):
+    path = str(tmp_path / "shard-0000.lock")
+    claim = Claim(path, "node-a", stale_after=1.0)
+    assert claim.acquire()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"node": "node-b", "token": "other"}, f)
+    assert claim.lost.wait(5)
+    claim.release()
+    assert owner(path)["token"] == "other"
+
+
+def test_iter_catalog_skips_aliases(tmp_path):
+    audio = tmp_path / "audio"
+    audio.mkdir()
+    for name in ("a.wav", "b.mp3", "notes.txt"):
+        (audio / name).write_bytes(b"")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# tracks\naudio/a.wav\n./audio/a.wav\n\n" + str(audio / "b.mp3") + "\naudio/a.wav\n",
+                        encoding="utf-8")
+    entries = list(iter_catalog([str(manifest), str(audio)]))
+    assert [key for key, _ in entries] == ["audio/a.wav", str(audio / "b.mp3")]
+    assert [os.path.realpath(path) for _, path in entries] == [str(audio / "a.wav"), str(audio / "b.mp3")]
+
+
+def test_shard_of_is_stable():
+    assert shard_of("audio/a.wav", 64) == shard_of("audio/a.wav", 64)
+    assert {shard_of(f"track-{i}", 8) for i in range(200)} == set(range(8))
+
+
+def test_checkpoint_drops_a_torn_line_and_merge_prefers_success(tmp_path):
+    catalog = Catalog(str(tmp_path))
+    catalog.init(2, {}, [("a", "/a"), ("b", "/b")])
+    results = catalog.path("results", 0)
+    with open(results, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"key": "a", "status": "ok", "run": 1}) + "\n")
+        f.write('{"key": "b", "sta')
+
+    writer = CheckpointWriter(results, {"/a": "a", "/b": "b"}, "node-a")
+    writer.write(json.dumps({"path": "/a", "status": "error"}) + "\n")
+    writer.write(json.dumps({"path": "/b", "status": "ok"}) + "\n")
+    writer.flush()
+    writer.close()
+    assert [record["key"] for record in read_checkpoint(results)] == ["a", "a", "b"]
+
+    output = io.StringIO()
+    stats = merge_results(catalog, output, keys={"a", "b", "c"})
+    assert stats == {"entries": 2, "duplicates": 1, "ok": 2, "error": 0, "missing": 1}
+    assert [json.loads(line)["key"] for line in output.getvalue().splitlines()] == ["a", "b"]
+    assert json.loads(output.getvalue().splitlines()[0])["run"] == 1
@@ -0,0 +1,111 @@
+import os
+import numpy as np
+import pytest
+from feature_store import VectorStore, SimilarityIndex
+
+NAMES = ["a", "b", "c"]
+
+
+def fill(store: VectorStore, count: int, start: int = 0):
+    for i in range(start, start + count):
+        store.add(f"track-{i}", [i, i * 2, -i])
+
+
+def test_add_flushes_full_segments(tmp_path):
+    store = VectorStore(str(tmp_path), NAMES, segment_size=4)
+    fill(store, 10)
+    assert [segment["rows"] for segment in store.manifest["segments"]] == [4, 4]
+    assert len(store) == 10
+    store.flush()
+    store.flush()  # nothing buffered: no empty segment
+    assert [segment["rows"] for segment in store.manifest["segments"]] == [4, 4, 2]
+    np.testing.assert_array_equal(store.column("b"), np.arange(10) * 2)
+
+
+def test_reopen_keeps_latest_row_per_track(tmp_path):
+    store = VectorStore(str(tmp_path), NAMES, segment_size=4)
+    fill(store, 6)
+    store.add("track-1", [100, 200, 300])
+    store.flush()
+
+    ids, vectors = VectorStore(str(tmp_path), NAMES).load()
+    assert list(ids) == ["track-0", "track-2", "track-3", "track-4", "track-5", "track-1"]
+    np.testing.assert_array_equal(vectors[-1], [100, 200, 300])
+    assert vectors.dtype == np.float32
+
+
+def test_rejects_mismatched_rows_and_names(tmp_path):
+    store = VectorStore(str(tmp_path), NAMES)
+    with pytest.raises(ValueError):
+        store.add("track", [1.0, 2.0])
+    with pytest.raises(ValueError):
+        store.add("two\nlines", [1.0, 2.0, 3.0])
+    store.add("track", [1.0, 2.0, 3.0])
+    store.flush()
+    with pytest.raises(ValueError):
+        VectorStore(str(tmp_path), ["a", "b"])
+
+
+def test_empty_store_loads(tmp_path):
+    ids, vectors = VectorStore(str(tmp_path), NAMES).load()
+    assert len(ids) == 0 and vectors.shape == (0, 3)
+
+
+def test_compact_drops_superseded_rows(tmp_path):
+    store = VectorStore(str(tmp_path), NAMES, segment_size=4)
+    fill(store, 9)
+    fill(store, 3, start=2)  # re-adds track-2..4
+    before = store.load()
+    store.compact()
+
+    assert [segment["rows"] for segment in store.manifest["segments"]] == [4, 4, 1]
+    after = VectorStore(str(tmp_path), NAMES).load()
+    assert list(after[0]) == list(before[0])
+    np.testing.assert_array_equal(after[1], before[1])
+    # Only the listed segments (and the manifest) remain on disk
+    listed = {segment["name"] + suffix for segment in store.manifest["segments"] for suffix in (".ids", ".npy")}
+    assert set(os.listdir(tmp_path)) == listed | {"store.json"}
+
+
+def test_interrupted_compact_loses_nothing(tmp_path, monkeypatch):
+    store = VectorStore(str(tmp_path), NAMES, segment_size=2)
+    fill(store, 5)
+    fill(store, 2)
+    store.flush()
+    before = store.load()
+
+    write = store._write_segment_files
+    written = []
+
+    def fail_after_first(ids, columns):
+        if written:
+            raise OSError("disk full")
+        written.append(write(ids, columns))
+        return written[-1]
+
+    monkeypatch.setattr(store, "_write_segment_files", fail_after_first)
+    with pytest.raises(OSError):
+        store.compact()
+
+    reopened = VectorStore(str(tmp_path), NAMES, segment_size=2)
+    after = reopened.load()
+    assert list(after[0]) == list(before[0])
+    np.testing.assert_array_equal(after[1], before[1])
+    # The next compaction overwrites the unlisted files the interrupted one left behind
+    reopened.compact()
+    assert list(reopened.load()[0]) == list(before[0])
+    listed = {segment["name"] + suffix for segment in reopened.manifest["segments"] for suffix in (".ids", ".npy")}
+    assert set(os.listdir(tmp_path)) == listed | {"store.json"}
+
+
+def test_similar_excludes_the_track_itself(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((50, 3)).astype(np.float32)
+    ids = [f"track-{i}" for i in range(50)]
+    index = SimilarityIndex(ids, vectors, NAMES)
+    results = index.similar("track-7", k=5)
+    assert len(results) == 5 and all(result["id"] != "track-7" for result in results)
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+    assert index.search(vectors[7], k=1)[0]["id"] == "track-7"
+    with pytest.raises(KeyError):
+        index.similar("missing")
@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import CancelledError
+import pytest
+from job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue, QueueFull
+
+# Thread-pool jobs only, so no worker processes are spawned
+
+
+@pytest.fixture
+def gate():
+    """Jobs block on the gate until the test opens it."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def queue():
+    jobs = JobQueue(io_threads=2, max_pending=3, per_user_limit=1, per_user_pending=2)
+    yield jobs
+    jobs.shutdown()
+
+
+def blocked(gate, value=None):
+    if not gate.wait(10):
+        raise TimeoutError("gate never opened")
+    return value
+
+
+def submit(queue, gate, user, value=None):
+    return queue.submit(blocked, gate, value, user=user, pool="thread")
+
+
+def test_per_user_limit_lets_other_users_through(queue, gate):
+    first = submit(queue, gate, "alice", 1)
+    second = submit(queue, gate, "alice", 2)
+    other = submit(queue, gate, "bob", 3)
+    assert queue.status(first)["state"] == RUNNING
+    assert queue.status(second)["state"] == QUEUED
+    assert queue.status(second)["position"] == 0
+    # Bob's job was submitted after Alice's second one but starts first
+    assert queue.status(other)["state"] == RUNNING
+    assert "position" not in queue.status(other)
+
+    gate.set()
+    assert [queue.result(job_id, timeout=5) for job_id in (first, second, other)] == [1, 2, 3]
+    assert queue.status(second)["state"] == DONE
+    assert queue.stats()["pending"] == 0
+
+
+def test_admission_limits(queue, gate):
+    submit(queue, gate, "alice")
+    submit(queue, gate, "bob")
+    # Both workers are busy now; everything else waits
+    submit(queue, gate, "alice")
+    submit(queue, gate, "alice")
+    with pytest.raises(QueueFull):
+        submit(queue, gate, "alice")
+    submit(queue, gate, "carol")
+    assert queue.stats()["pending"] == 3
+    with pytest.raises(QueueFull):
+        submit(queue, gate, "dave")
+
+
+def test_cancel_queued_job(queue, gate):
+    running = submit(queue, gate, "alice")
+    waiting = submit(queue, gate, "alice")
+    behind = submit(queue, gate, "alice")
+    assert queue.cancel(waiting)
+    assert queue.status(waiting)["state"] == CANCELLED
+    assert queue.status(behind)["position"] == 0
+    with pytest.raises(CancelledError):
+        queue.result(waiting, timeout=1)
+
+    gate.set()
+    queue.result(running, timeout=5)
+    queue.result(behind, timeout=5)
+    assert not queue.cancel(waiting)
+    assert not queue.cancel(behind)
+
+
+def test_cancel_running_job_discards_result_and_keeps_its_slot(queue, gate):
+    running = submit(queue, gate, "alice", 1)
+    waiting = submit(queue, gate, "alice", 2)
+    assert queue.cancel(running)
+    with pytest.raises(CancelledError):
+        queue.result(running, timeout=1)
+    # The cancelled job still occupies Alice's slot until its function returns
+    assert queue.status(waiting)["state"] == QUEUED
+
+    gate.set()
+    assert queue.result(waiting, timeout=5) == 2
+    assert queue.status(running)["state"] == CANCELLED
+
+
+def test_failure_is_reported_and_reraised(queue):
+    def fail():
+        raise ValueError("bad input")
+
+    job_id = queue.submit(fail, pool="thread")
+    with pytest.raises(ValueError):
+        queue.result(job_id, timeout=5)
+    status = queue.status(job_id)
+    assert status["state"] == FAILED
+    assert status["error"] == "bad input"
+    assert status["kind"] == "fail"
+
+
+def test_unknown_jobs_and_pools(queue):
+    assert queue.status("missing") is None
+    assert not queue.cancel("missing")
+    with pytest.raises(KeyError):
+        queue.result("missing")
+    with pytest.raises(ValueError):
+        queue.submit(print, pool="gpu")
+
+
+def test_finished_jobs_are_forgotten_after_retention():
+    jobs = JobQueue(io_threads=1, retain_seconds=0)
+    try:
+        first = jobs.submit(len, "abc", pool="thread")
+        assert jobs.result(first, timeout=5) == 3
+        jobs.submit(len, "de", pool="thread")
+        assert jobs.status(first) is None
+    finally:
+        jobs.shutdown()
+
+
+def test_shutdown_cancels_waiting_jobs(gate):
+    jobs = JobQueue(io_threads=1)
+    running = submit(jobs, gate, "alice", 1)
+    waiting = submit(jobs, gate, "bob", 2)
+    gate_opener = threading.Timer(0.2, gate.set)
+    gate_opener.start()
+    jobs.shutdown()
+    assert jobs.result(running, timeout=5) == 1
+    with pytest.raises(CancelledError):
+        jobs.result(waiting, timeout=1)
+    with pytest.raises(RuntimeError):
+        submit(jobs, gate, "alice")
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from key_engine import KEY_LABELS, KEY_PROFILES, estimate_keys, register_key_profile, score_keys
+
+MAJOR, MINOR = (np.array(profile) for profile in KEY_PROFILES["krumhansl"])
+
+
+def loop_estimate(chroma):
+    """The per-key np.roll + np.corrcoef loop estimate_key used before the matrix version."""
+    correlations = []
+    for mode_idx, profile in enumerate([MAJOR, MINOR]):
+        for key_idx in range(12):
+            correlation = np.corrcoef(np.roll(profile, key_idx), chroma)[0, 1]
+            correlations.append((KEY_LABELS[mode_idx * 12 + key_idx], correlation))
+    correlations.sort(key=lambda item: item[1], reverse=True)
+    best = correlations[0][1]
+    return {
+        "key": correlations[0][0],
+        "confidence": max(0.0, min(1.0, (best - correlations[1][1]) * 5)),
+        "secondary_candidates": [key for key, correlation in correlations[1:4] if correlation > best * 0.8],
+        "correlation_score": best,
+        "scores": dict(correlations),
+    }
+
+
+def test_matches_the_loop_on_random_chroma():
+    chroma = np.random.default_rng(0).random((500, 12))
+    for vector, estimate in zip(chroma, estimate_keys(chroma)):
+        expected = loop_estimate(vector)
+        assert estimate["key"] == expected["key"]
+        assert estimate["confidence"] == pytest.approx(expected["confidence"], abs=1e-9)
+        assert estimate["secondary_candidates"] == expected["secondary_candidates"]
+        assert estimate["correlation_score"] == pytest.approx(expected["correlation_score"], abs=1e-12)
+
+
+@pytest.mark.parametrize("template", [
+    [1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0],  # whole-tone scale: every other major key ties
+    [1, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 0],  # diminished seventh
+    [1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0],  # augmented triad
+    [1, 0, 0, 0, 0.5, 0, 1, 0, 0, 0, 0.5, 0],  # symmetric at the tritone
+])
+def test_ties_break_in_label_order(template):
+    chroma = np.array(template, dtype=float)
+    expected = loop_estimate(chroma)
+    estimate = estimate_keys(chroma[None, :])[0]
+    # The loop picked among tied keys by rounding noise; the same best score, first in label order
+    tied = [key for key, score in expected["scores"].items()
+            if score == pytest.approx(expected["correlation_score"], abs=1e-12)]
+    assert len(tied) > 1
+    assert estimate["key"] == min(tied, key=KEY_LABELS.index)
+    assert estimate["confidence"] == 0.0
+    assert estimate["confidence"] == pytest.approx(expected["confidence"], abs=1e-9)
+    assert estimate["correlation_score"] == pytest.approx(expected["correlation_score"], abs=1e-12)
+
+
+def test_single_vector_and_batch_agree():
+    chroma = np.random.default_rng(1).random((3, 12))
+    assert [estimate_keys(vector[None, :])[0] for vector in chroma] == estimate_keys(chroma)
+    assert score_keys(chroma[0]).shape == (24,)
+    assert score_keys(chroma).shape == (3, 24)
+
+
+def test_flat_chroma_scores_zero():
+    estimate = estimate_keys(np.ones((1, 12)))[0]
+    assert estimate["key"] == "C major"
+    assert estimate["correlation_score"] == 0.0
+    assert estimate["confidence"] == 0.0
+
+
+def test_profile_blends_and_registration():
+    chroma = np.random.default_rng(2).random(12)
+    krumhansl, temperley = score_keys(chroma, "krumhansl"), score_keys(chroma, "temperley")
+    blended = score_keys(chroma, {"krumhansl": 3.0, "temperley": 1.0})
+    np.testing.assert_allclose(blended, (3 * krumhansl + temperley) / 4)
+    np.testing.assert_allclose(score_keys(chroma, ["krumhansl", "temperley"]), (krumhansl + temperley) / 2)
+
+    register_key_profile("test_scaled", MAJOR * 2 + 1, MINOR * 2 + 1)
+    try:
+        # Correlation ignores scale and offset
+        np.testing.assert_allclose(score_keys(chroma, "test_scaled"), krumhansl)
+    finally:
+        del KEY_PROFILES["test_scaled"]
+    with pytest.raises(ValueError):
+        register_key_profile("short", [1.0] * 11, [1.0] * 12)
+    with pytest.raises(ValueError):
+        score_keys(chroma, "no_such_profile")
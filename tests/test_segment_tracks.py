@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from key_engine import KEY_PROFILES, estimate_keys
+from segment_tracks import BlockSums, SegmentTracker
+
+SR = 22050
+HOP = 512
+MAJOR = np.array(KEY_PROFILES["krumhansl"][0])
+
+
+def key_chroma(tonic: int, frames: int, seed: int = 0) -> np.ndarray:
+    """Per-frame chroma shaped like the major profile on `tonic`, with noise."""
+    noise = np.random.default_rng(seed).random((12, frames)) * 0.5
+    return np.roll(MAJOR, tonic)[:, None] + noise
+
+
+def pulse_onsets(period: int, frames: int) -> np.ndarray:
+    """An onset spike every `period` frames; a whole-frame period keeps the beat free of rounding jitter."""
+    return (np.arange(frames) % period == 0).astype(float)
+
+
+def period_bpm(period: int) -> float:
+    return 60.0 * SR / HOP / period
+
+
+def feed(tracker: SegmentTracker, chroma: np.ndarray, onsets: np.ndarray, chunks) -> list:
+    segments, start = [], 0
+    for size in chunks:
+        segments += tracker.update(chroma[:, start:start + size], onsets[start:start + size])
+        start += size
+    segments += tracker.update(chroma[:, start:], onsets[start:])
+    return segments + tracker.finish()
+
+
+def test_block_sums_windows():
+    sums = BlockSums(3)
+    series = np.arange(20, dtype=float)[None, :]
+    for chunk in np.array_split(series, 7, axis=1):
+        sums.add(chunk)
+    sums.flush()
+    assert sums.completed == 7
+    total, peak, count = sums.window(1, 2)
+    assert (total[0], peak[0], count) == (series[0, 3:9].sum(), 8.0, 6)
+    total, peak, count = sums.window(6, 6)
+    assert (total[0], peak[0], count) == (18.0 + 19.0, 19.0, 2)
+    sums.drop_before(6)
+    assert list(sums.blocks) == [6]
+
+
+def test_chunking_does_not_change_segments():
+    frames = 215 * 9 + 40
+    chroma, onsets = key_chroma(0, frames), pulse_onsets(22, frames)
+    whole = feed(SegmentTracker(SR), chroma, onsets, [])
+    chunked = feed(SegmentTracker(SR), chroma, onsets, np.random.default_rng(1).integers(1, 300, 20))
+    assert len(whole) == len(chunked) > 1
+    for expected, segment in zip(whole, chunked):
+        assert segment["start"] == expected["start"] and segment["end"] == expected["end"]
+        assert segment["key"] == expected["key"]
+        assert segment["key_confidence"] == pytest.approx(expected["key_confidence"])
+        assert segment["bpm"] == pytest.approx(expected["bpm"])
+
+
+def test_windows_cover_their_frames():
+    tracker = SegmentTracker(SR)
+    frames = tracker.hop_frames * 7
+    chroma = np.random.default_rng(2).random((12, frames))
+    segments = feed(tracker, chroma, np.zeros(frames), [])
+    frame_seconds = HOP / SR
+    # Full windows only, one per hop, each keyed on the mean chroma of exactly its frames
+    assert len(segments) == 7 - tracker.window_blocks + 1
+    for segment in segments:
+        first = int(round(segment["start"] / frame_seconds))
+        last = int(round(segment["end"] / frame_seconds))
+        assert last - first == tracker.window_blocks * tracker.hop_frames
+        assert segment["key"] == estimate_keys(chroma[:, first:last].mean(axis=1)[None, :])[0]["key"]
+
+
+def test_key_change_and_tempo():
+    tracker = SegmentTracker(SR)
+    half = tracker.hop_frames * 8
+    chroma = np.concatenate([key_chroma(0, half), key_chroma(7, half, seed=1)], axis=1)
+    feed(tracker, chroma, pulse_onsets(22, 2 * half), [1000] * 3)
+    summary = tracker.summary()
+    assert summary["segments"][0]["key"] == "C major"
+    assert summary["segments"][-1]["key"] == "G major"
+    changes = summary["key_changes"]
+    assert [(change["from"], change["to"]) for change in changes] == [("C major", "G major")]
+    # The first window that is mostly in G starts within a window of the switch
+    switch = half * HOP / SR
+    assert switch - tracker.window_seconds <= changes[0]["time"] <= switch
+    assert all(segment["bpm"] == pytest.approx(period_bpm(22)) for segment in summary["segments"])
+
+
+def test_short_input_yields_one_segment():
+    tracker = SegmentTracker(SR)
+    frames = tracker.hop_frames * 2 + 10
+    assert tracker.update(key_chroma(2, frames), pulse_onsets(26, frames)) == []
+    segments = tracker.finish()
+    assert len(segments) == 1
+    assert segments[0]["start"] == 0.0
+    assert segments[0]["end"] == pytest.approx(frames * HOP / SR, abs=1e-3)
+    assert segments[0]["key"] == "D major"
+
+
+def test_emit_partial_grows_windows_from_the_start():
+    tracker = SegmentTracker(SR, emit_partial=True)
+    frames = tracker.hop_frames * 3
+    segments = tracker.update(key_chroma(0, frames), pulse_onsets(22, frames))
+    assert [segment["start"] for segment in segments] == [0.0, 0.0, 0.0]
+    assert [segment["end"] for segment in segments] == sorted(segment["end"] for segment in segments)
+    assert len(segments) == 3
+
+
+def test_chroma_only_has_no_tempo():
+    tracker = SegmentTracker(SR)
+    frames = tracker.hop_frames * 5
+    tracker.update(chroma=key_chroma(9, frames))
+    summary = tracker.summary()
+    tracker.finish()
+    assert summary["segments"] and all("bpm" not in segment for segment in summary["segments"])
+    assert summary["tempo_range"] == []
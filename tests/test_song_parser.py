@@ -0,0 +1,58 @@
+import pytest
+from models.song_parser import parse_song_query, format_song_prompt
+from models.lookup_cache import normalize_song_key
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Blinding Lights by The Weeknd", ("Blinding Lights", "The Weeknd")),
+    ("'Blinding Lights' - the weeknd", ("Blinding Lights", "the weeknd")),
+    ("the song Bohemian Rhapsody from Queen", ("Bohemian Rhapsody", "Queen")),
+    ("Get me the BPM of the track Bohemian Rhapsody from Queen", ("Bohemian Rhapsody", "Queen")),
+    ("'Bohemian Rhapsody' from Queen", ("Bohemian Rhapsody", "Queen")),
+    ("Theme from New York, New York by Frank Sinatra", ("Theme from New York, New York", "Frank Sinatra")),
+    ("Don't Stop Me Now – Queen", ("Don't Stop Me Now", "Queen")),
+    ("Stand by Me by Ben E. King", ("Stand by Me", "Ben E. King")),
+    ("What's Going On by Marvin Gaye", ("What's Going On", "Marvin Gaye")),
+    ("Find details for 'Bohemian Rhapsody by Queen'", ("Bohemian Rhapsody", "Queen")),
+    ("Get me the BPM of 'Blinding Lights' by The Weeknd", ("Blinding Lights", "The Weeknd")),
+    ("Tell me about 'Imagine' by John Lennon", ("Imagine", "John Lennon")),
+    ("Please analyze “Hey Jude” by The Beatles.", ("Hey Jude", "The Beatles")),
+    ("What's the key of Hey Jude by The Beatles?", ("Hey Jude", "The Beatles")),
+    ("What is the tempo of Hey Jude by The Beatles", ("Hey Jude", "The Beatles")),
+    ("Can you find the key of Hey Jude by The Beatles for me?", ("Hey Jude", "The Beatles")),
+    ("Tell me what's the BPM of Hey Jude by The Beatles", ("Hey Jude", "The Beatles")),
+])
+def test_parses_common_phrasings(text, expected):
+    assert parse_song_query(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "   ",
+    "Hey Jude",
+    "Get me the BPM of Blinding Lights",
+    "What key is Hey Jude by The Beatles in?",
+    "What BPM does Hey Jude by The Beatles have?",
+    "How fast is Hey Jude by The Beatles?",
+    "Tell me what key Hey Jude by The Beatles is in",
+    "'Hey Jude' is by The Beatles",
+    "'Hey Jude",
+    "Bohemian Rhapsody from Queen",
+    "Songs from the Big Chair",
+    "Theme from New York, New York",
+    "'Songs from the Big Chair'",
+])
+def test_falls_back_to_the_model(text):
+    assert parse_song_query(text) is None
+
+
+def test_rephrasings_share_a_cache_key():
+    key = normalize_song_key("Blinding Lights by The Weeknd")
+    assert key == "blinding lights|the weeknd"
+    assert normalize_song_key("'Blinding Lights' - the weeknd") == key
+    assert normalize_song_key("What's the key of Blinding Lights by The Weeknd?") == key
+
+
+def test_format_song_prompt_round_trips():
+    prompt = format_song_prompt("Hey Jude", "The Beatles")
+    assert parse_song_query(prompt) == ("Hey Jude", "The Beatles")